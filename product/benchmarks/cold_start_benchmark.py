@@ -0,0 +1,205 @@
+"""
+Measures the cold-start cost of every Lambda entry point in serverless.yml.
+
+Each handler is imported in a fresh interpreter, the way Lambda's init phase does it.
+AWS API calls are answered by a local stub and counted, so no network is needed.
+
+Run from the product directory:
+    python benchmarks/cold_start_benchmark.py                   # compare against the baseline
+    python benchmarks/cold_start_benchmark.py --update-baseline # record new numbers
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+PRODUCT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERLESS_FILE = os.path.join(PRODUCT_DIR, "serverless.yml")
+BASELINE_FILE = os.path.join(PRODUCT_DIR, "benchmarks", "cold_start_baseline.json")
+
+TIMED_METRICS = ("import_ms", "init_ms", "peak_rss_kb")
+# Absolute slack on top of the relative threshold, so scheduler noise on tiny numbers is not a regression
+NOISE_FLOOR = {"import_ms": 50, "init_ms": 50, "peak_rss_kb": 2048}
+
+# Runs inside the fresh interpreter: stub AWS, import the handler, report what it cost.
+CHILD_SCRIPT = r"""
+import importlib, json, resource, sys, time
+
+start = time.perf_counter()
+import botocore.client
+
+aws_calls = []
+canned_responses = {
+    "GetQueueUrl": {"QueueUrl": "https://sqs.us-east-2.amazonaws.com/000000000000/benchmark"},
+}
+
+def stub_api_call(self, operation_name, api_params):
+    aws_calls.append(f"{self.meta.service_model.service_name}.{operation_name}")
+    return canned_responses.get(operation_name, {})
+
+botocore.client.BaseClient._make_api_call = stub_api_call
+
+module_name, attribute = sys.argv[1].rsplit(".", 1)
+handler = getattr(importlib.import_module(module_name), attribute)
+import_ms = (time.perf_counter() - start) * 1000
+ready_at = time.time()
+
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    peak_rss //= 1024
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "ready_at": ready_at,
+    "peak_rss_kb": peak_rss,
+    "aws_calls": aws_calls,
+    "callable": callable(handler),
+}))
+"""
+
+
+def load_entry_points():
+    """Reads function names and handler paths from serverless.yml."""
+    with open(SERVERLESS_FILE) as f:
+        text = f.read()
+
+    functions = text.split("\nfunctions:", 1)[1]
+    return dict(re.findall(r"^  (\w+):\s*\n\s+handler:\s*(\S+)", functions, re.MULTILINE))
+
+
+def load_environment():
+    """Gives every variable in provider.environment, or read through os.getenv, a placeholder value."""
+    with open(SERVERLESS_FILE) as f:
+        names = set(re.findall(r"^    (\w+): \$\{env:", f.read(), re.MULTILINE))
+
+    for root, dirs, files in os.walk(PRODUCT_DIR):
+        dirs[:] = [d for d in dirs if d not in ("node_modules", "benchmarks") and not d.startswith(".")]
+        for file_name in files:
+            if file_name.endswith(".py"):
+                with open(os.path.join(root, file_name)) as f:
+                    names.update(re.findall(r"os\.getenv\(\s*[\"'](\w+)[\"']\s*\)", f.read()))
+
+    env = dict(os.environ)
+    for name in sorted(names):
+        env.setdefault(name, f"benchmark-{name.lower()}")
+
+    env.update({
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_DEFAULT_REGION": "us-east-2",
+        "AWS_EC2_METADATA_DISABLED": "true",
+        "API_KEY": env.get("API_KEY", "benchmark"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "PYTHONPATH": PRODUCT_DIR,
+    })
+    return env
+
+
+def measure(handler_path, env):
+    """Imports one handler in a fresh interpreter and returns its init metrics."""
+    started_at = time.time()
+    process = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, handler_path],
+        cwd=PRODUCT_DIR, env=env, capture_output=True, text=True,
+    )
+
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()
+        return {"error": error[-1] if error else f"exit code {process.returncode}"}
+
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    return {
+        "import_ms": result["import_ms"],
+        "init_ms": (result["ready_at"] - started_at) * 1000,
+        "peak_rss_kb": result["peak_rss_kb"],
+        "aws_calls": len(result["aws_calls"]),
+        "aws_operations": result["aws_calls"],
+    }
+
+
+def summarize(runs):
+    """Keeps the fastest run of each metric; the minimum is the least noisy estimate of the true cost."""
+    errors = [run["error"] for run in runs if "error" in run]
+    if errors:
+        return {"error": errors[0]}
+
+    summary = {metric: round(min(run[metric] for run in runs), 1) for metric in TIMED_METRICS}
+    summary["aws_calls"] = max(run["aws_calls"] for run in runs)
+    summary["aws_operations"] = sorted(set(op for run in runs for op in run["aws_operations"]))
+    return summary
+
+
+def find_regressions(name, current, baseline, threshold):
+    if "error" in current:
+        return [f"{name}: failed to initialise: {current['error']}"]
+    if not baseline:
+        return []
+
+    regressions = []
+    for metric in TIMED_METRICS:
+        limit = max(baseline[metric] * (1 + threshold), baseline[metric] + NOISE_FLOOR[metric])
+        if current[metric] > limit:
+            regressions.append(f"{name}: {metric} {current[metric]} > {baseline[metric]} (+{threshold:.0%})")
+
+    if current["aws_calls"] > baseline["aws_calls"]:
+        regressions.append(f"{name}: {current['aws_calls']} AWS calls during init ({', '.join(current['aws_operations'])})")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for every Lambda entry point.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing, e.g. 0.25 = 25%%")
+    parser.add_argument("--function", action="append", help="only measure these serverless function names")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    entry_points = load_entry_points()
+    if args.function:
+        entry_points = {name: path for name, path in entry_points.items() if name in args.function}
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+
+    env = load_environment()
+    results = {}
+    regressions = []
+
+    print(f"{'function':<26}{'import ms':>11}{'init ms':>10}{'peak rss kb':>13}{'aws calls':>11}")
+    for name, handler_path in entry_points.items():
+        current = summarize([measure(handler_path, env) for _ in range(args.runs)])
+        current["handler"] = handler_path
+        results[name] = current
+
+        if "error" in current:
+            print(f"{name:<26}error: {current['error']}")
+        else:
+            print(f"{name:<26}{current['import_ms']:>11}{current['init_ms']:>10}{current['peak_rss_kb']:>13}{current['aws_calls']:>11}")
+
+        regressions.extend(find_regressions(name, current, baseline.get(name), args.threshold))
+
+    if args.update_baseline:
+        import botocore
+        environment = {"python": sys.version.split()[0], "botocore": botocore.__version__, "platform": sys.platform}
+
+        with open(BASELINE_FILE, "w") as f:
+            json.dump({**baseline, **results, "_environment": environment}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE_FILE, PRODUCT_DIR)}")
+        return
+
+    if regressions:
+        print("\nregressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
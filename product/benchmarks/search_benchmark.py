@@ -0,0 +1,89 @@
+"""
+Compares the full-scan name search with the trigram index on a synthetic catalog.
+
+Run from the product directory:
+    python benchmarks/search_benchmark.py --products 100000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.search_index import POSTING_PAGE_SIZE, InMemoryIndexStore, ProductSearchIndex
+
+BRANDS = ["Asus", "MSI", "Gigabyte", "Corsair", "Kingston", "Samsung", "Intel", "AMD", "Nvidia", "Seagate", "Western Digital", "Cooler Master"]
+LINES = ["ROG", "TUF", "Aorus", "Vengeance", "Fury", "Evo", "Core", "Ryzen", "GeForce", "Barracuda", "Blue", "Hyper"]
+KINDS = ["Motherboard", "Graphics Card", "Memory Kit", "SSD", "Processor", "Hard Drive", "CPU Cooler", "Power Supply", "Case Fan"]
+
+
+def synthetic_catalog(size, seed):
+    rng = random.Random(seed)
+    return [
+        (f"prod-{i:07d}", f"{rng.choice(BRANDS)} {rng.choice(LINES)} {rng.choice(KINDS)} {rng.randint(100, 9999)}")
+        for i in range(size)
+    ]
+
+
+def scan_search(catalog, term):
+    """Mirrors the scan path: every product name is tested on every request."""
+    pattern = re.compile(re.escape(term.lower()))
+    return [product_id for product_id, name in catalog if pattern.search(name.lower())]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+class CountingIndexStore(InMemoryIndexStore):
+    """Counts the postings a search actually reads, page by page."""
+
+    rows_read = 0
+
+    def iter_postings(self, token, page_size=POSTING_PAGE_SIZE):
+        for page, is_last in super().iter_postings(token, page_size):
+            self.rows_read += len(page)
+            yield page, is_last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.products, args.seed)
+    queries = ["rog", "vengeance", "graphics card", "samsung evo", "4821", "western digital blue", "no such part"]
+
+    store = CountingIndexStore()
+    index = ProductSearchIndex(store)
+    build_seconds, _ = timed(lambda: index.add_many(catalog), 1)
+    print(f"catalog: {len(catalog):,} products, index built in {build_seconds:.2f}s")
+    print("rows read: items a scan has to read vs postings fetched for the query's rarest trigram")
+    print(f"{'query':<24}{'matches':>9}{'scan rows':>11}{'index rows':>12}{'scan ms':>10}{'index ms':>10}{'speedup':>9}")
+
+    for term in queries:
+        scan_seconds, scanned = timed(lambda: scan_search(catalog, term), args.repeat)
+        index_seconds, found = timed(lambda: index.search(term), args.repeat)
+        store.rows_read = 0
+        index.search(term)
+        index_rows = store.rows_read
+
+        if sorted(scanned) != sorted(found):
+            raise SystemExit(f"result mismatch for {term!r}: scan={len(scanned)} index={len(found)}")
+
+        print(
+            f"{term:<24}{len(found):>9,}{len(catalog):>11,}{index_rows:>12,}"
+            f"{scan_seconds * 1000:>10.2f}{index_seconds * 1000:>10.2f}{scan_seconds / index_seconds:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
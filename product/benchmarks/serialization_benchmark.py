@@ -0,0 +1,74 @@
+"""
+Compares DecimalEncoder with every serialization backend on catalog-sized DynamoDB payloads.
+
+Run from the product directory:
+    python benchmarks/serialization_benchmark.py --products 1000 10000 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper.serialization import BACKENDS, DecimalEncoder
+
+CATEGORIES = ["Motherboard", "Graphics Card", "Memory", "Storage", "Processor", "Power Supply", "Case", "Cooling"]
+BRANDS = ["Asus", "MSI", "Gigabyte", "Corsair", "Kingston", "Samsung", "Intel", "AMD"]
+
+
+def synthetic_response(size, seed):
+    """Builds a get_all_products response the way boto3 returns it: every number is a Decimal."""
+    rng = random.Random(seed)
+    items = [
+        {
+            "product_id": f"prod-{i:07d}",
+            "product_name": f"{rng.choice(BRANDS)} {rng.choice(CATEGORIES)} {rng.randint(100, 9999)}",
+            "category": rng.choice(CATEGORIES),
+            "brand_name": rng.choice(BRANDS),
+            "quantity": Decimal(rng.randint(0, 500)),
+            "price": Decimal(f"{rng.randint(1, 99999)}.{rng.randint(0, 99):02d}"),
+        }
+        for i in range(size)
+    ]
+    return {"statusCode": 200, "data": items}
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'products':>10}{'backend':>16}{'ms':>10}{'KiB':>10}{'speedup':>9}")
+    for size in args.products:
+        response = synthetic_response(size, args.seed)
+        baseline_seconds, baseline_body = timed(lambda: json.dumps(response, cls=DecimalEncoder), args.repeat)
+        expected = json.loads(baseline_body)
+        print(f"{size:>10,}{'DecimalEncoder':>16}{baseline_seconds * 1000:>10.1f}{len(baseline_body.encode()) / 1024:>10.0f}{1:>8.1f}x")
+
+        for name, dumps in BACKENDS.items():
+            seconds, body = timed(lambda: dumps(response), args.repeat)
+
+            if json.loads(body) != expected:
+                raise SystemExit(f"{name} output differs from DecimalEncoder for {size} products")
+
+            print(f"{'':>10}{name:>16}{seconds * 1000:>10.1f}{len(body.encode()) / 1024:>10.0f}{baseline_seconds / seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
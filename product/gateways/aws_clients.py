@@ -0,0 +1,99 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+DEFAULT_REGION = "us-east-2"
+
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+    connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.getenv("AWS_READ_TIMEOUT", "10")),
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "5"))},
+)
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+_queue_urls = {}
+_session_hooks = []
+
+
+def on_new_session(hook):
+    """Registers hook(session) to run on every boto3 session before any client is built from it."""
+    _session_hooks.append(hook)
+    if _session is not None:
+        hook(_session)
+    return hook
+
+
+def _new_session():
+    session = boto3.session.Session()
+    for hook in _session_hooks:
+        hook(session)
+    return session
+
+
+def get_session():
+    """Returns the boto3 session shared by every gateway, creating it on first use."""
+    global _session
+
+    with _lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+def get_client(service_name, region=DEFAULT_REGION):
+    """Returns the shared low-level client for a service, creating it on first use."""
+    key = (service_name, region)
+    client = _clients.get(key)
+
+    if client is None:
+        session = get_session()
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service_name, region_name=region, config=CLIENT_CONFIG)
+                _clients[key] = client
+
+    return client
+
+
+def get_resource(service_name, region=DEFAULT_REGION):
+    """Returns the shared boto3 resource for a service, creating it on first use."""
+    key = (service_name, region)
+    resource = _resources.get(key)
+
+    if resource is None:
+        session = get_session()
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = session.resource(service_name, region_name=region, config=CLIENT_CONFIG)
+                _resources[key] = resource
+
+    return resource
+
+
+def get_queue_url(queue_name, region=DEFAULT_REGION):
+    """Resolves a queue URL once per container instead of on every gateway construction."""
+    key = (queue_name, region)
+
+    if key not in _queue_urls:
+        _queue_urls[key] = get_client("sqs", region).get_queue_url(QueueName=queue_name)["QueueUrl"]
+
+    return _queue_urls[key]
+
+
+def reset():
+    """Drops every cached session, client and queue URL."""
+    global _session
+
+    with _lock:
+        _session = None
+        _clients.clear()
+        _resources.clear()
+        _queue_urls.clear()
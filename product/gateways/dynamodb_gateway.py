@@ -1,10 +1,133 @@
-import boto3
-from boto3.dynamodb.conditions import Key
+import base64
+import contextvars
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import botocore.exceptions
+from boto3.dynamodb.conditions import Attr, ConditionExpressionBuilder, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from gateways import aws_clients
+from gateways.metrics import instrumented
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_SCAN_SEGMENTS = 4
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+BATCH_MAX_RETRIES = 5
+
+
+def encode_cursor(last_evaluated_key):
+    """Turns a LastEvaluatedKey into an opaque, URL-safe continuation token."""
+    if not last_evaluated_key:
+        return None
+
+    def default(obj):
+        if isinstance(obj, Decimal):
+            return {"__decimal__": str(obj)}
+        raise TypeError(f"Unsupported key type: {type(obj).__name__}")
+
+    raw = json.dumps(last_evaluated_key, default=default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Turns a continuation token back into an ExclusiveStartKey."""
+    if not cursor:
+        return None
+
+    def object_hook(obj):
+        if set(obj) == {"__decimal__"}:
+            return Decimal(obj["__decimal__"])
+        return obj
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")), object_hook=object_hook)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(key, dict) or not key:
+        raise ValueError("Invalid cursor")
+
+    return key
+
+
+def parse_page_size(limit):
+    """Validates a requested page size, falling back to DEFAULT_PAGE_SIZE."""
+    if limit is None or limit == "":
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        raise ValueError("limit must be a positive integer")
+
+    if limit <= 0:
+        raise ValueError("limit must be a positive integer")
+
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def projection_kwargs(projection):
+    """Builds ProjectionExpression arguments, aliasing every name so reserved words like "datetime" work."""
+    if not projection:
+        return {}
+
+    names = {f"#p{i}": attribute for i, attribute in enumerate(projection)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+
+def low_level_kwargs(condition=None, projection=None):
+    """
+    Renders a boto3 condition and a projection for the low-level client, which, unlike the
+    resource, does not build expressions or serialize values itself.
+    """
+    request_kwargs = projection_kwargs(projection)
+    if condition is None:
+        return request_kwargs
+
+    expression = ConditionExpressionBuilder().build_expression(condition)
+    request_kwargs["FilterExpression"] = expression.condition_expression
+    request_kwargs["ExpressionAttributeNames"] = dict(
+        request_kwargs.get("ExpressionAttributeNames", {}), **expression.attribute_name_placeholders
+    )
+    if expression.attribute_value_placeholders:
+        serializer = TypeSerializer()
+        request_kwargs["ExpressionAttributeValues"] = {
+            placeholder: serializer.serialize(value) for placeholder, value in expression.attribute_value_placeholders.items()
+        }
+    return request_kwargs
+
+
+def is_condition_failure(error):
+    """Tells whether a boto3 error is a failed ConditionExpression."""
+    return (
+        isinstance(error, botocore.exceptions.ClientError)
+        and error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+    )
+
+
+@instrumented("DynamoDB")
 class DynamoDB:
     def __init__(self, table_name):
-        self.dynamodb = boto3.resource("dynamodb", "us-east-2")
-        self.table = self.dynamodb.Table(table_name)
+        self.region = aws_clients.DEFAULT_REGION
+        self.table_name = table_name
+        self._table = None
+
+    @property
+    def dynamodb(self):
+        return aws_clients.get_resource("dynamodb", self.region)
+
+    @property
+    def table(self):
+        """Builds the Table handle on first use so importing a handler makes no AWS calls."""
+        if self._table is None:
+            self._table = self.dynamodb.Table(self.table_name)
+        return self._table
         
         
     def item_exists(self, key):
@@ -15,30 +138,19 @@ class DynamoDB:
         except Exception as e:
             return {"statusCode": 500, "message": str(e)}
 
-    def put_item(self, item):
-        """Inserts a new item only if it does not already exist."""
-
-        key = {}
-
-        if "order_id" in item:
-            key["order_id"] = item["order_id"]
+    def put_item(self, item, condition=None):
+        """
+        Inserts a new item only if it does not already exist.
+        :param condition: Optional boto3 condition used instead of the "does not exist" check.
+        """
+        key_name = "order_id" if "order_id" in item else "product_id"
 
-        elif "product_id" in item:
-            key["product_id"] = item["product_id"]
-
-            if "datetime" in item:  
-                key["datetime"] = item["datetime"]
-        
-        
-    
-        if self.item_exists(key):
-            print(self.item_exists(key))
-            return {"statusCode": 400, "message": "Item already exists"}
-        
         try:
-            self.table.put_item(Item=item)
+            self.table.put_item(Item=item, ConditionExpression=condition or Attr(key_name).not_exists())
             return {"statusCode": 200, "message": "Item added successfully", "data": item}
         except Exception as e:
+            if is_condition_failure(e):
+                return {"statusCode": 400, "message": "Item already exists"}
             return {"statusCode": 500, "message": str(e)}
 
     def get_item(self, key):
@@ -52,47 +164,356 @@ class DynamoDB:
             return {"statusCode": 500, "message": str(e)}
 
     def get_all_items(self):
-        """Fetches all items from the table."""
+        """Fetches all items from the table, following every scan page."""
         try:
-            response = self.table.scan()
-            return {"statusCode": 200, "data": response.get("Items", [])}
+            items = []
+            for response in self._scan_pages():
+                items.extend(response.get("Items", []))
+            return {"statusCode": 200, "data": items}
         except Exception as e:
             return {"statusCode": 500, "message": str(e)}
 
-    def update_item(self, key, update_expression, expression_values):
-        """Updates an item only if it exists."""
-        if not self.item_exists(key):
-            return {"statusCode": 404, "message": "Item does not exist"}
+    def get_items_page(self, limit=None, cursor=None):
+        """Fetches one bounded page of items starting after the given cursor."""
+        try:
+            scan_kwargs = {"Limit": parse_page_size(limit)}
+            start_key = decode_cursor(cursor)
+        except ValueError as e:
+            return {"statusCode": 400, "message": str(e)}
+
+        if start_key:
+            scan_kwargs["ExclusiveStartKey"] = start_key
 
+        try:
+            response = self.table.scan(**scan_kwargs)
+            return {
+                "statusCode": 200,
+                "data": response.get("Items", []),
+                "cursor": encode_cursor(response.get("LastEvaluatedKey")),
+            }
+        except Exception as e:
+            return {"statusCode": 500, "message": str(e)}
+
+    def iter_pages(self, limit=None, cursor=None):
+        """Lazily yields pages of items, fetching the next one only when asked."""
+        while True:
+            page = self.get_items_page(limit, cursor)
+            if page["statusCode"] != 200:
+                raise ValueError(page["message"])
+
+            yield page
+
+            cursor = page["cursor"]
+            if not cursor:
+                return
+
+    def parallel_scan(self, total_segments=DEFAULT_SCAN_SEGMENTS, filter_expression=None, projection=None, max_buffered_pages=None):
+        """
+        Scans the table as `total_segments` concurrent Segment/TotalSegments workers.
+        :param total_segments: Number of segments, and threads, to split the table into.
+        :param filter_expression: Optional boto3 condition, e.g. Attr("quantity").lt(5).
+        :param projection: Optional list of attribute names to return.
+        :param max_buffered_pages: Pages held in memory before workers wait for the consumer.
+        :return: Generator yielding items in the order segments return them.
+        """
+        if total_segments < 1:
+            raise ValueError("total_segments must be at least 1")
+
+        # The registry's low-level client is thread safe, so every worker shares it and its connection pool
+        client = aws_clients.get_client("dynamodb", self.region)
+        deserializer = TypeDeserializer()
+        scan_kwargs = dict(low_level_kwargs(filter_expression, projection), TableName=self.table_name)
+
+        pages = queue.Queue(maxsize=max_buffered_pages or total_segments * 2)
+        stop = threading.Event()
+        done = object()
+
+        def publish(entry):
+            while not stop.is_set():
+                try:
+                    pages.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan_segment(segment):
+            try:
+                segment_kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+
+                while not stop.is_set():
+                    response = client.scan(**segment_kwargs)
+                    items = [
+                        {name: deserializer.deserialize(value) for name, value in item.items()}
+                        for item in response.get("Items", [])
+                    ]
+                    if not publish(items):
+                        return
+
+                    last_key = response.get("LastEvaluatedKey")
+                    if not last_key:
+                        break
+                    segment_kwargs["ExclusiveStartKey"] = last_key
+            except Exception as e:
+                publish(e)
+            finally:
+                publish(done)
+
+        executor = ThreadPoolExecutor(max_workers=total_segments)
+        try:
+            for segment in range(total_segments):
+                # each worker runs in a copy of the caller's context, so its requests are attributed to this scan
+                executor.submit(contextvars.copy_context().run, scan_segment, segment)
+
+            running = total_segments
+            while running:
+                entry = pages.get()
+                if entry is done:
+                    running -= 1
+                elif isinstance(entry, Exception):
+                    raise entry
+                else:
+                    yield from entry
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def _scan_pages(self, **scan_kwargs):
+        """Yields raw scan responses until LastEvaluatedKey runs out."""
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            yield response
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            scan_kwargs["ExclusiveStartKey"] = last_key
+
+    def batch_get_items(self, keys):
+        """Fetches items by key with BatchGetItem, 100 keys per request."""
+        items = []
+
+        try:
+            for start in range(0, len(keys), BATCH_GET_SIZE):
+                request = {self.table_name: {"Keys": keys[start:start + BATCH_GET_SIZE]}}
+
+                for attempt in range(BATCH_MAX_RETRIES + 1):
+                    response = self.dynamodb.batch_get_item(RequestItems=request)
+                    items.extend(response.get("Responses", {}).get(self.table_name, []))
+
+                    request = response.get("UnprocessedKeys")
+                    if not request:
+                        break
+                    time.sleep(min(0.05 * 2 ** attempt, 1))
+                else:
+                    return {"statusCode": 500, "message": "Some keys could not be read after retries"}
+
+            return {"statusCode": 200, "data": items}
+        except Exception as e:
+            return {"statusCode": 500, "message": str(e)}
+
+    def batch_put_items(self, items):
+        """
+        Writes items with BatchWriteItem in groups of 25, retrying unprocessed ones.
+        Unlike put_item this overwrites existing items, so callers check existence first.
+        :return: Response with the items that could not be written under "unprocessed".
+        """
+        unprocessed = []
+
+        for start in range(0, len(items), BATCH_WRITE_SIZE):
+            chunk = items[start:start + BATCH_WRITE_SIZE]
+            requests = [{"PutRequest": {"Item": item}} for item in chunk]
+
+            try:
+                leftover = self._batch_write(requests)
+                unprocessed.extend(request["PutRequest"]["Item"] for request in leftover)
+            except Exception as e:
+                print(f"Error: batch write failed: {e}")
+                unprocessed.extend(chunk)
+
+        return {
+            "statusCode": 200,
+            "message": f"{len(items) - len(unprocessed)} of {len(items)} items written",
+            "unprocessed": unprocessed,
+        }
+
+    def batch_delete_items(self, keys):
+        """Deletes items by key with BatchWriteItem in groups of 25, retrying unprocessed ones."""
+        unprocessed = []
+
+        for start in range(0, len(keys), BATCH_WRITE_SIZE):
+            chunk = keys[start:start + BATCH_WRITE_SIZE]
+            requests = [{"DeleteRequest": {"Key": key}} for key in chunk]
+
+            try:
+                leftover = self._batch_write(requests)
+                unprocessed.extend(request["DeleteRequest"]["Key"] for request in leftover)
+            except Exception as e:
+                print(f"Error: batch delete failed: {e}")
+                unprocessed.extend(chunk)
+
+        return {
+            "statusCode": 200,
+            "message": f"{len(keys) - len(unprocessed)} of {len(keys)} items deleted",
+            "unprocessed": unprocessed,
+        }
+
+    def _batch_write(self, requests):
+        """Sends one BatchWriteItem request, backing off on UnprocessedItems."""
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(self.table_name, [])
+
+            if not requests:
+                return []
+            time.sleep(min(0.05 * 2 ** attempt, 1))
+
+        return requests
+
+    def update_item(self, key, update_expression, expression_values, return_values="ALL_NEW"):
+        """
+        Updates an item only if it exists.
+        :param return_values: ALL_NEW or UPDATED_NEW come back as "updatedAttributes", ALL_OLD or UPDATED_OLD as "previousAttributes".
+        """
         try:
             response = self.table.update_item(
                 Key=key,
                 UpdateExpression=update_expression,
                 ExpressionAttributeValues=expression_values,
-                ReturnValues="ALL_NEW"
+                ConditionExpression=Attr(next(iter(key))).exists(),
+                ReturnValues=return_values
+            )
+            attributes_key = "previousAttributes" if return_values.endswith("_OLD") else "updatedAttributes"
+            return {"statusCode": 200, "message": "Item updated successfully", attributes_key: response.get("Attributes", {})}
+        except Exception as e:
+            if is_condition_failure(e):
+                return {"statusCode": 404, "message": "Item does not exist"}
+            return {"statusCode": 500, "message": str(e)}
+
+    def increment(self, key, attribute, delta, min_value=None, create_missing=False):
+        """
+        Atomically adds `delta` to a numeric attribute with UpdateExpression ADD, in one request.
+        :param min_value: When set, the update is rejected if it would leave the attribute below it.
+        :param create_missing: Create the item, starting the attribute from 0, instead of returning 404.
+        """
+        condition = None if create_missing else Attr(next(iter(key))).exists()
+        if min_value is not None:
+            guard = Attr(attribute).gte(min_value - delta)
+            condition = guard if condition is None else condition & guard
+
+        update_kwargs = {"ConditionExpression": condition} if condition is not None else {}
+
+        try:
+            response = self.table.update_item(
+                Key=key,
+                UpdateExpression="ADD #attr :delta",
+                ExpressionAttributeNames={"#attr": attribute},
+                ExpressionAttributeValues={":delta": delta},
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                **update_kwargs
             )
             return {"statusCode": 200, "message": "Item updated successfully", "updatedAttributes": response.get("Attributes", {})}
         except Exception as e:
+            if is_condition_failure(e):
+                if "Item" in e.response:
+                    return {"statusCode": 400, "message": f"{attribute} cannot go below {min_value}"}
+                return {"statusCode": 404, "message": "Item does not exist"}
+            return {"statusCode": 500, "message": str(e)}
+
+    def transact_write(self, actions):
+        """
+        Runs TransactWriteItems so every action succeeds or none does.
+        :param actions: TransactItems entries with TableName set and plain Python values; they are serialized by boto3.
+        :return: On cancellation, "reasons" holds one entry per action, in order, with its Code and the old Item when returned.
+        """
+        try:
+            self.dynamodb.meta.client.transact_write_items(TransactItems=actions)
+            return {"statusCode": 200, "message": "Transaction completed successfully"}
+        except Exception as e:
+            if isinstance(e, botocore.exceptions.ClientError) and e.response.get("Error", {}).get("Code") == "TransactionCanceledException":
+                return {"statusCode": 409, "message": "Transaction cancelled", "reasons": e.response.get("CancellationReasons", [])}
             return {"statusCode": 500, "message": str(e)}
 
-    def delete_item(self, key):
-        """Deletes an item only if it exists."""
-        if not self.item_exists(key):
-            return {"statusCode": 404, "message": "Item does not exist"}
+    def delete_item(self, key, return_values=None):
+        """Deletes an item only if it exists, optionally returning the deleted attributes."""
+        delete_kwargs = {"Key": key, "ConditionExpression": Attr(next(iter(key))).exists()}
+        if return_values:
+            delete_kwargs["ReturnValues"] = return_values
 
         try:
-            self.table.delete_item(Key=key)
-            return {"statusCode": 200, "message": "Item deleted successfully"}
+            response = self.table.delete_item(**delete_kwargs)
+            return {"statusCode": 200, "message": "Item deleted successfully", "deletedAttributes": response.get("Attributes", {})}
         except Exception as e:
+            if is_condition_failure(e):
+                return {"statusCode": 404, "message": "Item does not exist"}
             return {"statusCode": 500, "message": str(e)}
 
     def query_items(self, product_id):
-        """Queries items from DynamoDB using only the partition key (product_id)."""
+        """Queries every item with the given partition key (product_id), following all pages."""
+        return self.query_all(Key("product_id").eq(product_id))
+
+    def query_page(self, key_condition, limit=None, cursor=None, descending=False, projection=None, index_name=None):
+        """
+        Fetches one bounded page of a query.
+        :param key_condition: boto3 key condition, e.g. Key("product_id").eq(pid) & Key("datetime").between(a, b).
+        :param descending: Walk the sort key from newest to oldest.
+        :param projection: Optional list of attribute names to return.
+        :param index_name: Query a global secondary index instead of the table.
+        :return: Page of items and the cursor of the next page, None on the last one.
+        """
         try:
-            response = self.table.query(
-                KeyConditionExpression=Key("product_id").eq(product_id)
-            )
-            return {"statusCode": 200, "data": response.get("Items", [])}
+            query_kwargs = {"Limit": parse_page_size(limit)}
+            start_key = decode_cursor(cursor)
+        except ValueError as e:
+            return {"statusCode": 400, "message": str(e)}
+
+        query_kwargs.update(projection_kwargs(projection))
+        query_kwargs["KeyConditionExpression"] = key_condition
+        query_kwargs["ScanIndexForward"] = not descending
+        if index_name:
+            query_kwargs["IndexName"] = index_name
+        if start_key:
+            query_kwargs["ExclusiveStartKey"] = start_key
 
+        try:
+            response = self.table.query(**query_kwargs)
+            return {
+                "statusCode": 200,
+                "data": response.get("Items", []),
+                "cursor": encode_cursor(response.get("LastEvaluatedKey")),
+            }
         except Exception as e:
             return {"statusCode": 500, "message": str(e)}
+
+    def iter_query(self, key_condition, limit=None, cursor=None, descending=False, projection=None, index_name=None):
+        """Lazily yields query pages, fetching the next one only when asked."""
+        while True:
+            page = self.query_page(key_condition, limit, cursor, descending, projection, index_name)
+            if page["statusCode"] != 200:
+                raise ValueError(page["message"])
+
+            yield page
+
+            cursor = page["cursor"]
+            if not cursor:
+                return
+
+    def query_all(self, key_condition, **query_kwargs):
+        """Queries with any key condition and follows LastEvaluatedKey until every match is read."""
+        try:
+            items = []
+            query_kwargs["KeyConditionExpression"] = key_condition
+
+            while True:
+                response = self.table.query(**query_kwargs)
+                items.extend(response.get("Items", []))
+
+                last_key = response.get("LastEvaluatedKey")
+                if not last_key:
+                    break
+                query_kwargs["ExclusiveStartKey"] = last_key
+
+            return {"statusCode": 200, "data": items}
+        except Exception as e:
+            return {"statusCode": 500, "message": str(e)}
\ No newline at end of file
@@ -1,8 +1,56 @@
-import boto3
+import time
+from gateways import aws_clients
+from gateways.metrics import instrumented
 
+PUT_EVENTS_BATCH_SIZE = 10
+PUT_EVENTS_MAX_RETRIES = 3
+
+@instrumented("EventBridge")
 class EventbridgeGateway:
     @classmethod
     def put_event(cls, event):
-        client = boto3.client('events')
+        client = aws_clients.get_client('events', None)
+
+        return client.put_events(Entries=[event])
+
+    @classmethod
+    def put_events(cls, events):
+        """
+        Sends events with PutEvents, 10 entries per request.
+        Entries EventBridge rejects are retried one at a time with backoff.
+        :return: Dict with the number and list of entries that still failed.
+        """
+        client = aws_clients.get_client('events', None)
+        failed = []
+
+        for start in range(0, len(events), PUT_EVENTS_BATCH_SIZE):
+            batch = events[start:start + PUT_EVENTS_BATCH_SIZE]
+
+            try:
+                response = client.put_events(Entries=batch)
+            except Exception as e:
+                print(f"Error: PutEvents failed: {e}")
+                failed.extend(batch)
+                continue
+
+            for entry, result in zip(batch, response.get("Entries", [])):
+                if result.get("ErrorCode") and not cls._retry_entry(client, entry):
+                    failed.append(entry)
+
+        return {"FailedEntryCount": len(failed), "FailedEntries": failed}
+
+    @classmethod
+    def _retry_entry(cls, client, entry):
+        for attempt in range(PUT_EVENTS_MAX_RETRIES):
+            time.sleep(min(0.05 * 2 ** attempt, 1))
+
+            try:
+                result = client.put_events(Entries=[entry])["Entries"][0]
+            except Exception as e:
+                result = {"ErrorCode": type(e).__name__, "ErrorMessage": str(e)}
+
+            if not result.get("ErrorCode"):
+                return True
 
-        return client.put_events(Entries=[event])
\ No newline at end of file
+        print(f"Error: event {entry.get('DetailType')} was not delivered: {result.get('ErrorCode')} {result.get('ErrorMessage', '')}")
+        return False
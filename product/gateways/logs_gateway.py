@@ -1,27 +1,197 @@
-import boto3
+import contextvars
+import os
 import time
 import json
+import threading
+import botocore.exceptions
+from gateways import aws_clients
+from gateways.metrics import instrumented
 
+# PutLogEvents limits: 10,000 events and 1,048,576 bytes per call, each event counting 26 bytes on top of its message
+MAX_BATCH_EVENTS = 10_000
+MAX_BATCH_BYTES = 1_048_576
+EVENT_OVERHEAD_BYTES = 26
+MAX_EVENT_BYTES = 256 * 1024 - EVENT_OVERHEAD_BYTES
+# The events of one call may not span more than 24 hours
+MAX_BATCH_SPAN_MS = 24 * 60 * 60 * 1000
+PUT_LOG_EVENTS_ATTEMPTS = 3
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL", "1"))
+# After a failed flush, messages go straight to stdout for this long before CloudWatch is tried again
+DEGRADED_SECONDS = 60
+
+
+def event_size(event):
+    return len(event["message"].encode("utf-8")) + EVENT_OVERHEAD_BYTES
+
+
+def log_batches(events):
+    """Splits time-ordered events into batches that fit within every PutLogEvents limit."""
+    batch, batch_bytes = [], 0
+
+    for event in events:
+        size = event_size(event)
+        if batch and (
+            len(batch) == MAX_BATCH_EVENTS
+            or batch_bytes + size > MAX_BATCH_BYTES
+            or event["timestamp"] - batch[0]["timestamp"] > MAX_BATCH_SPAN_MS
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(event)
+        batch_bytes += size
+
+    if batch:
+        yield batch
+
+
+@instrumented("CloudWatchLogs")
 class CloudWatchLogger:
-    def __init__(self, log_group_name, log_stream_name, region="us-east-1"):
-        self.client = boto3.client('logs', region_name=region)
+    """
+    Collects log events in memory and sends them with PutLogEvents from a background thread,
+    in batches bounded by the API's count and size limits.
+    flush() sends whatever is left; it is registered with on_invocation_end wherever a logger is created,
+    so nothing is held back while the container is frozen. When CloudWatch cannot be reached,
+    the events are printed to stdout instead, where the function's own log group still captures them.
+    """
+
+    def __init__(self, log_group_name, log_stream_name, region=aws_clients.DEFAULT_REGION, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.region = region
         self.log_group_name = log_group_name
         self.log_stream_name = log_stream_name
+        self.flush_interval = flush_interval
         self.sequence_token = None  # Stores the latest sequence token
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        # one PutLogEvents at a time, so each call carries the token returned by the previous one
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._degraded_until = 0.0
+
+    @property
+    def client(self):
+        return aws_clients.get_client('logs', self.region)
 
     def send_log(self, message):
-        """Sends a log message to CloudWatch."""
-
-        log_event = {
-            "logGroupName": self.log_group_name,
-            "logStreamName": self.log_stream_name,
-            "logEvents": [
-                {
-                    "timestamp": int(time.time() * 1000),  # Convert time to milliseconds
-                    "message": json.dumps(message)  # Convert message to JSON
-                }
-            ],
+        """Queues a message for CloudWatch; it is sent by the background thread or the next flush()."""
+        text = json.dumps(message)
+        if len(text.encode("utf-8")) > MAX_EVENT_BYTES:
+            text = text.encode("utf-8")[:MAX_EVENT_BYTES].decode("utf-8", "ignore")
+
+        event = {
+            "timestamp": int(time.time() * 1000),  # Convert time to milliseconds
+            "message": text,
         }
 
-        response = self.client.put_log_events(**log_event)
-        print(f"Log sent: {response}")
\ No newline at end of file
+        if time.monotonic() < self._degraded_until:
+            self._print([event])
+            return
+
+        with self._lock:
+            self._pending.append(event)
+            self._pending_bytes += event_size(event)
+            full = len(self._pending) >= MAX_BATCH_EVENTS or self._pending_bytes >= MAX_BATCH_BYTES
+
+        self._start_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Sends every buffered event now; the ones CloudWatch does not take are printed to stdout."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending, self._pending_bytes = self._pending, [], 0
+
+            if not events:
+                return
+
+            # PutLogEvents wants each batch in chronological order; threads may have appended out of order
+            events.sort(key=lambda event: event["timestamp"])
+            batches = list(log_batches(events))
+
+            for index, batch in enumerate(batches):
+                if not self._put_log_events(batch):
+                    self._degraded_until = time.monotonic() + DEGRADED_SECONDS
+                    self._print([event for unsent in batches[index:] for event in unsent])
+                    return
+
+    def _start_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                # An empty context of its own: flushes are timed as CloudWatchLogs.flush, never under the operation
+                # or trace span of whichever invocation happened to start the thread
+                self._thread = threading.Thread(
+                    target=contextvars.Context().run, args=(self._flush_periodically,),
+                    name=f"logs-{self.log_group_name}", daemon=True,
+                )
+                self._thread.start()
+
+    def _flush_periodically(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error: background flush to {self.log_group_name} failed: {e}")
+
+    def _put_log_events(self, batch):
+        """Sends one batch, following the sequence token CloudWatch expects; returns whether it was accepted."""
+        for _ in range(PUT_LOG_EVENTS_ATTEMPTS):
+            put_kwargs = {"logGroupName": self.log_group_name, "logStreamName": self.log_stream_name, "logEvents": batch}
+            if self.sequence_token:
+                put_kwargs["sequenceToken"] = self.sequence_token
+
+            try:
+                response = self.client.put_log_events(**put_kwargs)
+            except botocore.exceptions.ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+
+                if code == "DataAlreadyAcceptedException":
+                    self.sequence_token = e.response.get("expectedSequenceToken")
+                    return True
+                if code == "InvalidSequenceTokenException":
+                    self.sequence_token = e.response.get("expectedSequenceToken")
+                    continue
+                if code == "ResourceNotFoundException" and self._create_log_stream():
+                    self.sequence_token = None
+                    continue
+
+                print(f"Error: log events could not be sent to {self.log_group_name}: {e}")
+                return False
+            except botocore.exceptions.BotoCoreError as e:
+                print(f"Error: log events could not be sent to {self.log_group_name}: {e}")
+                return False
+
+            self.sequence_token = response.get("nextSequenceToken")
+            if response.get("rejectedLogEventsInfo"):
+                print(f"Error: CloudWatch rejected some log events: {response['rejectedLogEventsInfo']}")
+            return True
+
+        print(f"Error: log events could not be sent to {self.log_group_name} after {PUT_LOG_EVENTS_ATTEMPTS} attempts")
+        return False
+
+    def _create_log_stream(self):
+        """Creates the log group and stream on first use; returns whether both exist afterwards."""
+        try:
+            for create, create_kwargs in (
+                (self.client.create_log_group, {"logGroupName": self.log_group_name}),
+                (self.client.create_log_stream, {"logGroupName": self.log_group_name, "logStreamName": self.log_stream_name}),
+            ):
+                try:
+                    create(**create_kwargs)
+                except botocore.exceptions.ClientError as e:
+                    if e.response.get("Error", {}).get("Code") != "ResourceAlreadyExistsException":
+                        raise
+            return True
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            print(f"Error: log stream {self.log_group_name}/{self.log_stream_name} could not be created: {e}")
+            return False
+
+    def _print(self, events):
+        for event in events:
+            print(f"Notice: [{self.log_group_name}] {event['message']}")
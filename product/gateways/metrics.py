@@ -0,0 +1,261 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from gateways import aws_clients
+from helper.invocation import on_invocation_end
+
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "python-serverless-miles")
+# Set to NONE to stop asking DynamoDB for consumed capacity on every request
+RETURN_CONSUMED_CAPACITY = os.getenv("METRICS_CONSUMED_CAPACITY", "TOTAL")
+# EMF accepts at most 100 values per metric in one document
+MAX_VALUES_PER_METRIC = 100
+THROTTLE_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+}
+
+# The gateway call in progress; AWS responses received while it runs are counted against it
+_current_operation = contextvars.ContextVar("gateway_operation", default=None)
+
+
+class StdoutSink:
+    """Prints each document on its own line, where Lambda's log agent turns it into CloudWatch metrics."""
+
+    def emit(self, document):
+        print(json.dumps(document))
+
+
+class MemorySink:
+    """Keeps documents in a list, for tests and benchmarks."""
+
+    def __init__(self):
+        self.documents = []
+
+    def emit(self, document):
+        self.documents.append(document)
+
+    def clear(self):
+        self.documents.clear()
+
+
+class NullSink:
+    def emit(self, document):
+        pass
+
+
+SINKS = {"stdout": StdoutSink, "memory": MemorySink, "off": NullSink}
+
+
+class GatewayMetrics:
+    """Latency, call, error, throttle and consumed capacity figures per gateway operation for one invocation."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, operation):
+        entry = self._operations.get(operation)
+        if entry is None:
+            entry = self._operations[operation] = {"Latency": [], "Calls": 0, "Errors": 0, "Throttles": 0, "ConsumedCapacity": None}
+        return entry
+
+    def record_call(self, operation, milliseconds, failed):
+        with self._lock:
+            entry = self._entry(operation)
+            entry["Latency"].append(round(milliseconds, 3))
+            entry["Calls"] += 1
+            entry["Errors"] += int(failed)
+
+    def record_throttle(self, operation):
+        with self._lock:
+            self._entry(operation)["Throttles"] += 1
+
+    def record_capacity(self, operation, units):
+        with self._lock:
+            entry = self._entry(operation)
+            entry["ConsumedCapacity"] = (entry["ConsumedCapacity"] or 0) + units
+
+    def snapshot(self):
+        """Returns and resets everything recorded so far."""
+        with self._lock:
+            operations, self._operations = self._operations, {}
+        return operations
+
+    def flush(self):
+        """Emits one embedded metric format document per operation, dimensioned by function and operation."""
+        function_name = os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local")
+        timestamp = int(time.time() * 1000)
+
+        for operation, entry in sorted(self.snapshot().items()):
+            for document in emf_documents(function_name, operation, entry, timestamp):
+                self.sink.emit(document)
+
+
+def emf_documents(function_name, operation, entry, timestamp):
+    """Builds the EMF documents for one operation; latencies beyond 100 values spill into extra documents."""
+    latencies = entry["Latency"] or [None]
+
+    for start in range(0, len(latencies), MAX_VALUES_PER_METRIC):
+        values = {}
+        if latencies[0] is not None:
+            values["Latency"] = ("Milliseconds", latencies[start:start + MAX_VALUES_PER_METRIC])
+        if start == 0:
+            for name in ("Calls", "Errors", "Throttles"):
+                values[name] = ("Count", entry[name])
+            if entry["ConsumedCapacity"] is not None:
+                values["ConsumedCapacity"] = ("Count", entry["ConsumedCapacity"])
+
+        document = {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["FunctionName", "Operation"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (unit, _) in values.items()],
+                }],
+            },
+            "FunctionName": function_name,
+            "Operation": operation,
+        }
+        document.update({name: value for name, (_, value) in values.items()})
+        yield document
+
+
+gateway_metrics = GatewayMetrics(SINKS.get(os.getenv("METRICS_SINK", "stdout"), StdoutSink)())
+# Runs after the other end hooks, so the calls they make while flushing are in this invocation's figures
+on_invocation_end(gateway_metrics.flush, priority=100)
+
+
+def use_sink(sink):
+    """Replaces where documents go, e.g. use_sink(MemorySink()) in a test or benchmark."""
+    gateway_metrics.sink = sink
+    return sink
+
+
+def is_failed_result(result):
+    """Gateways report most failures in their return value instead of raising."""
+    if not isinstance(result, dict):
+        return False
+    status_code = result.get("statusCode")
+    return (
+        (isinstance(status_code, int) and status_code >= 500)
+        or result.get("status") == "error"
+        or bool(result.get("FailedEntryCount"))
+    )
+
+
+def timed(operation, method):
+    """
+    Wraps one gateway method. Only the outermost gateway call is timed, so a method built on
+    another one (upload_stream on put_object, query_items on query_all) is not counted twice.
+    Generators are timed while they produce items, not while the caller consumes them.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            generator = method(*args, **kwargs)
+            elapsed, failed = 0.0, False
+            nested = _current_operation.get() is not None
+
+            try:
+                while True:
+                    token = _current_operation.set(_current_operation.get() or operation)
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    except Exception:
+                        failed = True
+                        raise
+                    finally:
+                        elapsed += time.perf_counter() - start
+                        _current_operation.reset(token)
+                    yield item
+            finally:
+                generator.close()
+                if not nested:
+                    gateway_metrics.record_call(operation, elapsed * 1000, failed)
+
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _current_operation.get() is not None:
+            return method(*args, **kwargs)
+
+        token = _current_operation.set(operation)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(*args, **kwargs)
+            failed = is_failed_result(result)
+            return result
+        finally:
+            gateway_metrics.record_call(operation, (time.perf_counter() - start) * 1000, failed)
+            _current_operation.reset(token)
+
+    return wrapper
+
+
+def instrumented(gateway_name):
+    """Class decorator timing every public method of a gateway, including class and static methods."""
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_"):
+                continue
+
+            operation = f"{gateway_name}.{name}"
+            if isinstance(attribute, classmethod):
+                setattr(cls, name, classmethod(timed(operation, attribute.__func__)))
+            elif isinstance(attribute, staticmethod):
+                setattr(cls, name, staticmethod(timed(operation, attribute.__func__)))
+            elif inspect.isfunction(attribute):
+                setattr(cls, name, timed(operation, attribute))
+
+        return cls
+
+    return decorate
+
+
+def request_consumed_capacity(params, model, **kwargs):
+    """Asks DynamoDB to report consumed capacity on every request that supports it."""
+    if RETURN_CONSUMED_CAPACITY != "NONE" and "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", RETURN_CONSUMED_CAPACITY)
+
+
+def record_response(parsed_response=None, context=None, **kwargs):
+    """Runs on every AWS response, retries included, so throttles absorbed by botocore are still counted."""
+    operation = _current_operation.get()
+    if operation is None or not parsed_response:
+        return
+
+    if parsed_response.get("Error", {}).get("Code") in THROTTLE_ERROR_CODES:
+        gateway_metrics.record_throttle(operation)
+
+    consumed = parsed_response.get("ConsumedCapacity")
+    if consumed:
+        entries = consumed if isinstance(consumed, list) else [consumed]
+        gateway_metrics.record_capacity(operation, sum(entry.get("CapacityUnits", 0) for entry in entries))
+
+
+def instrument_session(session):
+    if RETURN_CONSUMED_CAPACITY != "NONE":
+        session.events.register("provide-client-params.dynamodb", request_consumed_capacity)
+    session.events.register("response-received", record_response)
+
+
+aws_clients.on_new_session(instrument_session)
@@ -1,12 +1,23 @@
-import boto3
+import codecs
+import csv
 import botocore.exceptions
+from gateways import aws_clients
+from gateways.metrics import instrumented
 
+# S3's minimum size for every part of a multipart upload but the last
+MULTIPART_PART_SIZE = 5 * 1024 * 1024
+DELETE_OBJECTS_BATCH_SIZE = 1000
+
+@instrumented("S3")
 class S3Gateway:
     def __init__(self, bucket_name):
-        """Initialize the S3 client with a specified bucket and region."""
-        self.s3_client = boto3.client("s3", "us-east-2")
+        """Initialize the gateway for a bucket; the shared S3 client is created on first use."""
         self.bucket_name = bucket_name
 
+    @property
+    def s3_client(self):
+        return aws_clients.get_client("s3")
+
     def upload_file(self, file_path, s3_key):
         """Uploads a file to S3."""
         try:
@@ -15,6 +26,128 @@ class S3Gateway:
         except botocore.exceptions.BotoCoreError as e:
             return {"status": "error", "message": str(e)}
 
+    def put_object(self, s3_key, body, content_type=None, content_encoding=None, metadata=None, if_match=None):
+        """
+        Writes bytes held in memory to S3 in a single request.
+        :param if_match: Only overwrite the object if its ETag is still this one; otherwise "status" is "conflict".
+        """
+        put_kwargs = {"Bucket": self.bucket_name, "Key": s3_key, "Body": body}
+        if content_type:
+            put_kwargs["ContentType"] = content_type
+        if content_encoding:
+            put_kwargs["ContentEncoding"] = content_encoding
+        if metadata:
+            put_kwargs["Metadata"] = metadata
+        if if_match:
+            put_kwargs["IfMatch"] = if_match
+
+        try:
+            response = self.s3_client.put_object(**put_kwargs)
+            return {"status": "success", "message": f"File {s3_key} uploaded successfully", "etag": response.get("ETag")}
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return {"status": "conflict", "message": f"File {s3_key} was changed by another writer"}
+            return {"status": "error", "message": str(e)}
+        except botocore.exceptions.BotoCoreError as e:
+            return {"status": "error", "message": str(e)}
+
+    def upload_stream(self, s3_key, chunks, content_type=None, part_size=MULTIPART_PART_SIZE):
+        """
+        Uploads an iterable of byte chunks without staging it on disk.
+        Anything smaller than one part goes up with a single PutObject; larger streams use a multipart upload
+        that sends each part as soon as it fills and is aborted if anything fails.
+        """
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = self._create_multipart_upload(s3_key, content_type)
+                    parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer[:part_size])))
+                    del buffer[:part_size]
+
+            if upload_id is None:
+                return self.put_object(s3_key, bytes(buffer), content_type=content_type)
+
+            if buffer:
+                parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer)))
+
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+            return {"status": "success", "message": f"File {s3_key} uploaded successfully in {len(parts)} parts"}
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            if upload_id is not None:
+                self._abort_multipart_upload(s3_key, upload_id)
+            return {"status": "error", "message": str(e)}
+        except Exception:
+            # A failing chunk source must not leave an incomplete upload behind either
+            if upload_id is not None:
+                self._abort_multipart_upload(s3_key, upload_id)
+            raise
+
+    def _create_multipart_upload(self, s3_key, content_type):
+        upload_kwargs = {"Bucket": self.bucket_name, "Key": s3_key}
+        if content_type:
+            upload_kwargs["ContentType"] = content_type
+        return self.s3_client.create_multipart_upload(**upload_kwargs)["UploadId"]
+
+    def _upload_part(self, s3_key, upload_id, part_number, body):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _abort_multipart_upload(self, s3_key, upload_id):
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id)
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            print(f"Error: multipart upload {upload_id} of {s3_key} could not be aborted: {e}")
+
+    def get_object(self, s3_key):
+        """Reads a whole object into memory, with its user metadata and ETag."""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return {
+                "status": "success",
+                "body": response["Body"].read(),
+                "metadata": response.get("Metadata", {}),
+                "etag": response.get("ETag"),
+            }
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return {"status": "not_found", "message": f"File {s3_key} does not exist"}
+            return {"status": "error", "message": str(e)}
+        except botocore.exceptions.BotoCoreError as e:
+            return {"status": "error", "message": str(e)}
+
+    def head_object(self, s3_key):
+        """Reads an object's size, user metadata and ETag without downloading it."""
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return {
+                "status": "success",
+                "size": response.get("ContentLength", 0),
+                "metadata": response.get("Metadata", {}),
+                "etag": response.get("ETag"),
+            }
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return {"status": "not_found", "message": f"File {s3_key} does not exist"}
+            return {"status": "error", "message": str(e)}
+        except botocore.exceptions.BotoCoreError as e:
+            return {"status": "error", "message": str(e)}
+
+    def presigned_url(self, s3_key, expires_in=300):
+        """Returns a time-limited GET URL so clients can download the object straight from S3."""
+        return self.s3_client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket_name, "Key": s3_key}, ExpiresIn=expires_in
+        )
+
     def download_file(self, s3_key, download_path):
         """Downloads a file from S3."""
         try:
@@ -29,4 +162,41 @@ class S3Gateway:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
             return {"status": "success", "message": f"File {s3_key} deleted successfully"}
         except botocore.exceptions.BotoCoreError as e:
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+
+    def iter_objects(self, prefix=""):
+        """Lists every object under a prefix, following ListObjectsV2 pages lazily."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            yield from page.get("Contents", [])
+
+    def iter_bytes(self, s3_key, chunk_size=1024 * 1024):
+        """Streams an object's body in chunks instead of reading it into memory at once."""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+        yield from response["Body"].iter_chunks(chunk_size)
+
+    def delete_objects(self, s3_keys):
+        """Deletes objects with DeleteObjects, 1000 keys per request; returns the keys that were not deleted."""
+        failed = []
+
+        for start in range(0, len(s3_keys), DELETE_OBJECTS_BATCH_SIZE):
+            chunk = s3_keys[start:start + DELETE_OBJECTS_BATCH_SIZE]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+                )
+                failed.extend(error["Key"] for error in response.get("Errors", []))
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+                print(f"Error: delete of {len(chunk)} objects failed: {e}")
+                failed.extend(chunk)
+
+        return {"status": "success" if not failed else "error", "failed": failed}
+
+    def iter_csv_rows(self, s3_key):
+        """Streams a CSV object from S3, yielding one dict per row without staging it on disk."""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+        lines = codecs.iterdecode(response["Body"].iter_lines(keepends=True), "utf-8-sig")
+
+        yield from csv.DictReader(lines)
\ No newline at end of file
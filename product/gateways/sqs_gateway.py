@@ -1,10 +1,25 @@
-import boto3
+import time
+from gateways import aws_clients
+from gateways.metrics import instrumented
 
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_PAYLOAD_BYTES = 256 * 1024
+MAX_BATCH_RETRIES = 3
+
+@instrumented("SQS")
 class SQSGateway:
     def __init__(self, queue_name, region_name='us-east-2'):
-        """Initialize the SQS client with the given queue name."""
-        self.sqs = boto3.resource('sqs', region_name=region_name)
-        self.queue = self.sqs.get_queue_by_name(QueueName=queue_name)
+        """Initialize the gateway for a queue; the URL is resolved and cached on first send."""
+        self.queue_name = queue_name
+        self.region_name = region_name
+        self._queue = None
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            sqs = aws_clients.get_resource('sqs', self.region_name)
+            self._queue = sqs.Queue(aws_clients.get_queue_url(self.queue_name, self.region_name))
+        return self._queue
 
     def send_message(self, message_body, message_attributes=None):
         """
@@ -16,4 +31,66 @@ class SQSGateway:
         response = self.queue.send_message(
             MessageBody=message_body
         )
-        return response
\ No newline at end of file
+        return response
+
+    def send_messages(self, message_bodies):
+        """
+        Send messages with SendMessageBatch, packing up to 10 messages and 256 KiB per request.
+        Entries SQS fails on its side are retried; sender faults are not.
+        :param message_bodies: List of message contents.
+        :return: List of failed entries, each with Id, Code, Message and the MessageBody.
+        """
+        failed = []
+
+        for batch in self._pack(message_bodies, failed):
+            failed.extend(self._send_batch(batch))
+
+        return failed
+
+    def _pack(self, message_bodies, failed):
+        """Groups bodies into batches that respect both the entry-count and payload-size limits."""
+        batch, batch_size = [], 0
+
+        for index, body in enumerate(message_bodies):
+            size = len(body.encode("utf-8"))
+
+            if size > MAX_BATCH_PAYLOAD_BYTES:
+                failed.append({"Id": str(index), "Code": "MessageTooLong", "Message": f"{size} bytes", "SenderFault": True, "MessageBody": body})
+                continue
+
+            if len(batch) == MAX_BATCH_ENTRIES or batch_size + size > MAX_BATCH_PAYLOAD_BYTES:
+                yield batch
+                batch, batch_size = [], 0
+
+            batch.append({"Id": str(index), "MessageBody": body})
+            batch_size += size
+
+        if batch:
+            yield batch
+
+    def _send_batch(self, entries):
+        failed = []
+
+        for attempt in range(MAX_BATCH_RETRIES + 1):
+            try:
+                results = self.queue.send_messages(Entries=entries).get("Failed", [])
+            except Exception as e:
+                results = [{"Id": entry["Id"], "Code": type(e).__name__, "Message": str(e), "SenderFault": False} for entry in entries]
+
+            by_id = {entry["Id"]: entry for entry in entries}
+            retry = []
+
+            for result in results:
+                entry = by_id[result["Id"]]
+                if result.get("SenderFault") or attempt == MAX_BATCH_RETRIES:
+                    failed.append(dict(result, MessageBody=entry["MessageBody"]))
+                else:
+                    retry.append(entry)
+
+            if not retry:
+                break
+
+            entries = retry
+            time.sleep(min(0.05 * 2 ** attempt, 1))
+
+        return failed
@@ -6,12 +6,8 @@ import csv
 import codecs
 import string
 import random
+from helper.serialization import DecimalEncoder
 
-class DecimalEncoder(json.JSONEncoder):
-  def default(self, obj):
-    if isinstance(obj, Decimal):
-      return str(obj)
-    return json.JSONEncoder.default(self, obj)
 
 def check_if_product_exist(product_id, table_name):
     db = boto3.resource("dynamodb", "us-east-2")
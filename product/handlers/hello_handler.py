@@ -1,3 +1,5 @@
+import json
+
 def hello(event, context):
     body = {
         "message": "Go Serverless v4.0! Your function executed successfully!",
@@ -1,7 +1,11 @@
 from decimal import Decimal
 import json
 from gateways.dynamodb_gateway import DynamoDB
-from helper.helper_func import DecimalEncoder, generate_code
+from gateways.logs_gateway import CloudWatchLogger
+from helper.helper_func import generate_code
+from helper import serialization
+from helper.invocation import lambda_handler, on_invocation_end
+from helper.http_response import compress_response
 import os
 from models.order import Order
 from models.product import Product
@@ -10,12 +14,15 @@ import time
 
 #gateway initialization
 db_handler = DynamoDB(os.getenv("ORDERS_TABLE"))
+logger = CloudWatchLogger("orders-created-logs", "current-logs")
+on_invocation_end(logger.flush)
 
 def get_current_datetime():
     """Returns the current date and time in 'YYYY-MM-DD HH:MM:SS' format."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+@lambda_handler
 def order_handler(event, context):
     http_method = event["requestContext"]["http"]["method"]
     order_id = event.get("pathParameters", {}).get("order_id", "none")
@@ -33,22 +40,28 @@ def order_handler(event, context):
     
     return HANDLER[http_method]()
 
+@lambda_handler
 def get_all_orders(event, context):
     try:
-        response = db_handler.get_all_items()
+        params = event.get("queryStringParameters") or {}
+
+        if "limit" in params or "cursor" in params:
+            response = db_handler.get_items_page(params.get("limit"), params.get("cursor"))
+        else:
+            response = db_handler.get_all_items()
         
         if response["statusCode"] != 200:
             return response
         
-        return {
+        return compress_response(event, {
             "statusCode": 200,
-            "body": json.dumps(response, cls=DecimalEncoder),
+            "body": serialization.dumps(response),
             "headers": {
                 "Access-Control-Allow-Origin": "*",  # Allow all origins
                 "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
                 "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
             }
-        }
+        })
         
     except Exception as e:
         return {"statusCode": 500, "message": str(e),
@@ -62,6 +75,36 @@ def generate_order_id():
     timestamp = int(time.time() * 1000)  # Get current time in milliseconds
     return f"ord-{timestamp}"
 
+@lambda_handler
+def list_orders(event, context):
+    """Lists one user's orders (?user_id=) or the orders in one status (?status=) through the table's indexes."""
+    try:
+        params = event.get("queryStringParameters") or {}
+        descending = params.get("order", "desc").lower() != "asc"
+
+        if params.get("user_id"):
+            response = Order.query_by_user(params["user_id"], params.get("limit"), params.get("cursor"), descending)
+        elif params.get("status"):
+            response = Order.query_by_status(params["status"], params.get("limit"), params.get("cursor"), descending)
+        else:
+            return {"statusCode": 400, "body": json.dumps({"message": "user_id or status is required"})}
+
+        if response["statusCode"] != 200:
+            return response
+
+        return compress_response(event, {
+            "statusCode": 200,
+            "body": serialization.dumps(response),
+            "headers": {
+                "Access-Control-Allow-Origin": "*",  # Allow all origins
+                "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+                "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+            }
+        })
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+@lambda_handler
 def post_order(event, context):
     try:
         body = json.loads(event["body"], parse_float=Decimal)
@@ -88,16 +131,7 @@ def post_order(event, context):
             except ValueError:
                 raise ValueError(f"Invalid quantity value: {body.get('quantity')}. Must be a valid number.")
 
-        if body["quantity"] > prod_data['data'].get("quantity"):
-            return {
-                "body": {"statusCode": 500, "message": "quantity is greater than current stock"},
-                "headers": {
-                    "Access-Control-Allow-Origin": "*",  # Allow all origins
-                    "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
-                    "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
-                }
-            }
-        
+        # the stock check happens inside the order transaction, so concurrent orders cannot oversell
 
         price_per_unit = prod_data['data'].get("price")
 
@@ -127,7 +161,7 @@ def post_order(event, context):
                     "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
                 }
             }
-        #logger.send_log({"event": "product_created", "body": json.dumps(body, cls=DecimalEncoder), "status": "Success"})
+        logger.send_log({"event": "order_created", "body": serialization.dumps(body), "status": "Success"})
         
         return {
             "body": response,
@@ -1,28 +1,39 @@
-from openai import OpenAI
 import os
 import json
 from decimal import Decimal
 from gateways.dynamodb_gateway import DynamoDB
-from helper.helper_func import DecimalEncoder
+from helper import serialization
+from helper.invocation import lambda_handler
 
-key = os.getenv("API_KEY")
-client = OpenAI(api_key = key)
 db_handler = DynamoDB(os.getenv("DB_NAME"))
+_client = None
 
 
+def get_openai_client():
+    """Imports and builds the OpenAI client on first use; the SDK is slow to import."""
+    global _client
+
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key = os.getenv("API_KEY"))
+
+    return _client
+
+
+@lambda_handler
 def generate_pc_build(event, context):
     try:
         amount = event.get("pathParameters", {}).get("amount", "none")
         response = db_handler.get_all_items()
 
 
-        completion = client.chat.completions.create(
+        completion = get_openai_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {
                     "role": "user",
-                    "content": f"create a pc build that cost around {amount} use these pc parts for building {json.dumps(response, cls=DecimalEncoder)}"
+                    "content": f"create a pc build that cost around {amount} use these pc parts for building {serialization.dumps(response)}"
                 }
             ]
         )
@@ -1,30 +1,104 @@
 import json
 import urllib
 import csv
+import decimal
 from decimal import Decimal
 from models.product import Product
+from models.search_index import search_index
 from gateways.dynamodb_gateway import DynamoDB
 from gateways.s3_gateway import S3Gateway
 from gateways.logs_gateway import CloudWatchLogger
-from helper.helper_func import DecimalEncoder, generate_code
+from helper.helper_func import generate_code, chunked
+from helper import serialization
+from helper.invocation import lambda_handler, on_invocation_end
+from helper.http_response import accepts_encoding, choose_encoding, compress_response, entity_tag, get_header, is_not_modified, not_modified, with_etag
+from models.catalog_version import catalog_version
+from models.catalog_snapshot import catalog_snapshot
+from models.export_compaction import export_compactor
+import base64
+import gzip
+import io
 import os
 import re
+from collections import Counter
 
 #gateway initialization
 db_handler = DynamoDB(os.getenv("DB_NAME"))
 product_s3 = S3Gateway(os.getenv("PRODUCT_BUCKET_NAME"))
 sqs_s3 = S3Gateway(os.getenv("SQS_BUCKET_NAME"))
 logger = CloudWatchLogger("products-created-logs", "current-logs")
+on_invocation_end(logger.flush)
 
+INGEST_CHUNK_SIZE = 500
+SQS_CSV_FIELDNAMES = ["product_id", "product_name", "price", "quantity", "brand_name"]
+SNAPSHOT_MODE = os.getenv("CATALOG_SNAPSHOT_MODE", "serve")
+# Larger snapshots are redirected to S3; base64 would push them past Lambda's 6 MB response limit
+MAX_INLINE_SNAPSHOT_BYTES = 4 * 1024 * 1024
 
 
+def snapshot_response(event, headers):
+    """Serves the full listing from the S3 snapshot, or returns None so the caller scans the table instead."""
+    # Only the metadata is read first: redirects and revalidations never need the body
+    snapshot = catalog_snapshot.fetch(with_body=False)
+
+    if snapshot is None:
+        return None
+
+    if SNAPSHOT_MODE == "redirect" or snapshot["size"] > MAX_INLINE_SNAPSHOT_BYTES:
+        return {"statusCode": 302, "headers": dict(headers, Location=catalog_snapshot.url())}
+
+    coding = "gzip" if accepts_encoding(event, "gzip") else (choose_encoding(get_header(event, "Accept-Encoding")) or "identity")
+    etag = snapshot_etag(snapshot, coding)
+    if is_not_modified(event, etag):
+        return not_modified(etag, headers)
+
+    # The object can be replaced between the two reads, so the ETag sent is the one of the body sent
+    snapshot = catalog_snapshot.fetch()
+    if snapshot is None:
+        return None
+    etag = snapshot_etag(snapshot, coding)
+
+    headers = dict(headers, **{"Content-Type": "application/json", "Vary": "Accept-Encoding"})
+
+    if coding == "gzip":
+        # The object is already the gzipped response body, so it is passed through untouched
+        headers["Content-Encoding"] = "gzip"
+        return with_etag({
+            "statusCode": 200,
+            "body": base64.b64encode(snapshot["body"]).decode("ascii"),
+            "isBase64Encoded": True,
+            "headers": headers,
+        }, etag)
+
+    return with_etag(compress_response(event, {
+        "statusCode": 200,
+        "body": gzip.decompress(snapshot["body"]).decode("utf-8"),
+        "headers": headers,
+    }), etag)
+
+def snapshot_etag(snapshot, coding):
+    """The snapshot can lag the catalog version, so its ETag comes from the S3 object, not from the version."""
+    object_etag = snapshot["etag"].strip('"')
+    return f'"snapshot-{object_etag}-{coding}"'
+
+def catalog_etag(event):
+    """ETag of the catalog as it is now, or None when no version stamp is configured."""
+    if catalog_version is None:
+        return None
+
+    # Read before the data, so a write in between can only make the ETag older than the body, never newer
+    version = catalog_version.current()
+    return entity_tag(event, version) if version is not None else None
+
+
+@lambda_handler
 def product_handler(event, context):
     http_method = event["requestContext"]["http"]["method"]
     product_id = event.get("pathParameters", {}).get("product_id", "none")
 
 
     HANDLER = {
-        "GET": lambda: get_product(product_id), 
+        "GET": lambda: get_product(product_id, event), 
         "DELETE": lambda: delete_product(product_id), 
         "PUT": lambda: update_product(product_id, json.loads(event["body"], parse_float=Decimal))
     }
@@ -35,23 +109,46 @@ def product_handler(event, context):
     
     return HANDLER[http_method]()
         
+@lambda_handler
 def get_all_products(event, context):
     try:
-        response = db_handler.get_all_items()
+        etag = catalog_etag(event)
+        if etag and is_not_modified(event, etag):
+            return not_modified(etag, {
+                "Access-Control-Allow-Origin": "*",  # Allow all origins
+                "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+                "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+            })
+
+        params = event.get("queryStringParameters") or {}
+
+        if "limit" in params or "cursor" in params:
+            response = db_handler.get_items_page(params.get("limit"), params.get("cursor"))
+        else:
+            if catalog_snapshot is not None:
+                snapshot = snapshot_response(event, {
+                    "Access-Control-Allow-Origin": "*",  # Allow all origins
+                    "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+                    "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+                })
+                if snapshot is not None:
+                    return snapshot
+
+            response = db_handler.get_all_items()
         
         if response["statusCode"] != 200:
             return response
         
-        return {
+        return with_etag(compress_response(event, {
             "statusCode": 200,
-            "body": json.dumps(response, cls=DecimalEncoder),
+            "body": serialization.dumps(response),
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",  # Allow all origins
                 "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
                 "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
             }
-        }
+        }), etag)
         
     except Exception as e:
         return {"statusCode": 500, "message": str(e),
@@ -62,6 +159,7 @@ def get_all_products(event, context):
             }}
     
 
+@lambda_handler
 def post_product(event, context):
     try:
         body = json.loads(event["body"], parse_float=Decimal)
@@ -87,7 +185,7 @@ def post_product(event, context):
                     "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
                 }
             }
-        #logger.send_log({"event": "product_created", "body": json.dumps(body, cls=DecimalEncoder), "status": "Success"})
+        logger.send_log({"event": "product_created", "body": serialization.dumps(body), "status": "Success"})
         
         return {
             "body": response,
@@ -108,19 +206,32 @@ def post_product(event, context):
                     "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
                 }}
         
-def get_product(product_id):
+def get_product(product_id, event):
     try:
+        headers = {
+            "Access-Control-Allow-Origin": "*",  # Allow all origins
+            "Access-Control-Allow-Methods": "GET",  # Allowed HTTP methods
+            "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+        }
+
+        etag = catalog_etag(event)
+        if etag and is_not_modified(event, etag):
+            return not_modified(etag, headers)
+
         product = Product(product_id=product_id)
-        response = product.get()
+        # The in-container cache can lag writes made by other containers; a body sent under the
+        # current catalog ETag must be read from the table, or clients would revalidate stale data
+        response = product.get(use_cache=etag is None)
+
+        if response["statusCode"] != 200:
+            return {"statusCode": response["statusCode"], "body": json.dumps({"message": response["message"]}), "headers": headers}
         
-        return {
-            "body": response["data"],
-            "headers": {
-                "Access-Control-Allow-Origin": "*",  # Allow all origins
-                "Access-Control-Allow-Methods": "GET",  # Allowed HTTP methods
-                "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
-            }
-        }
+        # Same JSON as before, now wrapped in a real response so the ETag reaches the client as a header
+        return with_etag({
+            "statusCode": 200,
+            "body": serialization.dumps({"body": response["data"], "headers": headers}),
+            "headers": dict(headers, **{"Content-Type": "application/json"}),
+        }, etag)
         
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"message": str(e)}),
@@ -175,86 +286,207 @@ def update_product(product_id, body):
                 "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
             }}
 
+def build_product_from_row(row):
+    """Builds a Product from a CSV row, raising ValueError for malformed values."""
+    try:
+        return Product(
+            product_id=row['product_id'],
+            product_name=row['product_name'],
+            category=row.get("category") or "",
+            price=Decimal(row['price']),
+            quantity=int(row['quantity']),
+            brand_name=row.get("brand_name") or ""
+        )
+    except KeyError as e:
+        raise ValueError(f"Missing column: {e}")
+    except (TypeError, decimal.InvalidOperation):
+        raise ValueError("Price and quantity must be valid numbers")
+
+def ingest_product_rows(numbered_rows):
+    """Validates and bulk-creates one chunk of (row_number, row) pairs."""
+    report = []
+    products = []
+    row_numbers = []
+
+    for row_number, row in numbered_rows:
+        try:
+            products.append(build_product_from_row(row))
+            row_numbers.append(row_number)
+        except ValueError as e:
+            report.append({"row": row_number, "product_id": row.get("product_id"), "status": "failed", "message": str(e)})
+
+    for row_number, result in zip(row_numbers, Product.bulk_create(products)):
+        report.append({"row": row_number, **result})
+
+    return sorted(report, key=lambda entry: entry["row"])
+
+def iter_s3_objects(event):
+    """Yields an (S3Gateway, key) pair for every record in an S3 notification."""
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+        gateway = product_s3 if bucket == product_s3.bucket_name else S3Gateway(bucket)
+
+        yield gateway, key
+
+@lambda_handler
 def batch_create_products(event, context):
     print("file uploaded trigger")
     print(event)
     
-    key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
-    localFilename = f'/tmp/for_create.csv'
-    
-    try:
-        product_s3.download_file(key, localFilename)
-        
-        with open(localFilename, 'r') as f:
-            csv_reader = csv.DictReader(f)
-            for row in csv_reader:
-                product = Product(
-                    product_id=row['product_id'],
-                    product_name=row['product_name'],
-                    price=Decimal(row['price']),
-                    quantity=int(row['quantity']),
-                    brand_name=row.get("brand_name", "")
-                )
-                #logger.send_log({"event": "product_created", "body": json.dumps(row, cls=DecimalEncoder), "status": "Success"})
-                product.create()
-        print("Notice: products from the csv file successfully added to the products table")
-    except ValueError as e:
-        print(f"Error: {e}")
+    report = []
+
+    for s3_object, key in iter_s3_objects(event):
+        try:
+            rows = s3_object.iter_csv_rows(key)
+            for chunk in chunked(enumerate(rows, start=1), INGEST_CHUNK_SIZE):
+                report.extend({"key": key, **entry} for entry in ingest_product_rows(chunk))
+        except Exception as e:
+            print(f"Error: failed to process {key}: {e}")
+            report.append({"key": key, "row": None, "product_id": None, "status": "failed", "message": str(e)})
 
+    failed = [entry for entry in report if entry["status"] != "success"]
+    print(f"Notice: {len(report) - len(failed)} of {len(report)} products from the csv files added to the products table")
+    for entry in failed:
+        print(f"Error: {entry['key']} row {entry['row']} ({entry['product_id']}): {entry['message']}")
+
+    return {
+        "statusCode": 200,
+        "succeeded": len(report) - len(failed),
+        "failed": len(failed),
+        "report": report
+    }
+
+@lambda_handler
 def batch_delete_products(event, context):
     print("file uploaded trigger")
     print(event)
     
-    key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
-    localFilename = f'/tmp/for_create.csv'
-    
-    try:
-        product_s3.download_file(key, localFilename)
-        
-        with open(localFilename, 'r') as f:
-            csv_reader = csv.DictReader(f)
-            for row in csv_reader:
+    for s3_object, key in iter_s3_objects(event):
+        try:
+            for row in s3_object.iter_csv_rows(key):
                 product = Product(product_id=row['product_id'])
                 product.delete()
-        print("Notice: products from the csv file successfully deleted")
-    except ValueError as e:
-        print(f"Error: {e}")
+            print(f"Notice: products from {key} successfully deleted")
+        except Exception as e:
+            print(f"Error: failed to process {key}: {e}")
+
+def product_csv_line(record):
+    """Renders one product created message as a CSV line; raises ValueError when the body is not a product."""
+    product = json.loads(record["body"])
+    if not isinstance(product, dict) or not product.get("product_id"):
+        raise ValueError("message body is not a product")
 
+    line = io.StringIO()
+    # Messages carry more fields than the export has columns, e.g. category; those are left out
+    csv.DictWriter(line, fieldnames=SQS_CSV_FIELDNAMES, extrasaction="ignore").writerow(product)
+    return line.getvalue().encode("utf-8")
+
+@lambda_handler
 def receive_message_from_sqs(event, context):
-    print(event)
-    fieldnames=["product_id", "product_name", "price", "quantity", "brand_name"]
-    file_randomized_prefix = generate_code("pycon_", 8)
-    file_name = f'/tmp/product_created_{file_randomized_prefix}.csv'
-    object_name = f'product_created_{file_randomized_prefix}.csv'
-    
-    
-    with open(file_name, 'w') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        for payload in event["Records"]:
-            json_payload = json.loads(payload["body"])
-            writer.writerow(json_payload)
-    
-    response = sqs_s3.upload_file(file_name, object_name)
-        
-    print("All done!")
-    return {}
+    """
+    Writes a batch of product created messages to one CSV object, assembled in memory and streamed to S3.
+    Messages that could not be written are returned as batchItemFailures, so SQS retries only those.
+    """
+    object_name = f'product_created_{generate_code("pycon_", 8)}.csv'
+    lines = []
+    failed_ids = []
 
-def search_by_name(event, context):
+    for record in event["Records"]:
+        try:
+            lines.append((record["messageId"], product_csv_line(record)))
+        except (ValueError, TypeError) as e:
+            print(f"Error: message {record['messageId']} could not be read: {e}")
+            failed_ids.append(record["messageId"])
+
+    if lines:
+        response = sqs_s3.upload_stream(object_name, (line for _, line in lines), content_type="text/csv")
+
+        if response["status"] != "success":
+            print(f"Error: {object_name} could not be uploaded: {response['message']}")
+            failed_ids.extend(message_id for message_id, _ in lines)
+        else:
+            print(f"Notice: {len(lines)} products written to {object_name}")
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]}
+
+@lambda_handler
+def compact_product_exports(event, context):
+    """
+    Scheduled job: merges the product_created_*.csv objects into gzipped, date partitioned parts with manifests.
+    Stops starting new parts when the invocation is about to time out; the next run picks up where it stopped.
+    """
+    time_left = context.get_remaining_time_in_millis if context is not None else None
+    response = export_compactor.run(SQS_CSV_FIELDNAMES, time_left=time_left)
+
+    if response["status"] != "success":
+        raise RuntimeError(f"{response['failed']} export parts could not be compacted")
+
+    return {"statusCode": 200, "message": f"{response['parts']} parts written, {response['deleted']} objects deleted"}
+
+def scan_search(product_name):
+    """Fallback search that scans the whole table; used for terms shorter than a trigram."""
     response = db_handler.get_all_items()
-    product_name = event.get("pathParameters", {}).get("name", "none")
-    filtered_data = {"data": []}
 
-    datas = response["data"]
+    if response["statusCode"] != 200:
+        return response
+
+    pattern = re.compile(re.escape(product_name.lower()))
+    return {"statusCode": 200, "data": [data for data in response["data"] if pattern.search(str(data.get("product_name", "")).lower())]}
+
+def index_search(product_name, limit=None):
+    """Looks the term up in the trigram index and loads the matching products in rank order."""
+    product_ids = search_index.search(product_name, limit)
+
+    if product_ids is None:
+        return scan_search(product_name)
+    if not product_ids:
+        return {"statusCode": 200, "data": []}
+
+    response = db_handler.batch_get_items([{"product_id": product_id} for product_id in product_ids])
+
+    if response["statusCode"] != 200:
+        return response
+
+    items = {item["product_id"]: item for item in response["data"]}
+    return {"statusCode": 200, "data": [items[product_id] for product_id in product_ids if product_id in items]}
+
+@lambda_handler
+def search_by_name(event, context):
+    product_name = urllib.parse.unquote(event.get("pathParameters", {}).get("name", "none"))
+    params = event.get("queryStringParameters") or {}
+
+    etag = catalog_etag(event)
+    if etag and is_not_modified(event, etag):
+        return not_modified(etag, {
+            "Access-Control-Allow-Origin": "*",  # Allow all origins
+            "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+            "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+        })
+
+    try:
+        limit = int(params["limit"]) if params.get("limit") else None
+        if limit is not None and limit <= 0:
+            raise ValueError
+    except ValueError:
+        return {"statusCode": 400, "message": "limit must be a positive integer"}
 
-    for data in datas:
-        match_name = re.search(product_name.lower(), data.get("product_name").lower())
-        if match_name:
-            filtered_data["data"].append(data)
+    if search_index is not None:
+        try:
+            response = index_search(product_name, limit)
+        except ValueError as e:
+            return {"statusCode": 400, "message": str(e)}
+    else:
+        response = scan_search(product_name)
+        if limit and response["statusCode"] == 200:
+            response["data"] = response["data"][:limit]
 
     if response["statusCode"] != 200:
             return response
+
+    filtered_data = {"data": response["data"]}
     
-    if filtered_data["data"]:
+    if not filtered_data["data"]:
         return {
             "body": {"statusCode": 404, "message": "item does not exist"},
             "headers": {
@@ -264,12 +496,96 @@ def search_by_name(event, context):
             }
         }
         
-    return {
+    return with_etag(compress_response(event, {
         "statusCode": 200,
-        "body": json.dumps(filtered_data, cls=DecimalEncoder),
+        "body": serialization.dumps(filtered_data),
         "headers": {
             "Access-Control-Allow-Origin": "*",  # Allow all origins
             "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
             "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
         }
-    }
\ No newline at end of file
+    }), etag)
+
+@lambda_handler
+def rebuild_search_index(event, context):
+    """Backfills the name search index from the products table."""
+    if search_index is None:
+        return {"statusCode": 400, "message": "SEARCH_INDEX_TABLE is not configured"}
+
+    indexed = 0
+    posting_counts = Counter()
+    items = db_handler.parallel_scan(projection=["product_id", "product_name"])
+
+    for chunk in chunked(items, INGEST_CHUNK_SIZE):
+        # Counts are totalled here and written once, so rerunning the backfill does not inflate them
+        posting_counts.update(search_index.add_many(
+            [(item["product_id"], item.get("product_name", "")) for item in chunk], count=False
+        ))
+        indexed += len(chunk)
+
+    search_index.rebuild_counts(posting_counts)
+    print(f"Notice: {indexed} products added to the search index")
+    return {"statusCode": 200, "message": f"{indexed} products indexed"}
+
+def snapshot_refresh_target(record):
+    """
+    Reads the product_id out of one queued product event, or None when it carries none.
+    Stock updates are refreshed like any other change, so served quantities are never older than the queue's backlog.
+    """
+    try:
+        event = json.loads(record["body"])
+        detail = event.get("detail") or {}
+        if isinstance(detail, str):
+            detail = json.loads(detail)
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"Error: message {record.get('messageId')} is not a product event: {e}")
+        return None
+
+    product_id = detail.get("product_id")
+    if not product_id:
+        print(f"Error: message {record.get('messageId')} has no product_id")
+    return product_id or None
+
+@lambda_handler
+def refresh_catalog_snapshot(event, context):
+    """
+    SQS consumer for the product_added, product_delete and product_updated events.
+    Every product in the batch is patched into the catalog snapshot with one read and one conditional write;
+    if that fails, the whole batch is reported back so SQS retries it.
+    """
+    if catalog_snapshot is None:
+        print("Notice: CATALOG_SNAPSHOT_MODE is off, dropping snapshot refresh events")
+        return {"batchItemFailures": []}
+
+    product_ids = set()
+    message_ids = []
+    for record in event["Records"]:
+        product_id = snapshot_refresh_target(record)
+        if product_id:
+            product_ids.add(product_id)
+            message_ids.append(record["messageId"])
+
+    if not product_ids:
+        return {"batchItemFailures": []}
+
+    response = catalog_snapshot.refresh(product_ids)
+
+    if response["status"] != "success":
+        print(f"Error: catalog snapshot refresh for {len(product_ids)} products failed: {response['message']}")
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in message_ids]}
+
+    print(f"Notice: catalog snapshot refreshed for {len(product_ids)} products")
+    return {"batchItemFailures": []}
+
+@lambda_handler
+def rebuild_catalog_snapshot(event, context):
+    """Scheduled job: rebuilds the catalog snapshot from a full table scan."""
+    if catalog_snapshot is None:
+        return {"statusCode": 400, "message": "CATALOG_SNAPSHOT_MODE is off"}
+
+    response = catalog_snapshot.rebuild()
+
+    if response["status"] != "success":
+        raise RuntimeError(f"catalog snapshot rebuild failed: {response['message']}")
+
+    return {"statusCode": 200, "message": "catalog snapshot rebuilt"}
@@ -3,26 +3,27 @@ from models.product import Product
 from decimal import Decimal
 import decimal
 import json
-from datetime import datetime
-from helper.helper_func import DecimalEncoder
+from datetime import datetime, timedelta
+from helper import serialization
+from helper.invocation import lambda_handler
 from models.EventBridgeEvent import EventbridgeEvent
 import os
 from gateways.dynamodb_gateway import DynamoDB
 
 db_handler = DynamoDB(os.getenv("DB_INVENTORY_NAME"))
+product_db_handler = DynamoDB(os.getenv("DB_NAME"))
+
+COMPACT_AFTER_DAYS = int(os.getenv("INVENTORY_COMPACT_AFTER_DAYS", "30"))
+COMPACT_MIN_ROWS = int(os.getenv("INVENTORY_COMPACT_MIN_ROWS", "50"))
 
 def get_current_datetime():
     """Returns the current date and time in 'YYYY-MM-DD HH:MM:SS' format."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 def query_inventory(product_id):
-    response = db_handler.query_items(product_id)
-    
-    if response["statusCode"] == 200:
-        return json.dumps(response["data"], cls=DecimalEncoder)
-    
-    return response
+    return db_handler.query_items(product_id)
 
+@lambda_handler
 def post_product_inv(event, context):
     try:
         print(event)
@@ -46,6 +47,7 @@ def post_product_inv(event, context):
     except ValueError as e:
         return {"message": e}
 
+@lambda_handler
 def delete_product_inv(event, context):
     try:
         print(event)
@@ -53,7 +55,10 @@ def delete_product_inv(event, context):
         if 'detail' in event:
             body = event['detail']
             
-            products = json.loads(query_inventory(body["product_id"]))
+            response = query_inventory(body["product_id"])
+            if response["statusCode"] != 200:
+                return response
+            products = response["data"]
             
             for product in products:
                 product_inv = Product_Inventory(
@@ -71,6 +76,7 @@ def delete_product_inv(event, context):
     except ValueError as e:
         return {"message": e}
 
+@lambda_handler
 def add_stocks(event, context):
     try:
         body = json.loads(event["body"], parse_float=Decimal)
@@ -85,16 +91,17 @@ def add_stocks(event, context):
         response = product_inv.create()
         
         if response["statusCode"] == 200:
-            event = EventbridgeEvent("stocks_added", json.dumps(product_inv.get_data(), cls=DecimalEncoder))
+            event = EventbridgeEvent("stocks_added", serialization.dumps(product_inv.get_data()))
             event.send()
         
         return {
             "body": response,
-            "data": json.dumps(body, cls=DecimalEncoder)
+            "data": serialization.dumps(body)
         }
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
 
+@lambda_handler
 def update_total_quantity(event, context):
     try:
         print(event)
@@ -103,15 +110,83 @@ def update_total_quantity(event, context):
             body = event['detail']
 
             product = Product(product_id=body["product_id"])
-            data = product.get()['data']
-            print(data)
-
-            sum = int(data["quantity"]) + int(body.get("quantity"))
-            print(sum)
-            response = product.update({"quantity": int(sum)})
+            # the ledger row for this movement is already written, so the total must follow it even below zero
+            response = product.add_quantity(int(body.get("quantity")), allow_negative=True)
            
             print(response)
             return response
 
     except ValueError as e:
-        return {"message": e}
\ No newline at end of file
+        return {"message": e}
+
+@lambda_handler
+def get_stock_balance(event, context):
+    try:
+        product_id = event.get("pathParameters", {}).get("product_id", "none")
+
+        response = Product_Inventory(product_id=product_id).balance()
+
+        if response["statusCode"] != 200:
+            return response
+
+        return {
+            "statusCode": 200,
+            "body": serialization.dumps(response),
+            "headers": {
+                "Access-Control-Allow-Origin": "*",  # Allow all origins
+                "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+                "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+            }
+        }
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+@lambda_handler
+def get_stock_history(event, context):
+    try:
+        product_id = event.get("pathParameters", {}).get("product_id", "none")
+        params = event.get("queryStringParameters") or {}
+        fields = [field for field in params.get("fields", "").split(",") if field]
+
+        response = Product_Inventory(product_id=product_id).query_history(
+            start=params.get("from"),
+            end=params.get("to"),
+            descending=params.get("order", "asc").lower() == "desc",
+            limit=params.get("limit"),
+            cursor=params.get("cursor"),
+            projection=fields,
+        )
+
+        if response["statusCode"] != 200:
+            return response
+
+        return {
+            "statusCode": 200,
+            "body": serialization.dumps(response),
+            "headers": {
+                "Access-Control-Allow-Origin": "*",  # Allow all origins
+                "Access-Control-Allow-Methods": "POST, GET, OPTIONS",  # Allowed HTTP methods
+                "Access-Control-Allow-Headers": "Content-Type"  # Allowed headers
+            }
+        }
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+@lambda_handler
+def compact_inventory_ledger(event, context):
+    """Scheduled job: folds ledger rows older than INVENTORY_COMPACT_AFTER_DAYS into each product's snapshot."""
+    cutoff = (datetime.now() - timedelta(days=COMPACT_AFTER_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    compacted = 0
+    failed = []
+
+    for item in product_db_handler.parallel_scan(projection=["product_id"]):
+        response = Product_Inventory(product_id=item["product_id"]).compact(cutoff, min_rows=COMPACT_MIN_ROWS)
+
+        if response["statusCode"] == 200:
+            compacted += response["compacted"]
+        else:
+            print(f"Error: compaction of {item['product_id']} failed: {response['message']}")
+            failed.append(item["product_id"])
+
+    print(f"Notice: {compacted} ledger rows compacted, {len(failed)} products failed")
+    return {"statusCode": 200, "compacted": compacted, "failed": failed}
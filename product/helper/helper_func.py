@@ -1,8 +1,7 @@
-import json
 import decimal
-from decimal import Decimal
 import string
 import random
+from itertools import islice
 
 def build_update_expression(body):
     """Builds the update expression and values for updating a product."""
@@ -37,11 +36,6 @@ def build_update_expression(body):
 
     return expression_to_update, expression_val
 
-class DecimalEncoder(json.JSONEncoder):
-  def default(self, obj):
-    if isinstance(obj, Decimal):
-      return str(obj)
-    return json.JSONEncoder.default(self, obj)
 
 def validate_update_product(product_id, body):
     """Validates product update request."""
@@ -61,6 +55,8 @@ def validate_update_product(product_id, body):
         except (ValueError, decimal.InvalidOperation):
             raise ValueError("Price must be a valid decimal number")
         
+        if not price.is_finite():
+            raise ValueError("Price must be a finite number")
         if price < 0:
             raise ValueError("Price cannot be negative")
 
@@ -74,4 +70,13 @@ def validate_update_product(product_id, body):
 
 def generate_code(prefix, string_length):
   letters = string.ascii_uppercase
-  return prefix + ''.join(random.choice(letters) for i in range(string_length))
\ No newline at end of file
+  return prefix + ''.join(random.choice(letters) for i in range(string_length))
+
+def chunked(iterable, size):
+  """Yields lists of at most `size` items without materialising the whole iterable."""
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
\ No newline at end of file
@@ -0,0 +1,147 @@
+import base64
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as they are; compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Catalog reads may be reused for this long, then must be revalidated with If-None-Match
+CACHE_CONTROL = f"public, max-age={int(os.getenv('CATALOG_MAX_AGE', '0'))}, must-revalidate"
+
+
+def get_header(event, name):
+    """Reads a request header regardless of case; HTTP API lowercases them but local runs may not."""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parses an Accept-Encoding header into {coding: quality}.
+    :param accept_encoding: e.g. "gzip, deflate, br;q=0.9, *;q=0"
+    """
+    encodings = {}
+
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        encodings[coding] = quality
+
+    return encodings
+
+
+def accepts_encoding(event, coding):
+    """Tells whether the client accepts one specific content coding."""
+    encodings = accepted_encodings(get_header(event, "Accept-Encoding"))
+    return encodings.get(coding, encodings.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding):
+    """Picks the best coding the client accepts: brotli when it is installed, then gzip."""
+    encodings = accepted_encodings(accept_encoding)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    candidates = [
+        (encodings.get(coding, encodings.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(supported)
+    ]
+    quality, _, coding = max(candidates)
+
+    return coding if quality > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(event, response):
+    """
+    Compresses a handler response's string body when the client accepts it and it is large enough.
+    The body is returned base64 encoded with isBase64Encoded set, as API Gateway expects for binary bodies.
+    """
+    body = response.get("body")
+    if not isinstance(body, str) or response.get("isBase64Encoded"):
+        return response
+
+    headers = dict(response.get("headers") or {})
+    headers["Vary"] = "Accept-Encoding"
+    response = dict(response, headers=headers)
+
+    raw = body.encode("utf-8")
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return response
+
+    encoding = choose_encoding(get_header(event, "Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    compressed = compress(raw, encoding)
+    print(f"Notice: {encoding} compressed response from {len(raw)} to {len(compressed)} bytes (ratio {len(raw) / len(compressed):.1f}x)")
+
+    headers["Content-Encoding"] = encoding
+    response["body"] = base64.b64encode(compressed).decode("ascii")
+    response["isBase64Encoded"] = True
+    return response
+
+
+def entity_tag(event, version):
+    """
+    Builds a strong ETag for a catalog read at the given catalog version.
+    The negotiated coding is part of it, since gzip and identity bodies are different representations.
+    """
+    coding = choose_encoding(get_header(event, "Accept-Encoding")) or "identity"
+    return f'"catalog-{version}-{coding}"'
+
+
+def is_not_modified(event, etag):
+    """Tells whether the request's If-None-Match already names this ETag."""
+    header = get_header(event, "If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    # If-None-Match uses the weak comparison, so a W/ prefix added by a proxy still matches
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def not_modified(etag, headers):
+    """A 304 for a client whose cached copy is still current; it carries no body."""
+    headers = dict(headers)
+    headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"})
+    return {"statusCode": 304, "headers": headers}
+
+
+def with_etag(response, etag):
+    """Adds the ETag and Cache-Control headers to a successful response."""
+    if etag is None:
+        return response
+
+    headers = dict(response.get("headers") or {})
+    headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return dict(response, headers=headers)
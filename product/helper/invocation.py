@@ -0,0 +1,44 @@
+import functools
+
+_start_hooks = []
+_end_hooks = []
+
+
+def on_invocation_start(hook):
+    """Registers hook(event, context) to run before every @lambda_handler invocation."""
+    _start_hooks.append(hook)
+    return hook
+
+
+def on_invocation_end(hook, priority=0):
+    """
+    Registers hook() to run after every @lambda_handler invocation, even if the handler raised.
+    :param priority: Hooks run in ascending priority, then in registration order; reporting hooks
+        that must see the work of the other hooks use a higher one.
+    """
+    _end_hooks.append((priority, len(_end_hooks), hook))
+    _end_hooks.sort(key=lambda entry: entry[:2])
+    return hook
+
+
+def lambda_handler(handler):
+    """Wraps a Lambda entry point so buffered work is flushed before the container freezes."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        for hook in _start_hooks:
+            try:
+                hook(event, context)
+            except Exception as e:
+                print(f"Error: invocation start hook {getattr(hook, '__qualname__', hook)} failed: {e}")
+
+        try:
+            return handler(event, context)
+        finally:
+            for _, _, hook in _end_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"Error: invocation end hook {getattr(hook, '__qualname__', hook)} failed: {e}")
+
+    return wrapper
@@ -0,0 +1,78 @@
+import json
+import os
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def decimal_to_str(obj):
+    """Turns DynamoDB's Decimals into strings, the same way DecimalEncoder always has."""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """json.JSONEncoder for cls=DecimalEncoder callers; dumps() below is faster for response bodies."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+# One encoder for every call; json.dumps(cls=...) builds a new one, and DynamoDB items cannot be circular
+_stdlib_encoder = json.JSONEncoder(default=decimal_to_str, check_circular=False)
+
+
+def stdlib_dumps(obj):
+    """Byte-for-byte the output of json.dumps(obj, cls=DecimalEncoder)."""
+    return _stdlib_encoder.encode(obj)
+
+
+def orjson_dumps(obj):
+    """Same values as stdlib_dumps, but compact and with non-ASCII characters left unescaped."""
+    return orjson.dumps(obj, default=decimal_to_str).decode("utf-8")
+
+
+BACKENDS = {"json": stdlib_dumps}
+if orjson is not None:
+    BACKENDS["orjson"] = orjson_dumps
+
+_backend = None
+
+
+def register_backend(name, dumps_function):
+    """Adds a backend: a function taking an object and returning a JSON string."""
+    BACKENDS[name] = dumps_function
+
+
+def use_backend(name):
+    """Switches every dumps() call to a registered backend."""
+    global _backend
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}. Available: {', '.join(sorted(BACKENDS))}")
+    _backend = name
+
+
+def backend_name():
+    """Returns the backend in use: JSON_BACKEND when set, otherwise orjson when installed, otherwise json."""
+    if _backend is None:
+        use_backend(os.getenv("JSON_BACKEND") or ("orjson" if "orjson" in BACKENDS else "json"))
+    return _backend
+
+
+def dumps(obj):
+    """Serializes DynamoDB results to a JSON string with Decimals written as strings."""
+    return BACKENDS[backend_name()](obj)
+
+
+def loads(data):
+    """Parses JSON text or bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
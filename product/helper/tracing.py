@@ -0,0 +1,282 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import traceback
+from gateways import aws_clients
+from helper.invocation import on_invocation_start, on_invocation_end
+
+try:
+    from aws_xray_sdk.core import xray_recorder
+except ImportError:
+    xray_recorder = None
+
+# Arguments and attributes with these names become annotations, so traces can be searched by them
+ANNOTATED_NAMES = ("product_id", "order_id", "user_id")
+
+
+class Span:
+    """One segment or subsegment recorded by MemoryRecorder."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start_time = time.time()
+        self.end_time = None
+        self.annotations = {}
+        self.error = None
+        self.subsegments = []
+        self._lock = threading.Lock()
+
+    @property
+    def duration_ms(self):
+        end_time = self.end_time if self.end_time is not None else time.time()
+        return (end_time - self.start_time) * 1000
+
+    def add_subsegment(self, span):
+        # parallel_scan workers add their AWS calls to the same parent at once
+        with self._lock:
+            self.subsegments.append(span)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration_ms, 3),
+            "annotations": dict(self.annotations),
+            "error": self.error,
+            "subsegments": [span.to_dict() for span in self.subsegments],
+        }
+
+    def __repr__(self):
+        return f"Span({self.name!r}, {self.duration_ms:.1f} ms, {len(self.subsegments)} subsegments)"
+
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+class MemoryRecorder:
+    """Keeps finished segments as Span trees, for local runs and tests."""
+
+    def __init__(self):
+        self.segments = []
+
+    def begin_segment(self, name):
+        span = Span(name)
+        span.token = _current_span.set(span)
+        return span
+
+    def end_segment(self, span):
+        span.end_time = time.time()
+        try:
+            _current_span.reset(span.token)
+        except ValueError:
+            # ended from another context than the one that began it
+            _current_span.set(None)
+        self.segments.append(span)
+
+    def begin_subsegment(self, name):
+        parent = _current_span.get()
+        if parent is None:
+            return None
+
+        span = Span(name)
+        span.parent = parent
+        parent.add_subsegment(span)
+        span.token = _current_span.set(span)
+        return span
+
+    def end_subsegment(self, span, error=None):
+        span.end_time = time.time()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        try:
+            _current_span.reset(span.token)
+        except ValueError:
+            # ended from another context, e.g. by a botocore event in a different thread
+            _current_span.set(span.parent)
+
+    def annotate(self, span, key, value):
+        span.annotations[key] = value
+
+    def clear(self):
+        self.segments.clear()
+
+
+class XRayRecorder:
+    """
+    Sends traces through the AWS X-Ray SDK.
+    In Lambda the invocation segment belongs to the runtime, so the handler gets a "## name" subsegment under it.
+    """
+
+    def __init__(self):
+        # AWS calls made outside a traced invocation, e.g. by a background flush, are simply not traced
+        xray_recorder.configure(context_missing="IGNORE_ERROR")
+        self.in_lambda = bool(os.getenv("LAMBDA_TASK_ROOT"))
+
+    def begin_segment(self, name):
+        if self.in_lambda:
+            return xray_recorder.begin_subsegment(f"## {name}")
+        return xray_recorder.begin_segment(name)
+
+    def end_segment(self, segment):
+        if self.in_lambda:
+            xray_recorder.end_subsegment()
+        else:
+            xray_recorder.end_segment()
+
+    def begin_subsegment(self, name):
+        return xray_recorder.begin_subsegment(name)
+
+    def end_subsegment(self, subsegment, error=None):
+        if error is not None:
+            # The stack where the error was raised, not the one of this hook
+            subsegment.add_exception(error, traceback.extract_tb(error.__traceback__))
+        xray_recorder.end_subsegment()
+
+    def annotate(self, subsegment, key, value):
+        subsegment.put_annotation(key, value)
+
+
+class NullRecorder:
+    def begin_segment(self, name):
+        return None
+
+    def end_segment(self, segment):
+        pass
+
+    def begin_subsegment(self, name):
+        return None
+
+    def end_subsegment(self, subsegment, error=None):
+        pass
+
+    def annotate(self, subsegment, key, value):
+        pass
+
+
+def default_recorder():
+    """TRACING_EXPORTER picks the recorder; by default X-Ray is used when its SDK is installed."""
+    exporter = os.getenv("TRACING_EXPORTER") or ("xray" if xray_recorder is not None else "off")
+
+    if exporter == "xray" and xray_recorder is not None:
+        return XRayRecorder()
+    if exporter == "memory":
+        return MemoryRecorder()
+    return NullRecorder()
+
+
+recorder = default_recorder()
+_segment = None
+
+
+def use_recorder(new_recorder):
+    """Replaces the exporter, e.g. use_recorder(MemoryRecorder()) in a test or benchmark."""
+    global recorder
+    recorder = new_recorder
+    return new_recorder
+
+
+def start_segment(event=None, context=None):
+    """Opens the invocation's segment, named after the function and annotated with the HTTP route."""
+    global _segment
+
+    name = getattr(context, "function_name", None) or os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local")
+    _segment = recorder.begin_segment(name)
+
+    route = (event or {}).get("routeKey") if isinstance(event, dict) else None
+    if _segment is not None and route:
+        recorder.annotate(_segment, "route", route)
+
+
+def end_segment():
+    global _segment
+
+    if _segment is not None:
+        segment, _segment = _segment, None
+        recorder.end_segment(segment)
+
+
+on_invocation_start(start_segment)
+# The segment is closed after every other end hook, so the AWS calls made while flushing are inside it
+on_invocation_end(end_segment, priority=200)
+
+
+def annotations_for(signature, args, kwargs):
+    """Finds product_id, order_id and user_id among a call's arguments or on its self."""
+    try:
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+    except TypeError:
+        return {}
+
+    owner = arguments.get("self")
+    annotations = {}
+    for name in ANNOTATED_NAMES:
+        value = arguments.get(name, getattr(owner, name, None))
+        if isinstance(value, (str, int)) and value != "":
+            annotations[name] = value
+    return annotations
+
+
+def traced(name):
+    """Records a method call as a subsegment, annotated with the ids it was called with."""
+
+    def decorate(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            subsegment = recorder.begin_subsegment(name)
+            if subsegment is None:
+                return method(*args, **kwargs)
+
+            for key, value in annotations_for(signature, args, kwargs).items():
+                recorder.annotate(subsegment, key, value)
+
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                recorder.end_subsegment(subsegment, e)
+                raise
+
+            if isinstance(result, dict) and isinstance(result.get("statusCode"), int):
+                recorder.annotate(subsegment, "status_code", result["statusCode"])
+            recorder.end_subsegment(subsegment)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def begin_aws_call(model=None, context=None, **kwargs):
+    """Opens a subsegment for every AWS request, named like DynamoDB.TransactWriteItems."""
+    subsegment = recorder.begin_subsegment(f"{model.service_model.service_id}.{model.name}")
+    if subsegment is not None and context is not None:
+        context["trace_subsegment"] = subsegment
+
+
+def end_aws_call(http_response=None, parsed=None, context=None, **kwargs):
+    subsegment = (context or {}).pop("trace_subsegment", None)
+    if subsegment is None:
+        return
+
+    error_code = (parsed or {}).get("Error", {}).get("Code")
+    if error_code:
+        recorder.annotate(subsegment, "error_code", error_code)
+    recorder.end_subsegment(subsegment)
+
+
+def fail_aws_call(exception=None, context=None, **kwargs):
+    subsegment = (context or {}).pop("trace_subsegment", None)
+    if subsegment is not None:
+        recorder.end_subsegment(subsegment, exception)
+
+
+def trace_session(session):
+    session.events.register("before-call", begin_aws_call)
+    session.events.register("after-call", end_aws_call)
+    session.events.register("after-call-error", fail_aws_call)
+
+
+aws_clients.on_new_session(trace_session)
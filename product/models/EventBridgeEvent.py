@@ -1,7 +1,58 @@
 import json
 import os
+import threading
 
-from gateways.eventbridge_gateway import EventbridgeGateway
+from gateways.eventbridge_gateway import EventbridgeGateway, PUT_EVENTS_BATCH_SIZE
+from helper.invocation import on_invocation_start, on_invocation_end
+
+
+class EventPublisher:
+    """
+    Buffers events while a Lambda invocation is running and sends them in PutEvents batches.
+    Outside an invocation scope (scripts, local calls) every event is sent straight away.
+    """
+
+    def __init__(self):
+        self.buffering = False
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def start(self, event=None, context=None):
+        self.buffering = True
+
+    def publish(self, events):
+        with self._lock:
+            self._pending.extend(event.serialize() for event in events)
+
+            if not self.buffering:
+                entries, self._pending = self._pending, []
+            else:
+                # send only full batches; a partial one may still fill up before the invocation ends
+                full = len(self._pending) - len(self._pending) % PUT_EVENTS_BATCH_SIZE
+                entries, self._pending = self._pending[:full], self._pending[full:]
+
+        self._send(entries)
+
+    def flush(self):
+        """Sends everything still buffered; called when the invocation ends."""
+        with self._lock:
+            entries, self._pending = self._pending, []
+            self.buffering = False
+
+        self._send(entries)
+
+    def _send(self, entries):
+        if not entries:
+            return
+
+        response = EventbridgeGateway.put_events(entries)
+        if response["FailedEntryCount"]:
+            print(f"Error: {response['FailedEntryCount']} of {len(entries)} events were not delivered")
+
+
+event_publisher = EventPublisher()
+on_invocation_start(event_publisher.start)
+on_invocation_end(event_publisher.flush)
 
 
 class EventbridgeEvent:
@@ -22,5 +73,10 @@ class EventbridgeEvent:
         }
 
     def send(self):
-        event_json = self.serialize()
-        EventbridgeGateway.put_event(event_json)
\ No newline at end of file
+        event_publisher.publish([self])
+
+    @classmethod
+    def send_batch(cls, events):
+        """Sends several events together instead of one PutEvents call each."""
+        if events:
+            event_publisher.publish(events)
@@ -0,0 +1,130 @@
+import gzip
+import os
+import time
+from gateways.dynamodb_gateway import DynamoDB
+from gateways.s3_gateway import S3Gateway
+from helper import serialization
+
+SNAPSHOT_KEY = os.getenv("CATALOG_SNAPSHOT_KEY", "catalog/products.json.gz")
+# Older snapshots are not served; get_all_products falls back to scanning the table
+MAX_AGE_SECONDS = int(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "900"))
+WRITE_RETRIES = 3
+
+
+class CatalogSnapshot:
+    """
+    The whole product listing, stored as the gzipped get_all_products response body in S3.
+    Events patch it product by product; a scheduled rebuild rescans the table to catch anything missed.
+    Every write is conditional on the ETag that was read, so concurrent writers retry instead of losing updates.
+    """
+
+    def __init__(self, bucket, db_handler, key=SNAPSHOT_KEY):
+        self.bucket = bucket
+        self.db_handler = db_handler
+        self.key = key
+
+    def load(self):
+        """Reads the snapshot as {product_id: item}, with the ETag to write it back against."""
+        response = self.bucket.get_object(self.key)
+
+        if response["status"] != "success":
+            return response
+
+        document = serialization.loads(gzip.decompress(response["body"]))
+        return {
+            "status": "success",
+            "items": {item["product_id"]: item for item in document["data"]},
+            "etag": response["etag"],
+        }
+
+    def save(self, items, if_match=None):
+        """Writes the listing sorted by product_id, in exactly the shape get_all_products returns."""
+        document = {"statusCode": 200, "data": [items[product_id] for product_id in sorted(items)]}
+        body = gzip.compress(serialization.dumps(document).encode("utf-8"), mtime=0)
+
+        return self.bucket.put_object(
+            self.key, body,
+            content_type="application/json",
+            content_encoding="gzip",
+            metadata={"generated-at": str(int(time.time())), "item-count": str(len(items))},
+            if_match=if_match,
+        )
+
+    def rebuild(self):
+        """Rescans the products table and replaces the snapshot."""
+        for _ in range(WRITE_RETRIES):
+            current = self.bucket.head_object(self.key)
+            if current["status"] == "error":
+                return current
+
+            items = {item["product_id"]: item for item in self.db_handler.parallel_scan()}
+            response = self.save(items, if_match=current.get("etag"))
+
+            if response["status"] != "conflict":
+                if response["status"] == "success":
+                    print(f"Notice: catalog snapshot rebuilt with {len(items)} products")
+                return response
+
+        return {"status": "conflict", "message": "Catalog snapshot kept changing during the rebuild"}
+
+    def refresh(self, product_ids):
+        """
+        Re-reads the given products from DynamoDB and patches them into the snapshot.
+        Products that no longer exist are removed; event payloads are never trusted as the product's state.
+        """
+        product_ids = set(product_ids)
+
+        for _ in range(WRITE_RETRIES):
+            snapshot = self.load()
+            if snapshot["status"] == "not_found":
+                return self.rebuild()
+            if snapshot["status"] != "success":
+                return snapshot
+
+            response = self.db_handler.batch_get_items([{"product_id": product_id} for product_id in sorted(product_ids)])
+            if response["statusCode"] != 200:
+                return {"status": "error", "message": response["message"]}
+            found = {item["product_id"]: item for item in response["data"]}
+
+            items = snapshot["items"]
+            for product_id in product_ids:
+                if product_id in found:
+                    items[product_id] = found[product_id]
+                else:
+                    items.pop(product_id, None)
+
+            response = self.save(items, if_match=snapshot["etag"])
+            if response["status"] != "conflict":
+                return response
+
+        return {"status": "conflict", "message": "Catalog snapshot kept changing during the refresh"}
+
+    def url(self, expires_in=300):
+        """A presigned URL clients can download the snapshot from; S3 sends it with Content-Encoding: gzip."""
+        return self.bucket.presigned_url(self.key, expires_in)
+
+    def fetch(self, with_body=True):
+        """
+        Returns the stored snapshot for serving, or None when it is missing or older than MAX_AGE_SECONDS.
+        :param with_body: False only reads metadata, size and ETag, enough to redirect or answer 304.
+        """
+        response = self.bucket.get_object(self.key) if with_body else self.bucket.head_object(self.key)
+
+        if response["status"] != "success":
+            if response["status"] == "error":
+                print(f"Error: catalog snapshot could not be read: {response['message']}")
+            return None
+
+        age = time.time() - int(response["metadata"].get("generated-at", 0))
+        if age > MAX_AGE_SECONDS:
+            print(f"Notice: catalog snapshot is {int(age)}s old, falling back to a table scan")
+            return None
+
+        return response
+
+
+catalog_snapshot = (
+    CatalogSnapshot(S3Gateway(os.getenv("PRODUCT_BUCKET_NAME")), DynamoDB(os.getenv("DB_NAME")))
+    if os.getenv("CATALOG_SNAPSHOT_MODE", "serve") != "off"
+    else None
+)
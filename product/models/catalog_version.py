@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from gateways.dynamodb_gateway import DynamoDB
+
+VERSION_KEY = {"version_id": "catalog"}
+
+
+class CatalogVersion:
+    """
+    Counter bumped on every write that changes what catalog reads return.
+    Reads go through a short in-container cache, so a burst of conditional GETs costs one GetItem.
+    """
+
+    def __init__(self, db_handler, ttl_seconds):
+        self.db_handler = db_handler
+        self.ttl_seconds = ttl_seconds
+        self._value = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Returns the catalog version, or None when it cannot be read."""
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._read_at < self.ttl_seconds:
+                return self._value
+
+        response = self.db_handler.get_item(VERSION_KEY)
+
+        if response["statusCode"] == 200:
+            value = int(response["data"].get("version", 0))
+        elif response["statusCode"] == 404:
+            value = 0
+        else:
+            print(f"Error: catalog version could not be read: {response['message']}")
+            return None
+
+        self._remember(value)
+        return value
+
+    def bump(self):
+        """Moves the version forward so every ETag handed out so far stops matching."""
+        response = self.db_handler.increment(VERSION_KEY, "version", 1, create_missing=True)
+
+        if response["statusCode"] != 200:
+            print(f"Error: catalog version could not be bumped: {response['message']}")
+            self.clear()
+            return None
+
+        value = int(response["updatedAttributes"]["version"])
+        self._remember(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+
+    def _remember(self, value):
+        with self._lock:
+            if self._value is None or value >= self._value:
+                self._value = value
+                self._read_at = time.monotonic()
+
+
+catalog_version = (
+    CatalogVersion(DynamoDB(os.getenv("CATALOG_VERSION_TABLE")), float(os.getenv("CATALOG_VERSION_TTL", "1")))
+    if os.getenv("CATALOG_VERSION_TABLE")
+    else None
+)
+
+
+def bump_catalog_version():
+    """Called by every catalog write; a failure is logged and never fails the write itself."""
+    if catalog_version is None:
+        return
+
+    try:
+        catalog_version.bump()
+    except Exception as e:
+        print(f"Error: catalog version bump failed: {e}")
@@ -0,0 +1,278 @@
+import csv
+import hashlib
+import io
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from gateways.s3_gateway import S3Gateway
+from helper import serialization
+
+SOURCE_PREFIX = "product_created_"
+COMPACTED_PREFIX = os.getenv("EXPORT_COMPACTED_PREFIX", "compacted")
+MANIFEST_SUFFIX = ".manifest.json"
+# Objects younger than this are left alone, so a partition is not split into many tiny parts
+MIN_AGE_SECONDS = int(os.getenv("EXPORT_COMPACT_MIN_AGE", "3600"))
+# One DeleteObjects request per part; the size cap bounds how long one part takes to write and verify
+MAX_SOURCES_PER_PART = 1000
+MAX_PART_BYTES = 256 * 1024 * 1024
+GZIP_LEVEL = 6
+# A part is only started when at least this much of the invocation is left
+MIN_REMAINING_MS = 120_000
+
+
+def partition_of(source):
+    """The dt=YYYY-MM-DD partition a source object belongs to, by the UTC day it was written."""
+    return source["LastModified"].astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+def part_id(sources):
+    """
+    Names a part after the exact objects merged into it, so a retried run writes the same key again
+    instead of a second copy of the same rows.
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(f"{source['Key']} {source['ETag']}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def count_rows(body):
+    return sum(1 for _ in csv.reader(io.StringIO(body.decode("utf-8"), newline="")))
+
+
+class ExportCompactor:
+    """
+    Merges the product_created_*.csv objects written by receive_message_from_sqs into gzipped parts:
+        compacted/dt=YYYY-MM-DD/part-<id>.csv.gz
+        compacted/dt=YYYY-MM-DD/part-<id>.manifest.json
+    The manifest is written only after the part has been read back and matched against its sources,
+    and the sources are deleted only after that. A run that stops anywhere is finished by the next one,
+    which first deletes any part left without a manifest.
+    """
+
+    def __init__(self, bucket, prefix=COMPACTED_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def part_key(self, partition, part):
+        return f"{self.prefix}/dt={partition}/part-{part}.csv.gz"
+
+    def manifest_key(self, partition, part):
+        return f"{self.prefix}/dt={partition}/part-{part}{MANIFEST_SUFFIX}"
+
+    def pending_sources(self, min_age_seconds=MIN_AGE_SECONDS):
+        """Groups the source objects old enough to compact by partition, each sorted by key."""
+        cutoff = time.time() - min_age_seconds
+        partitions = {}
+
+        for source in self.bucket.iter_objects(SOURCE_PREFIX):
+            if source["LastModified"].timestamp() <= cutoff:
+                partitions.setdefault(partition_of(source), []).append(source)
+
+        for sources in partitions.values():
+            sources.sort(key=lambda source: source["Key"])
+        return partitions
+
+    def merged_sources(self, partition):
+        """
+        Returns {key: etag} for every source a finished part of this partition already holds.
+        Parts no manifest refers to are deleted on the way; runs never overlap, so none of them is still being written.
+        """
+        merged = {}
+        referenced = set()
+        parts = []
+
+        for entry in self.bucket.iter_objects(f"{self.prefix}/dt={partition}/"):
+            if not entry["Key"].endswith(MANIFEST_SUFFIX):
+                parts.append(entry["Key"])
+                continue
+
+            response = self.bucket.get_object(entry["Key"])
+            if response["status"] != "success":
+                raise RuntimeError(f"manifest {entry['Key']} could not be read: {response['message']}")
+
+            manifest = serialization.loads(response["body"])
+            referenced.add(manifest["part"])
+            for source in manifest["sources"]:
+                merged[source["key"]] = source["etag"]
+
+        self.discard_parts([key for key in parts if key not in referenced])
+        return merged
+
+    def discard_parts(self, keys):
+        """
+        Deletes parts without a manifest. Their sources were never deleted, and once the source set of the partition
+        changes they would be merged again under a different part id, leaving the same rows in S3 twice.
+        """
+        if not keys:
+            return
+
+        response = self.bucket.delete_objects(keys)
+        if response["failed"]:
+            print(f"Error: {len(response['failed'])} parts without a manifest could not be deleted, the next run retries them")
+
+    def plan_parts(self, sources):
+        """Splits a partition's sources into parts of at most MAX_SOURCES_PER_PART objects and MAX_PART_BYTES."""
+        parts = []
+        current, current_bytes = [], 0
+
+        for source in sources:
+            if current and (len(current) == MAX_SOURCES_PER_PART or current_bytes + source["Size"] > MAX_PART_BYTES):
+                parts.append(current)
+                current, current_bytes = [], 0
+            current.append(source)
+            current_bytes += source["Size"]
+
+        if current:
+            parts.append(current)
+        return parts
+
+    def write_part(self, partition, sources, columns):
+        """
+        Streams the sources into one gzipped part and reads it back to check it holds exactly their bytes.
+        Returns the manifest document, or raises RuntimeError when the part could not be written or verified.
+        """
+        part = part_id(sources)
+        part_key = self.part_key(partition, part)
+        digest = hashlib.sha256()
+        totals = {"bytes": 0, "rows": 0}
+        entries = []
+
+        def compressed_chunks():
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+            for source in sources:
+                response = self.bucket.get_object(source["Key"])
+                if response["status"] != "success":
+                    raise RuntimeError(f"source {source['Key']} could not be read: {response['message']}")
+                if response["etag"] != source["ETag"]:
+                    raise RuntimeError(f"source {source['Key']} changed since it was listed")
+
+                body = response["body"]
+                # Every source ends in a line break, so rows never run together across files
+                if body and not body.endswith(b"\n"):
+                    body += b"\r\n"
+
+                rows = count_rows(body)
+                digest.update(body)
+                totals["bytes"] += len(body)
+                totals["rows"] += rows
+                entries.append({"key": source["Key"], "etag": source["ETag"], "size": source["Size"], "rows": rows})
+
+                yield compressor.compress(body)
+
+            yield compressor.flush()
+
+        response = self.bucket.upload_stream(part_key, compressed_chunks(), content_type="text/csv")
+        if response["status"] != "success":
+            raise RuntimeError(f"part {part_key} could not be written: {response['message']}")
+
+        self.verify_part(part_key, digest.hexdigest(), totals["bytes"])
+
+        return {
+            "partition": partition,
+            "part": part_key,
+            "columns": columns,
+            "rows": totals["rows"],
+            "bytes": totals["bytes"],
+            "sha256": digest.hexdigest(),
+            "sources": entries,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def verify_part(self, part_key, expected_sha256, expected_bytes):
+        """Decompresses the stored part and compares it with what was uploaded."""
+        decompressor = zlib.decompressobj(31)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            for chunk in self.bucket.iter_bytes(part_key):
+                data = decompressor.decompress(chunk)
+                digest.update(data)
+                size += len(data)
+        except Exception as e:
+            raise RuntimeError(f"part {part_key} could not be read back: {e}") from e
+
+        data = decompressor.flush()
+        digest.update(data)
+        size += len(data)
+
+        if not decompressor.eof or size != expected_bytes or digest.hexdigest() != expected_sha256:
+            raise RuntimeError(f"part {part_key} does not match its sources ({size} of {expected_bytes} bytes)")
+
+    def delete_sources(self, keys):
+        """Deletes merged sources; anything left over is deleted by the next run from the manifest."""
+        if not keys:
+            return 0
+
+        response = self.bucket.delete_objects(keys)
+        if response["failed"]:
+            print(f"Error: {len(response['failed'])} merged sources could not be deleted, the next run retries them")
+        return len(keys) - len(response["failed"])
+
+    def compact_partition(self, partition, sources, columns, time_left=None):
+        """Compacts one partition; returns (parts written, sources deleted, parts failed)."""
+        merged = self.merged_sources(partition)
+
+        # Sources a finished part already holds were merged by a run that stopped before deleting them
+        already_merged = [source["Key"] for source in sources if merged.get(source["Key"]) == source["ETag"]]
+        deleted = self.delete_sources(already_merged)
+        sources = [source for source in sources if merged.get(source["Key"]) != source["ETag"]]
+
+        written = failed = 0
+        for part_sources in self.plan_parts(sources):
+            if time_left is not None and time_left() < MIN_REMAINING_MS:
+                print(f"Notice: out of time, {partition} will be finished by the next run")
+                break
+
+            part = part_id(part_sources)
+            try:
+                manifest = self.write_part(partition, part_sources, columns)
+            except RuntimeError as e:
+                # The sources stay where they are and the same part is attempted again by the next run
+                print(f"Error: {e}")
+                self.discard_parts([self.part_key(partition, part)])
+                failed += 1
+                continue
+
+            manifest_key = self.manifest_key(partition, part)
+            response = self.bucket.put_object(
+                manifest_key, serialization.dumps(manifest).encode("utf-8"), content_type="application/json"
+            )
+            if response["status"] != "success":
+                print(f"Error: manifest {manifest_key} could not be written: {response['message']}")
+                self.discard_parts([manifest["part"]])
+                failed += 1
+                continue
+
+            written += 1
+            deleted += self.delete_sources([source["Key"] for source in part_sources])
+            print(f"Notice: merged {len(part_sources)} objects ({manifest['rows']} rows) into {manifest['part']}")
+
+        return written, deleted, failed
+
+    def run(self, columns, time_left=None, min_age_seconds=MIN_AGE_SECONDS):
+        """
+        Compacts every partition with sources old enough to merge.
+        :param columns: The CSV columns of the sources, recorded in each manifest since the files have no header.
+        :param time_left: Optional callable returning the milliseconds left in the invocation.
+        """
+        written = deleted = failed = 0
+
+        for partition, sources in sorted(self.pending_sources(min_age_seconds).items()):
+            if time_left is not None and time_left() < MIN_REMAINING_MS:
+                break
+
+            partition_written, partition_deleted, partition_failed = self.compact_partition(
+                partition, sources, columns, time_left
+            )
+            written += partition_written
+            deleted += partition_deleted
+            failed += partition_failed
+
+        return {"status": "success" if not failed else "error", "parts": written, "failed": failed, "deleted": deleted}
+
+
+export_compactor = ExportCompactor(S3Gateway(os.getenv("SQS_BUCKET_NAME")))
@@ -1,13 +1,30 @@
 from datetime import datetime
 import decimal
 import os
-import json
+from boto3.dynamodb.conditions import Key
 from gateways.dynamodb_gateway import DynamoDB
-from helper.helper_func import build_update_expression, validate_update_product, DecimalEncoder
+from helper.helper_func import build_update_expression, validate_update_product
+from helper import serialization
+from helper.tracing import traced
 from models.EventBridgeEvent import EventbridgeEvent
+from models.product import product_cache
+from models.catalog_version import bump_catalog_version
+from models.productInventory import ledger_sort_key
+
+PRODUCTS_TABLE = os.getenv("DB_NAME")
+INVENTORY_TABLE = os.getenv("DB_INVENTORY_NAME")
+# Global secondary indexes of the orders table, both sorted by datetime
+USER_INDEX = os.getenv("ORDERS_USER_INDEX", "user_id-datetime-index")
+STATUS_INDEX = os.getenv("ORDERS_STATUS_INDEX", "order_status-datetime-index")
 
 db_handler = DynamoDB(os.getenv("ORDERS_TABLE"))
 
+
+def user_key(user_id):
+    """User ids are matched case-insensitively, so they are stored and looked up in lower case."""
+    return user_id.lower() if isinstance(user_id, str) else user_id
+
+
 class Order:
     def __init__(self, order_id, product_id="", user_id="", product_name="", datetime="", contact_number="", quantity=0, total_price=0, status=""):
         self.order_id = order_id
@@ -25,7 +42,7 @@ class Order:
             "order_id": self.order_id,
             "product_id": self.product_id,
             "product_name": self.product_name,
-            "user_id": self.user_id,
+            "user_id": user_key(self.user_id),
             "datetime": self.datetime,
             "contact_number": self.contact_number,
             "quantity": self.quantity,
@@ -78,28 +95,87 @@ class Order:
         """Checks if price is a decimal and non-negative."""
         if not isinstance(total_price, (int, float, decimal.Decimal)):
             raise ValueError("Price must be a decimal or contact_number")
+        if not decimal.Decimal(str(total_price)).is_finite():
+            raise ValueError("Price must be a finite number")
         if total_price < 0:
             raise ValueError("Price cannot be negative")  
 
 
+    @traced("Order.create")
     def create(self):
+        """
+        Places the order in one transaction: the product's stock is decremented only if enough is left,
+        the order is inserted and the inventory ledger row is appended, or nothing is written at all.
+        """
         self.validate_product_order()
-        
-        response = db_handler.put_item(self.get_data())
 
         data = self.get_data()
+        ledger_row = {
+            "product_id": self.product_id,
+            # several orders for one product can land in the same second; see LEDGER_SUFFIX_LENGTH
+            "datetime": ledger_sort_key(self.datetime, self.order_id),
+            "quantity": -self.quantity,
+            "remarks": f"order {self.order_id}",
+            "order_id": self.order_id,
+        }
+
+        response = db_handler.transact_write([
+            {
+                "Update": {
+                    "TableName": PRODUCTS_TABLE,
+                    "Key": {"product_id": self.product_id},
+                    "UpdateExpression": "SET quantity = quantity - :quantity",
+                    "ConditionExpression": "attribute_exists(product_id) AND quantity >= :quantity",
+                    "ExpressionAttributeValues": {":quantity": self.quantity},
+                    "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                }
+            },
+            {
+                "Put": {
+                    "TableName": db_handler.table_name,
+                    "Item": data,
+                    "ConditionExpression": "attribute_not_exists(order_id)",
+                }
+            },
+            {
+                "Put": {
+                    "TableName": INVENTORY_TABLE,
+                    "Item": ledger_row,
+                    "ConditionExpression": "attribute_not_exists(product_id)",
+                }
+            },
+        ])
+
+        if response["statusCode"] == 409:
+            return self.cancellation_response(response["reasons"])
 
-        data['quantity'] = -data['quantity']
-    
         if response["statusCode"] == 200:
+            product_cache.invalidate(self.product_id)
+            bump_catalog_version()
+            EventbridgeEvent("product_updated", serialization.dumps({"product_id": self.product_id, "change": "stock"})).send()
             print("Notice: Product successfully ordered!")
-            event = EventbridgeEvent("product_added", json.dumps(data, cls=DecimalEncoder))
-            event.send()
-            event = EventbridgeEvent("stocks_added", json.dumps(data, cls=DecimalEncoder))
-            event.send()
-        
+            return {"statusCode": 200, "message": "Item added successfully", "data": data}
+
         return response
-    
+
+    def cancellation_response(self, reasons):
+        """Turns the per-action cancellation reasons of create() into the error the caller sees."""
+        codes = [reason.get("Code") for reason in reasons] + [None] * 3
+        stock, order, ledger = codes[:3]
+
+        if stock == "ConditionalCheckFailed":
+            if "Item" in reasons[0]:
+                return {"statusCode": 500, "message": "quantity is greater than current stock"}
+            return {"statusCode": 404, "message": "product does not exist"}
+        if order == "ConditionalCheckFailed":
+            return {"statusCode": 400, "message": "Item already exists"}
+        if ledger == "ConditionalCheckFailed":
+            return {"statusCode": 409, "message": "Inventory ledger row already exists, please retry"}
+
+        print(f"Error: order {self.order_id} transaction cancelled: {codes}")
+        return {"statusCode": 409, "message": "Order could not be placed, please retry"}
+
+    @traced("Order.delete")
     def delete(self):
         response = db_handler.delete_item({"order_id": self.order_id})
         
@@ -108,11 +184,32 @@ class Order:
             
         return response
     
+    @traced("Order.get")
     def get(self):
         response = db_handler.get_item({"order_id": self.order_id})
         
         return response
     
+    @staticmethod
+    @traced("Order.query_by_user")
+    def query_by_user(user_id, limit=None, cursor=None, descending=True):
+        """Reads one user's orders from the user index, newest first, whatever the case of user_id; pages only when limit or cursor is given."""
+        return Order.query_index(USER_INDEX, Key("user_id").eq(user_key(user_id)), limit, cursor, descending)
+
+    @staticmethod
+    @traced("Order.query_by_status")
+    def query_by_status(status, limit=None, cursor=None, descending=True):
+        """Reads the orders in one status from the status index, newest first."""
+        return Order.query_index(STATUS_INDEX, Key("order_status").eq(status), limit, cursor, descending)
+
+    @staticmethod
+    def query_index(index_name, key_condition, limit, cursor, descending):
+        if limit or cursor:
+            return db_handler.query_page(key_condition, limit, cursor, descending, index_name=index_name)
+
+        return db_handler.query_all(key_condition, IndexName=index_name, ScanIndexForward=not descending)
+
+    @traced("Order.update")
     def update(self, body):
         validate_update_product(self.order_id, body)
         
@@ -120,19 +217,81 @@ class Order:
         
         if expression_to_update:
             expression_to_update = "SET " + ", ".join(expression_to_update)
+
+            if body.get("order_status") == "cancelled":
+                return self.cancel(expression_to_update, expression_val)
             
             response = db_handler.update_item({"order_id": self.order_id}, expression_to_update, expression_val)
                 
             if response["statusCode"] == 200:
-                if body.get("order_status") == "cancelled":
-                    event = EventbridgeEvent("product_added", json.dumps(response["updatedAttributes"], cls=DecimalEncoder))
-                    event.send()
-                    event = EventbridgeEvent("stocks_added", json.dumps(response["updatedAttributes"], cls=DecimalEncoder))
-                    event.send()
-        
                 print("Notice: order updated successfully!")
                     
         
             return response
         
-        return {"statusCode": 400, "message": "No valid fields to update"}
\ No newline at end of file
+        return {"statusCode": 400, "message": "No valid fields to update"}
+
+    def cancel(self, update_expression, expression_values):
+        """
+        Cancels the order in one transaction: the status flips only if the order is not cancelled yet,
+        and its quantity goes back to the product with a matching ledger row, or nothing is written at all.
+        """
+        response = self.get()
+        if response["statusCode"] != 200:
+            return response
+
+        order = response["data"]
+        quantity = order["quantity"]
+        ledger_row = {
+            "product_id": order["product_id"],
+            "datetime": ledger_sort_key(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), f"{self.order_id} cancelled"),
+            "quantity": quantity,
+            "remarks": f"order {self.order_id} cancelled",
+            "order_id": self.order_id,
+        }
+
+        response = db_handler.transact_write([
+            {
+                "Update": {
+                    "TableName": db_handler.table_name,
+                    "Key": {"order_id": self.order_id},
+                    "UpdateExpression": update_expression,
+                    "ConditionExpression": "attribute_exists(order_id) AND (attribute_not_exists(order_status) OR order_status <> :cancelled)",
+                    "ExpressionAttributeValues": dict(expression_values, **{":cancelled": "cancelled"}),
+                }
+            },
+            {
+                "Update": {
+                    "TableName": PRODUCTS_TABLE,
+                    "Key": {"product_id": order["product_id"]},
+                    "UpdateExpression": "SET quantity = quantity + :quantity",
+                    "ConditionExpression": "attribute_exists(product_id)",
+                    "ExpressionAttributeValues": {":quantity": quantity},
+                }
+            },
+            {
+                "Put": {
+                    "TableName": INVENTORY_TABLE,
+                    "Item": ledger_row,
+                    "ConditionExpression": "attribute_not_exists(product_id)",
+                }
+            },
+        ])
+
+        if response["statusCode"] == 409:
+            codes = [reason.get("Code") for reason in response["reasons"]] + [None] * 3
+            if codes[0] == "ConditionalCheckFailed":
+                return {"statusCode": 409, "message": "Order is already cancelled"}
+            if codes[1] == "ConditionalCheckFailed":
+                return {"statusCode": 404, "message": "product does not exist"}
+            print(f"Error: cancellation of order {self.order_id} was cancelled: {codes[:3]}")
+            return {"statusCode": 409, "message": "Order could not be cancelled, please retry"}
+
+        if response["statusCode"] == 200:
+            product_cache.invalidate(order["product_id"])
+            bump_catalog_version()
+            EventbridgeEvent("product_updated", serialization.dumps({"product_id": order["product_id"], "change": "stock"})).send()
+            print("Notice: order cancelled successfully!")
+            return {"statusCode": 200, "message": "Order cancelled successfully"}
+
+        return response
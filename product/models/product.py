@@ -1,16 +1,99 @@
 import decimal
 import os
-import json
+import threading
+import time
+from collections import OrderedDict
 from gateways.dynamodb_gateway import DynamoDB
 from gateways.s3_gateway import S3Gateway
 from models.EventBridgeEvent import EventbridgeEvent
-from helper.helper_func import build_update_expression, validate_update_product, DecimalEncoder
+from helper.helper_func import build_update_expression, validate_update_product
+from helper import serialization
+from helper.tracing import traced
 from gateways.sqs_gateway import SQSGateway
+from models.search_index import search_index
+from models.catalog_version import bump_catalog_version
 
 sqs_client = SQSGateway(os.getenv("SQS_QUEUE_NAME"))
 db_handler = DynamoDB(os.getenv("DB_NAME"))
 image_bucket = S3Gateway(os.getenv("IMAGE_BUCKET_NAME"))
 
+
+class ProductCache:
+    """Bounded LRU cache with a TTL for product reads, shared by every invocation of a container."""
+
+    def __init__(self, max_size=1024, ttl_seconds=30):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        """Returns a copy of the cached item, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._items.get(product_id)
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._items[product_id]
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(product_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, product_id, item):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._items[product_id] = (time.monotonic() + self.ttl_seconds, dict(item))
+            self._items.move_to_end(product_id)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, product_id):
+        with self._lock:
+            self._items.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """Returns hit/miss counters so the size and TTL can be tuned."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._items),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def update_search_index(method, *args):
+    """Applies a change to the name search index without failing the write that caused it."""
+    if search_index is None:
+        return
+
+    try:
+        getattr(search_index, method)(*args)
+    except Exception as e:
+        print(f"Error: search index {method} failed: {e}")
+
+
+product_cache = ProductCache(
+    max_size=int(os.getenv("PRODUCT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("PRODUCT_CACHE_TTL", "30")),
+)
+
 class Product:
     def __init__(self, product_id, product_name="", category="", price=0.0, quantity=0, brand_name="", image_path=""):
         self.product_id = product_id
@@ -62,6 +145,8 @@ class Product:
         """Checks if price is a decimal and non-negative."""
         if not isinstance(price, (int, float, decimal.Decimal)):
             raise ValueError("Price must be a decimal or number")
+        if not decimal.Decimal(str(price)).is_finite():
+            raise ValueError("Price must be a finite number")
         if price < 0:
             raise ValueError("Price cannot be negative")
 
@@ -70,6 +155,7 @@ class Product:
         if not isinstance(quantity, (int, float)):
             raise ValueError("Quantity must be a number")
             
+    @traced("Product.create")
     def create(self):
         self.validate_product()
         
@@ -79,29 +165,138 @@ class Product:
             image_bucket.upload_file(self.image_path, self.product_id)
 
         if response["statusCode"] == 200:
+            product_cache.invalidate(self.product_id)
+            bump_catalog_version()
+            update_search_index("add", self.product_id, self.product_name)
             print("Notice: Product added successfully!")
-            sqs_client.send_message(json.dumps(self.get_data(), cls=DecimalEncoder))
-            event = EventbridgeEvent("product_added", json.dumps(self.get_data(), cls=DecimalEncoder))
+            if sqs_client.send_messages([serialization.dumps(self.get_data())]):
+                print(f"Error: product created message for {self.product_id} was not queued")
+            event = EventbridgeEvent("product_added", serialization.dumps(self.get_data()))
             event.send()
             
         
         return response
+
+    @classmethod
+    @traced("Product.bulk_create")
+    def bulk_create(cls, products):
+        """
+        Creates many products with batched existence checks, writes and notifications.
+        :param products: List of Product instances.
+        :return: One {"product_id", "status", "message"} entry per product, in input order.
+        """
+        results = {}
+        pending = []
+        seen_ids = set()
+
+        for product in products:
+            try:
+                product.validate_product()
+            except (ValueError, decimal.InvalidOperation) as e:
+                results[id(product)] = ("failed", str(e))
+                continue
+
+            if product.product_id in seen_ids:
+                results[id(product)] = ("failed", "Duplicate product_id in upload")
+                continue
+
+            seen_ids.add(product.product_id)
+            pending.append(product)
+
+        if pending:
+            existing = db_handler.batch_get_items([{"product_id": product.product_id} for product in pending])
+            if existing["statusCode"] != 200:
+                for product in pending:
+                    results[id(product)] = ("failed", existing["message"])
+                pending = []
+            else:
+                existing_ids = {item["product_id"] for item in existing["data"]}
+                for product in pending:
+                    if product.product_id in existing_ids:
+                        results[id(product)] = ("failed", "Item already exists")
+                pending = [product for product in pending if product.product_id not in existing_ids]
+
+        if pending:
+            response = db_handler.batch_put_items([product.get_data() for product in pending])
+            unprocessed_ids = {item["product_id"] for item in response["unprocessed"]}
+
+            created = []
+            for product in pending:
+                if product.product_id in unprocessed_ids:
+                    results[id(product)] = ("failed", "Item could not be written")
+                else:
+                    results[id(product)] = ("success", "Item added successfully")
+                    created.append(product)
+
+            if created:
+                bump_catalog_version()
+                bodies = [serialization.dumps(product.get_data()) for product in created]
+                failed = sqs_client.send_messages(bodies)
+                if failed:
+                    print(f"Error: {len(failed)} product created messages were not queued")
+
+                EventbridgeEvent.send_batch([EventbridgeEvent("product_added", body) for body in bodies])
+                update_search_index("add_many", [(product.product_id, product.product_name) for product in created])
+                print(f"Notice: {len(created)} products added successfully!")
+
+        return [
+            {"product_id": product.product_id, "status": results[id(product)][0], "message": results[id(product)][1]}
+            for product in products
+        ]
     
+    @traced("Product.delete")
     def delete(self):
-        response = db_handler.delete_item({"product_id": self.product_id})
+        response = db_handler.delete_item({"product_id": self.product_id}, return_values="ALL_OLD")
         
+        product_cache.invalidate(self.product_id)
+
         if response["statusCode"] == 200:
+            bump_catalog_version()
+            update_search_index("remove", self.product_id, response["deletedAttributes"].get("product_name"))
             print("Notice: item deleted successfully")
-            event = EventbridgeEvent("product_delete", json.dumps({"product_id": self.product_id}, cls=DecimalEncoder))
+            event = EventbridgeEvent("product_delete", serialization.dumps({"product_id": self.product_id}))
             event.send()
         
         return response
     
-    def get(self):
+    @traced("Product.add_quantity")
+    def add_quantity(self, delta, allow_negative=False):
+        """Atomically adds `delta` to the stock quantity; one write, safe under concurrent updates."""
+        if isinstance(delta, bool) or not isinstance(delta, int):
+            raise ValueError("Quantity must be a whole number")
+
+        response = db_handler.increment(
+            {"product_id": self.product_id}, "quantity", delta,
+            min_value=None if allow_negative else 0
+        )
+        product_cache.invalidate(self.product_id)
+
+        if response["statusCode"] == 200:
+            bump_catalog_version()
+            EventbridgeEvent("product_updated", serialization.dumps({"product_id": self.product_id, "change": "stock"})).send()
+            print("Notice: Product quantity updated successfully!")
+
+        return response
+
+    @traced("Product.get")
+    def get(self, use_cache=True):
+        if use_cache:
+            item = product_cache.get(self.product_id)
+            if item is not None:
+                return {"statusCode": 200, "data": item}
+
         response = db_handler.get_item({"product_id": self.product_id})
+
+        if response["statusCode"] == 200:
+            product_cache.put(self.product_id, response["data"])
         
         return response
+
+    @staticmethod
+    def cache_stats():
+        return product_cache.stats()
     
+    @traced("Product.update")
     def update(self, body):
         validate_update_product(self.product_id, body)
         
@@ -109,10 +304,18 @@ class Product:
         
         if expression_to_update:
             expression_to_update = "SET " + ", ".join(expression_to_update)
-            
-            response = db_handler.update_item({"product_id": self.product_id}, expression_to_update, expression_val)
+
+            response = db_handler.update_item(
+                {"product_id": self.product_id}, expression_to_update, expression_val, return_values="UPDATED_OLD"
+            )
+            product_cache.invalidate(self.product_id)
                 
             if response["statusCode"] == 200:
+                bump_catalog_version()
+                old_name = response["previousAttributes"].get("product_name")
+                if old_name is not None:
+                    update_search_index("replace", self.product_id, old_name, body["product_name"])
+                EventbridgeEvent("product_updated", serialization.dumps({"product_id": self.product_id, "change": "details"})).send()
                 print("Notice: Product updated successfully!")
         
             return response
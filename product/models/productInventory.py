@@ -1,10 +1,31 @@
 from datetime import datetime
 import decimal
+import hashlib
 import os
+import re
+from boto3.dynamodb.conditions import Key
 from gateways.dynamodb_gateway import DynamoDB
+from gateways.s3_gateway import S3Gateway
 from helper.helper_func import build_update_expression, validate_update_product
+from helper import serialization
+from helper.tracing import traced
+
+# "#" sorts before every "YYYY-..." datetime, so the snapshot is always the first row of a product
+SNAPSHOT_KEY = "#snapshot"
+ARCHIVE_PREFIX = "inventory-archive"
+# TransactWriteItems takes at most 100 actions: the snapshot put plus this many row deletes
+ROWS_PER_COMPACTION = 99
+# Bounds that hold every ledger row but not the snapshot; "~" also sorts after the suffix below
+LEDGER_START = "0"
+LEDGER_END = "~"
+# Writers that can put two rows for one product in the same second (orders) make the sort key unique with
+# a fixed-width suffix: "2025-03-06 14:30:00.1a2b3c4d". The first 19 characters are always the plain datetime.
+LEDGER_SUFFIX_SEPARATOR = "."
+LEDGER_SUFFIX_LENGTH = 8
+RANGE_BOUND_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}( \d{2}(:\d{2}(:\d{2})?)?)?$")
 
 db_handler = DynamoDB(os.getenv("DB_INVENTORY_NAME"))
+archive_bucket = S3Gateway(os.getenv("INVENTORY_ARCHIVE_BUCKET") or os.getenv("PRODUCT_BUCKET_NAME"))
 
 class Product_Inventory:
     def __init__(self, product_id, datetime="", quantity=0, remarks=""):
@@ -41,6 +62,7 @@ class Product_Inventory:
         if not isinstance(quantity, (int, float)):
             raise ValueError("Quantity must be a number.")
     
+    @traced("Product_Inventory.create")
     def create(self):
         self.validate_product_inv()
         
@@ -51,6 +73,7 @@ class Product_Inventory:
         
         return response
     
+    @traced("Product_Inventory.delete")
     def delete(self):
         response = db_handler.delete_item({"product_id": self.product_id, "datetime": self.datetime})
         
@@ -59,11 +82,13 @@ class Product_Inventory:
             
         return response
     
+    @traced("Product_Inventory.get")
     def get(self):
         response = db_handler.get_item({"product_id": self.product_id})
         
         return response
     
+    @traced("Product_Inventory.update")
     def update(self, body):
         validate_update_product(self.product_id, body)
         
@@ -79,4 +104,168 @@ class Product_Inventory:
         
             return response
         
-        return {"statusCode": 400, "message": "No valid fields to update"}
\ No newline at end of file
+        return {"statusCode": 400, "message": "No valid fields to update"}
+
+    def history_condition(self, start=None, end=None):
+        """
+        Builds the key condition for ledger rows between two datetimes, both inclusive.
+        Bounds may be cut short, e.g. "2025-03-06" or "2025-03-06 14", to cover the whole day or hour.
+        """
+        for name, bound in (("from", start), ("to", end)):
+            if bound and not RANGE_BOUND_PATTERN.match(bound):
+                raise ValueError(f"{name} must look like 'YYYY-MM-DD HH:MM:SS' and may be cut short")
+
+        lower = start or LEDGER_START
+        upper = f"{end}{LEDGER_END}" if end else LEDGER_END
+
+        if lower > upper:
+            raise ValueError("from must not be after to")
+
+        return Key("product_id").eq(self.product_id) & Key("datetime").between(lower, upper)
+
+    @traced("Product_Inventory.query_history")
+    def query_history(self, start=None, end=None, descending=False, limit=None, cursor=None, projection=None):
+        """Returns one page of ledger rows in a datetime range, with the cursor of the next page."""
+        try:
+            key_condition = self.history_condition(start, end)
+        except ValueError as e:
+            return {"statusCode": 400, "message": str(e)}
+
+        return db_handler.query_page(key_condition, limit, cursor, descending, projection)
+
+    def iter_history(self, start=None, end=None, descending=False, limit=None, projection=None):
+        """Lazily yields pages of ledger rows in a datetime range."""
+        return db_handler.iter_query(self.history_condition(start, end), limit, None, descending, projection)
+
+    def snapshot(self):
+        """
+        Reads the product's snapshot row: the running balance of every compacted ledger row, the newest of which is its watermark.
+        :return: The snapshot item, or None when the ledger was never compacted.
+        """
+        response = db_handler.get_item({"product_id": self.product_id, "datetime": SNAPSHOT_KEY})
+
+        if response["statusCode"] == 200:
+            return response["data"]
+        if response["statusCode"] == 404:
+            return None
+        raise ValueError(response["message"])
+
+    @traced("Product_Inventory.history")
+    def history(self):
+        """Returns the snapshot plus the ledger rows not yet folded into it, which are all the rows still stored."""
+        snapshot = self.snapshot()
+
+        response = db_handler.query_all(self.history_condition())
+
+        if response["statusCode"] != 200:
+            return response
+
+        return {"statusCode": 200, "snapshot": snapshot, "data": response["data"]}
+
+    @traced("Product_Inventory.balance")
+    def balance(self):
+        """Computes the stock balance from the snapshot and the short tail of rows not yet compacted."""
+        response = self.history()
+
+        if response["statusCode"] != 200:
+            return response
+
+        snapshot = response["snapshot"] or {}
+        tail = response["data"]
+        balance = snapshot.get("balance", 0) + sum(row.get("quantity", 0) for row in tail)
+
+        return {
+            "statusCode": 200,
+            "data": {
+                "product_id": self.product_id,
+                "balance": balance,
+                "watermark": snapshot.get("watermark"),
+                "tail_rows": len(tail),
+            },
+        }
+
+    @traced("Product_Inventory.compact")
+    def compact(self, cutoff, min_rows=1):
+        """
+        Folds ledger rows older than `cutoff` into the snapshot, archives them to S3 and deletes them.
+        Each transaction moves up to ROWS_PER_COMPACTION rows into the snapshot and deletes them together,
+        so every ledger row still stored is uncounted, including rows written below the watermark later on.
+        Safe to rerun: an interrupted run leaves only whole transactions behind.
+        :param cutoff: Datetime string; rows sorting before it are compacted.
+        :param min_rows: Skip the product when fewer rows than this are old enough.
+        """
+        snapshot = self.snapshot()
+
+        response = db_handler.query_all(Key("product_id").eq(self.product_id) & Key("datetime").between(LEDGER_START, cutoff))
+        if response["statusCode"] != 200:
+            return response
+
+        rows = [row for row in response["data"] if row["datetime"] < cutoff]
+
+        if not rows or len(rows) < min_rows:
+            return {"statusCode": 200, "message": "Nothing to compact", "compacted": 0}
+
+        archive_key = f"{ARCHIVE_PREFIX}/{self.product_id}/{archive_name(rows[0])}_{archive_name(rows[-1])}.ndjson"
+        archive = "".join(serialization.dumps(row) + "\n" for row in rows)
+        upload = archive_bucket.put_object(archive_key, archive.encode("utf-8"), "application/x-ndjson")
+
+        if upload["status"] != "success":
+            return {"statusCode": 500, "message": upload["message"]}
+
+        compacted = 0
+        for start in range(0, len(rows), ROWS_PER_COMPACTION):
+            batch = rows[start:start + ROWS_PER_COMPACTION]
+            new_snapshot = {
+                "product_id": self.product_id,
+                "datetime": SNAPSHOT_KEY,
+                "balance": (snapshot or {}).get("balance", 0) + sum(row.get("quantity", 0) for row in batch),
+                # Rows written late can sort below the watermark; they are counted but never move it back
+                "watermark": max((snapshot or {}).get("watermark", SNAPSHOT_KEY), batch[-1]["datetime"]),
+                "compacted_rows": (snapshot or {}).get("compacted_rows", 0) + len(batch),
+                "archive_key": archive_key,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+            response = db_handler.transact_write(
+                [{"Put": dict(self.snapshot_condition(snapshot), TableName=db_handler.table_name, Item=new_snapshot)}]
+                + [
+                    {"Delete": {"TableName": db_handler.table_name, "Key": {"product_id": row["product_id"], "datetime": row["datetime"]}}}
+                    for row in batch
+                ]
+            )
+
+            # Another compaction that folded rows first wins; this run then leaves the rest alone
+            if response["statusCode"] == 409:
+                return {"statusCode": 409, "message": "Snapshot was updated concurrently", "compacted": compacted}
+            if response["statusCode"] != 200:
+                return dict(response, compacted=compacted)
+
+            snapshot = new_snapshot
+            compacted += len(batch)
+
+        print(f"Notice: compacted {compacted} ledger rows of {self.product_id} into {archive_key}")
+        return {"statusCode": 200, "message": "Ledger compacted", "compacted": compacted, "snapshot": snapshot}
+
+    def snapshot_condition(self, snapshot):
+        """Condition for replacing the snapshot as it was read: compacted_rows grows with every fold."""
+        if snapshot is None:
+            return {"ConditionExpression": "attribute_not_exists(product_id)"}
+
+        return {
+            "ConditionExpression": "compacted_rows = :compacted_rows",
+            "ExpressionAttributeValues": {":compacted_rows": snapshot.get("compacted_rows", 0)},
+        }
+
+
+def ledger_sort_key(dt, unique_id):
+    """
+    Sort key for a ledger row that must not collide with others written in the same second.
+    The suffix is derived from unique_id, so retrying the same write produces the same key.
+    """
+    suffix = hashlib.sha256(str(unique_id).encode("utf-8")).hexdigest()[:LEDGER_SUFFIX_LENGTH]
+    return f"{dt}{LEDGER_SUFFIX_SEPARATOR}{suffix}"
+
+
+def archive_name(row):
+    """Turns a ledger sort key into something safe to use in an S3 key."""
+    return row["datetime"].replace(" ", "T").replace(":", "").replace(LEDGER_SUFFIX_SEPARATOR, "_")
@@ -0,0 +1,236 @@
+import os
+import re
+from collections import Counter
+from boto3.dynamodb.conditions import Key
+from gateways.dynamodb_gateway import DynamoDB
+
+NGRAM_SIZE = 3
+# Postings read per trigram per round when a search cannot tell which trigram is rarest
+POSTING_PAGE_SIZE = 200
+# Posting counts share the table with the postings; real tokens are three characters, so they never collide
+COUNT_TOKEN_PREFIX = "#count:"
+COUNT_PRODUCT_ID = "#count"
+
+
+def normalize(text):
+    """Lowercases a product name and collapses runs of whitespace."""
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+
+def ngrams(text):
+    """Returns the set of trigrams of a normalized string."""
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class InMemoryIndexStore:
+    """Keeps postings in a dict; used for local runs and benchmarks."""
+
+    def __init__(self):
+        self.postings = {}
+        self.posting_counts = {}
+
+    def put(self, postings):
+        for token, product_id, product_name in postings:
+            self.postings.setdefault(token, {})[product_id] = product_name
+
+    def delete(self, postings):
+        for token, product_id in postings:
+            self.postings.get(token, {}).pop(product_id, None)
+
+    def iter_postings(self, token, page_size=POSTING_PAGE_SIZE):
+        """Yields ({product_id: name}, is_last_page) pages of one trigram's postings."""
+        items = list(self.postings.get(token, {}).items())
+        for start in range(0, max(len(items), 1), page_size):
+            yield dict(items[start:start + page_size]), start + page_size >= len(items)
+
+    def add_counts(self, deltas):
+        for token, delta in deltas.items():
+            self.posting_counts[token] = self.posting_counts.get(token, 0) + delta
+
+    def set_counts(self, counts):
+        self.posting_counts.update(counts)
+
+    def counts(self, tokens):
+        return {token: self.posting_counts[token] for token in tokens if token in self.posting_counts}
+
+
+class DynamoDBIndexStore:
+    """
+    Keeps postings in a DynamoDB table keyed by token (HASH) and product_id (RANGE).
+    Each row also carries product_name so a search can rank without reading the products table.
+    """
+
+    def __init__(self, table_name):
+        self.db_handler = DynamoDB(table_name)
+
+    def put(self, postings):
+        rows = [{"token": token, "product_id": product_id, "product_name": name} for token, product_id, name in postings]
+        response = self.db_handler.batch_put_items(rows)
+
+        if response["unprocessed"]:
+            print(f"Error: {len(response['unprocessed'])} search index rows were not written")
+
+    def delete(self, postings):
+        keys = [{"token": token, "product_id": product_id} for token, product_id in postings]
+        response = self.db_handler.batch_delete_items(keys)
+
+        if response["unprocessed"]:
+            print(f"Error: {len(response['unprocessed'])} search index rows were not deleted")
+
+    def iter_postings(self, token, page_size=POSTING_PAGE_SIZE):
+        """Yields ({product_id: name}, is_last_page) pages of one trigram's postings, one Query each."""
+        for page in self.db_handler.iter_query(Key("token").eq(token), limit=page_size):
+            yield {row["product_id"]: row["product_name"] for row in page["data"]}, not page["cursor"]
+
+    def count_key(self, token):
+        return {"token": f"{COUNT_TOKEN_PREFIX}{token}", "product_id": COUNT_PRODUCT_ID}
+
+    def add_counts(self, deltas):
+        """Adjusts each token's posting count with one atomic ADD, creating the counter on first use."""
+        for token, delta in deltas.items():
+            if not delta:
+                continue
+            response = self.db_handler.increment(self.count_key(token), "postings", delta, create_missing=True)
+            if response["statusCode"] != 200:
+                print(f"Error: posting count of {token!r} was not updated: {response['message']}")
+
+    def set_counts(self, counts):
+        """Overwrites the posting counts, e.g. after a rebuild has written every posting."""
+        rows = [{**self.count_key(token), "postings": count} for token, count in counts.items()]
+        response = self.db_handler.batch_put_items(rows)
+
+        if response["unprocessed"]:
+            print(f"Error: {len(response['unprocessed'])} posting counts were not written")
+
+    def counts(self, tokens):
+        """Returns {token: posting count} for the tokens that have a counter."""
+        response = self.db_handler.batch_get_items([self.count_key(token) for token in tokens])
+        if response["statusCode"] != 200:
+            print(f"Error: posting counts could not be read: {response['message']}")
+            return {}
+
+        return {row["token"][len(COUNT_TOKEN_PREFIX):]: int(row["postings"]) for row in response["data"]}
+
+
+class ProductSearchIndex:
+    """Trigram inverted index over product names, updated incrementally by the Product model."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, product_id, product_name):
+        self.add_many([(product_id, product_name)])
+
+    def add_many(self, products, count=True):
+        """
+        Indexes (product_id, product_name) pairs with as few store writes as possible.
+        :param count: Also bump each trigram's posting count; a rebuild sets the counts once at the end instead.
+        """
+        postings = []
+        deltas = Counter()
+        for product_id, product_name in products:
+            name = normalize(product_name)
+            tokens = ngrams(name)
+            postings.extend((token, product_id, name) for token in tokens)
+            deltas.update(tokens)
+
+        self.store.put(postings)
+        if count:
+            self.store.add_counts(deltas)
+        return deltas
+
+    def remove(self, product_id, product_name):
+        tokens = ngrams(normalize(product_name))
+        self.store.delete([(token, product_id) for token in tokens])
+        self.store.add_counts({token: -1 for token in tokens})
+
+    def replace(self, product_id, old_name, new_name):
+        """Re-indexes a renamed product, dropping only the trigrams it no longer has."""
+        old_tokens = ngrams(normalize(old_name))
+        new_tokens = ngrams(normalize(new_name))
+        stale_tokens = old_tokens - new_tokens
+
+        if stale_tokens:
+            self.store.delete([(token, product_id) for token in stale_tokens])
+        # product_name is stored on every posting, so the remaining rows are rewritten too
+        self.add_many([(product_id, new_name)], count=False)
+
+        deltas = {token: -1 for token in stale_tokens}
+        deltas.update({token: 1 for token in new_tokens - old_tokens})
+        self.store.add_counts(deltas)
+
+    def rebuild_counts(self, counts):
+        """Replaces the posting counts with the totals of a full rebuild."""
+        self.store.set_counts(counts)
+
+    def search(self, term, limit=None):
+        """
+        Finds products whose name contains `term`, best matches first.
+        :return: List of product ids, or None when the term is shorter than a trigram.
+        """
+        term = normalize(term)
+        tokens = ngrams(term)
+
+        if not tokens:
+            return None
+
+        candidates = self._candidates(sorted(tokens))
+
+        # Every posting stores the normalized name, so one substring test settles each candidate
+        matches = [(product_id, name) for product_id, name in candidates.items() if term in name]
+        matches.sort(key=lambda match: self._rank(term, match[1]) + (match[0],))
+
+        product_ids = [product_id for product_id, name in matches]
+        return product_ids[:limit] if limit else product_ids
+
+    def _candidates(self, tokens):
+        """
+        Every product containing the term is in the posting list of each of its trigrams, so one list is
+        enough and the shortest one is read. Counts only choose which list that is; a stale count costs
+        extra reads but never changes the results.
+        """
+        counts = self.store.counts(tokens)
+
+        if len(counts) == len(tokens):
+            rarest = min(tokens, key=lambda token: counts[token])
+            candidates = {}
+            for page, is_last in self.store.iter_postings(rarest):
+                candidates.update(page)
+            return candidates
+
+        return self._rarest_posting(tokens)
+
+    def _rarest_posting(self, tokens):
+        """
+        Without counts for every trigram, reads all their postings a page at a time, round by round, and
+        stops as soon as one trigram's list is complete. That list is the shortest, so the cost still
+        follows the rarest trigram of the term, and the other lists are never read in full.
+        """
+        readers = {token: self.store.iter_postings(token) for token in tokens}
+        fetched = {token: {} for token in tokens}
+
+        while True:
+            for token in tokens:
+                page, is_last = next(readers[token])
+                fetched[token].update(page)
+
+                if is_last:
+                    for reader in readers.values():
+                        reader.close()
+                    return fetched[token]
+
+    def _rank(self, term, name):
+        """Exact names first, then prefix matches, then word-start matches, then shorter names."""
+        return (
+            name != term,
+            not name.startswith(term),
+            f" {term}" not in f" {name}",
+            len(name),
+        )
+
+
+search_index = (
+    ProductSearchIndex(DynamoDBIndexStore(os.getenv("SEARCH_INDEX_TABLE")))
+    if os.getenv("SEARCH_INDEX_TABLE")
+    else None
+)
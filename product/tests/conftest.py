@@ -0,0 +1,134 @@
+"""
+Shared fixtures. Every module reads its table, bucket and queue names from the environment when it is
+imported, so the names are set here before any of them is, and every test runs against moto.
+
+Run from the product directory:
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+
+os.environ.update({
+    "AWS_DEFAULT_REGION": "us-east-2",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "DB_NAME": "products",
+    "ORDERS_TABLE": "orders",
+    "DB_INVENTORY_NAME": "inventory",
+    "CATALOG_VERSION_TABLE": "catalog-versions",
+    "CATALOG_VERSION_TTL": "0",
+    "SEARCH_INDEX_TABLE": "search-index",
+    "SQS_QUEUE_NAME": "products-created",
+    "SQS_BUCKET_NAME": "products-created-exports",
+    "PRODUCT_BUCKET_NAME": "products",
+    "IMAGE_BUCKET_NAME": "product-images",
+    "EVENT_BUS_NAME": "default",
+    "SOURCE_URL": "tests",
+    "METRICS_SINK": "off",
+    "TRACING_EXPORTER": "off",
+    "LOG_FLUSH_INTERVAL": "3600",
+})
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from gateways import aws_clients
+from gateways import metrics
+from helper import tracing
+
+REGION = "us-east-2"
+TABLES = {
+    "products": {"keys": [("product_id", "S")]},
+    "orders": {
+        "keys": [("order_id", "S")],
+        "indexes": {
+            "user_id-datetime-index": [("user_id", "S"), ("datetime", "S")],
+            "order_status-datetime-index": [("order_status", "S"), ("datetime", "S")],
+        },
+    },
+    "inventory": {"keys": [("product_id", "S"), ("datetime", "S")]},
+    "catalog-versions": {"keys": [("version_id", "S")]},
+    "search-index": {"keys": [("token", "S"), ("product_id", "S")]},
+}
+BUCKETS = ["products-created-exports", "products", "product-images"]
+
+
+def key_schema(keys):
+    return [{"AttributeName": name, "KeyType": key_type} for (name, _), key_type in zip(keys, ("HASH", "RANGE"))]
+
+
+def create_table(dynamodb, name, keys, indexes=None):
+    attributes = dict(keys)
+    table_kwargs = {}
+
+    if indexes:
+        table_kwargs["GlobalSecondaryIndexes"] = []
+        for index_name, index_keys in indexes.items():
+            attributes.update(index_keys)
+            table_kwargs["GlobalSecondaryIndexes"].append(
+                {"IndexName": index_name, "KeySchema": key_schema(index_keys), "Projection": {"ProjectionType": "ALL"}}
+            )
+
+    dynamodb.create_table(
+        TableName=name,
+        KeySchema=key_schema(keys),
+        AttributeDefinitions=[{"AttributeName": attribute, "AttributeType": kind} for attribute, kind in attributes.items()],
+        BillingMode="PAY_PER_REQUEST",
+        **table_kwargs
+    )
+
+
+@pytest.fixture
+def aws():
+    """Fresh moto tables, buckets and queue; the shared clients are rebuilt so they talk to this mock."""
+    with mock_aws():
+        aws_clients.reset()
+
+        dynamodb = boto3.client("dynamodb", region_name=REGION)
+        for name, table in TABLES.items():
+            create_table(dynamodb, name, table["keys"], table.get("indexes"))
+
+        s3 = boto3.client("s3", region_name=REGION)
+        for bucket in BUCKETS:
+            s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+
+        boto3.client("sqs", region_name=REGION).create_queue(QueueName=os.environ["SQS_QUEUE_NAME"])
+
+        yield
+
+    aws_clients.reset()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Module-level caches outlive a test; they are emptied so no test sees another one's reads."""
+    from models.catalog_version import catalog_version
+    from models.product import product_cache
+
+    yield
+    product_cache.clear()
+    catalog_version.clear()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """The gateways back off between retries with time.sleep; tests do not need to wait."""
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+
+
+@pytest.fixture
+def metrics_sink():
+    previous = metrics.gateway_metrics.sink
+    metrics.gateway_metrics.snapshot()
+    sink = metrics.use_sink(metrics.MemorySink())
+    yield sink
+    metrics.use_sink(previous)
+
+
+@pytest.fixture
+def trace_recorder():
+    previous = tracing.recorder
+    recorder = tracing.use_recorder(tracing.MemoryRecorder())
+    yield recorder
+    tracing.use_recorder(previous)
@@ -0,0 +1,33 @@
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from handlers.product_handler import ingest_product_rows
+
+
+@pytest.fixture
+def products(aws):
+    return DynamoDB("products")
+
+
+def test_batch_writes_and_reads_span_several_requests(products):
+    items = [{"product_id": f"p{i:03d}", "quantity": i} for i in range(130)]
+
+    written = products.batch_put_items(items)
+    read = products.batch_get_items([{"product_id": item["product_id"]} for item in items])
+
+    assert written["unprocessed"] == []
+    assert read["statusCode"] == 200
+    assert sorted(item["product_id"] for item in read["data"]) == [item["product_id"] for item in items]
+
+
+@pytest.mark.parametrize("price", ["NaN", "Infinity", "-Infinity", "sNaN"])
+def test_non_finite_prices_fail_only_their_own_row(aws, price):
+    rows = [
+        (2, {"product_id": "bad", "product_name": "bad", "category": "c", "price": price, "quantity": "1"}),
+        (3, {"product_id": "good", "product_name": "good", "category": "c", "price": "9.99", "quantity": "1"}),
+    ]
+
+    report = ingest_product_rows(rows)
+
+    assert [(entry["row"], entry["status"]) for entry in report] == [(2, "failed"), (3, "success")]
+    assert DynamoDB("products").get_item({"product_id": "good"})["statusCode"] == 200
@@ -0,0 +1,83 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from handlers import product_handler
+from models.catalog_snapshot import catalog_snapshot
+
+
+@pytest.fixture
+def products(aws):
+    table = DynamoDB("products")
+    for i in range(3):
+        table.put_item({"product_id": f"p{i}", "product_name": f"Product {i}", "price": Decimal("10"), "quantity": 5})
+    return table
+
+
+def sqs_record(message_id, body):
+    return {"messageId": message_id, "body": body if isinstance(body, str) else json.dumps(body)}
+
+
+def product_event(message_id, detail_type, detail):
+    return sqs_record(message_id, {"detail-type": detail_type, "detail": detail})
+
+
+def test_snapshot_refresh_patches_the_whole_batch_at_once(products, monkeypatch):
+    catalog_snapshot.rebuild()
+    products.put_item({"product_id": "p9", "product_name": "New", "price": 1, "quantity": 1})
+    products.delete_item({"product_id": "p0"})
+    refreshed = []
+    refresh = catalog_snapshot.refresh
+    monkeypatch.setattr(catalog_snapshot, "refresh", lambda ids: refreshed.append(sorted(ids)) or refresh(ids))
+    records = [
+        product_event("a", "product_added", {"product_id": "p9"}),
+        product_event("b", "product_delete", json.dumps({"product_id": "p0"})),
+        product_event("c", "product_updated", {"product_id": "p1", "change": "stock"}),
+        product_event("d", "product_updated", {"product_id": "p2", "change": "details"}),
+        sqs_record("e", "not an event"),
+    ]
+
+    response = product_handler.refresh_catalog_snapshot({"Records": records}, None)
+
+    assert response == {"batchItemFailures": []}
+    assert refreshed == [["p0", "p1", "p2", "p9"]]
+    assert sorted(catalog_snapshot.load()["items"]) == ["p1", "p2", "p9"]
+
+
+def test_snapshot_refresh_failure_returns_every_contributing_message(products, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, "refresh", lambda ids: {"status": "error", "message": "boom"})
+    records = [
+        product_event("a", "product_added", {"product_id": "p9"}),
+        product_event("b", "product_updated", {"product_id": "p1", "change": "stock"}),
+        product_event("c", "product_updated", {"product_id": "p2"}),
+    ]
+
+    response = product_handler.refresh_catalog_snapshot({"Records": records}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "a"}, {"itemIdentifier": "b"}, {"itemIdentifier": "c"}]}
+
+
+def test_stock_changes_reach_the_snapshot(products):
+    catalog_snapshot.rebuild()
+    products.increment({"product_id": "p1"}, "quantity", -2)
+
+    product_handler.refresh_catalog_snapshot(
+        {"Records": [product_event("a", "product_updated", {"product_id": "p1", "change": "stock"})]}, None
+    )
+
+    assert catalog_snapshot.load()["items"]["p1"]["quantity"] == "3"
+
+
+def test_snapshot_revalidation_reads_only_the_metadata(products, monkeypatch):
+    catalog_snapshot.rebuild()
+    event = {"requestContext": {"http": {"method": "GET"}}, "headers": {"Accept-Encoding": "gzip"}}
+    first = product_handler.get_all_products(event, None)
+    monkeypatch.setattr(catalog_snapshot.bucket, "get_object", lambda key: pytest.fail("the snapshot body was downloaded"))
+
+    again = product_handler.get_all_products(dict(event, headers={"Accept-Encoding": "gzip", "If-None-Match": first["headers"]["ETag"]}), None)
+
+    assert first["statusCode"] == 200
+    assert again["statusCode"] == 304
+    assert again["headers"]["ETag"] == first["headers"]["ETag"]
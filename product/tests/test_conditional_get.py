@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from handlers import product_handler
+from models.catalog_version import catalog_version
+from models.product import Product, product_cache
+
+HTTP_GET = {"http": {"method": "GET"}}
+
+
+@pytest.fixture
+def products(aws):
+    table = DynamoDB("products")
+    for i in range(3):
+        table.put_item({"product_id": f"p{i}", "product_name": f"Product {i}", "price": Decimal("10"), "quantity": 5})
+    return table
+
+
+def get_product(product_id, headers=None):
+    return product_handler.product_handler(
+        {"requestContext": HTTP_GET, "pathParameters": {"product_id": product_id}, "headers": headers or {}}, None
+    )
+
+
+def test_product_read_carries_an_etag_and_revalidates_with_304(products):
+    first = get_product("p1")
+    etag = first["headers"]["ETag"]
+
+    again = get_product("p1", {"If-None-Match": etag})
+
+    assert first["statusCode"] == 200
+    assert again["statusCode"] == 304
+    assert again["headers"]["ETag"] == etag
+    assert "body" not in again or not again["body"]
+
+
+def test_a_catalog_write_invalidates_earlier_etags(products):
+    etag = get_product("p1")["headers"]["ETag"]
+
+    Product("p1").add_quantity(3)
+    response = get_product("p1", {"If-None-Match": etag})
+
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] != etag
+    assert json.loads(response["body"])["body"]["quantity"] == "8"
+
+
+def test_a_body_sent_under_the_current_etag_is_never_served_from_a_stale_cache(products):
+    get_product("p1")
+    # Another container changes the price; this container's cache still holds the old item
+    products.update_item({"product_id": "p1"}, "SET price = :price", {":price": Decimal("20")})
+    catalog_version.bump()
+    catalog_version.clear()
+    assert product_cache.get("p1")["price"] == Decimal("10")
+
+    response = get_product("p1")
+
+    assert json.loads(response["body"])["body"]["price"] == "20"
+
+
+def test_catalog_listing_answers_304_for_the_current_version(products):
+    listing = product_handler.get_all_products({"headers": {}, "queryStringParameters": {"limit": "2"}}, None)
+
+    response = product_handler.get_all_products({"headers": {"if-none-match": listing["headers"]["ETag"]}}, None)
+
+    assert listing["statusCode"] == 200
+    assert response["statusCode"] == 304
+
+
+def test_a_missing_product_answers_404_without_an_etag(products):
+    response = get_product("missing")
+
+    assert response["statusCode"] == 404
+    assert json.loads(response["body"]) == {"message": "Item not found"}
+    assert "ETag" not in response["headers"]
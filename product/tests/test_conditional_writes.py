@@ -0,0 +1,37 @@
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+
+
+@pytest.fixture
+def products(aws):
+    return DynamoDB("products")
+
+
+def test_put_item_refuses_to_overwrite(products):
+    assert products.put_item({"product_id": "p1", "product_name": "first"})["statusCode"] == 200
+
+    response = products.put_item({"product_id": "p1", "product_name": "second"})
+
+    assert response["statusCode"] == 400
+    assert products.get_item({"product_id": "p1"})["data"]["product_name"] == "first"
+
+
+def test_update_and_delete_of_missing_item_answer_404(products):
+    update = products.update_item({"product_id": "missing"}, "SET price = :price", {":price": 1})
+    delete = products.delete_item({"product_id": "missing"})
+
+    assert update["statusCode"] == 404
+    assert delete["statusCode"] == 404
+    assert products.get_item({"product_id": "missing"})["statusCode"] == 404
+
+
+def test_update_and_delete_of_existing_item(products):
+    products.put_item({"product_id": "p1", "price": 1})
+
+    update = products.update_item({"product_id": "p1"}, "SET price = :price", {":price": 2})
+    delete = products.delete_item({"product_id": "p1"}, return_values="ALL_OLD")
+
+    assert update["updatedAttributes"]["price"] == 2
+    assert delete["statusCode"] == 200
+    assert delete["deletedAttributes"]["price"] == 2
@@ -0,0 +1,75 @@
+import pytest
+from botocore.stub import Stubber
+
+from gateways import aws_clients
+from gateways.eventbridge_gateway import EventbridgeGateway, PUT_EVENTS_MAX_RETRIES
+
+
+def entry(index):
+    return {"Source": "tests", "DetailType": "product_added", "Detail": f'{{"product_id": "p{index}"}}', "EventBusName": "default"}
+
+
+def accepted(count):
+    return {"FailedEntryCount": 0, "Entries": [{"EventId": f"id-{i}"} for i in range(count)]}
+
+
+def throttled():
+    return {"ErrorCode": "ThrottlingException", "ErrorMessage": "Rate exceeded"}
+
+
+@pytest.fixture
+def events():
+    aws_clients.reset()
+    stubber = Stubber(aws_clients.get_client("events", None))
+    with stubber:
+        yield stubber
+    aws_clients.reset()
+
+
+def test_events_are_sent_ten_per_request(events):
+    entries = [entry(i) for i in range(23)]
+    for start in (0, 10, 20):
+        batch = entries[start:start + 10]
+        events.add_response("put_events", accepted(len(batch)), {"Entries": batch})
+
+    response = EventbridgeGateway.put_events(entries)
+
+    assert response == {"FailedEntryCount": 0, "FailedEntries": []}
+    events.assert_no_pending_responses()
+
+
+def test_rejected_entries_are_retried_alone_until_accepted(events):
+    entries = [entry(i) for i in range(3)]
+    events.add_response("put_events", {
+        "FailedEntryCount": 1,
+        "Entries": [{"EventId": "id-0"}, throttled(), {"EventId": "id-2"}],
+    }, {"Entries": entries})
+    events.add_response("put_events", {"FailedEntryCount": 1, "Entries": [throttled()]}, {"Entries": [entries[1]]})
+    events.add_response("put_events", accepted(1), {"Entries": [entries[1]]})
+
+    response = EventbridgeGateway.put_events(entries)
+
+    assert response["FailedEntryCount"] == 0
+    events.assert_no_pending_responses()
+
+
+def test_entries_still_rejected_after_every_retry_are_reported(events):
+    entries = [entry(0), entry(1)]
+    events.add_response("put_events", {"FailedEntryCount": 1, "Entries": [{"EventId": "id-0"}, throttled()]})
+    for _ in range(PUT_EVENTS_MAX_RETRIES):
+        events.add_response("put_events", {"FailedEntryCount": 1, "Entries": [throttled()]}, {"Entries": [entries[1]]})
+
+    response = EventbridgeGateway.put_events(entries)
+
+    assert response == {"FailedEntryCount": 1, "FailedEntries": [entries[1]]}
+    events.assert_no_pending_responses()
+
+
+def test_a_failed_request_fails_its_whole_batch_only(events):
+    entries = [entry(i) for i in range(12)]
+    events.add_client_error("put_events", service_error_code="InternalException", http_status_code=500)
+    events.add_response("put_events", accepted(2), {"Entries": entries[10:]})
+
+    response = EventbridgeGateway.put_events(entries)
+
+    assert response == {"FailedEntryCount": 10, "FailedEntries": entries[:10]}
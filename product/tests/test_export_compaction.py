@@ -0,0 +1,123 @@
+import csv
+import gzip
+import io
+import json
+
+import boto3
+import pytest
+
+from gateways.s3_gateway import S3Gateway
+from handlers.product_handler import SQS_CSV_FIELDNAMES, receive_message_from_sqs
+from models import export_compaction
+from models.export_compaction import MANIFEST_SUFFIX, ExportCompactor
+
+EXPORT_BUCKET = "products-created-exports"
+
+
+@pytest.fixture
+def exports(aws, monkeypatch):
+    """Seven export objects of three rows each, merged three objects per part."""
+    monkeypatch.setattr(export_compaction, "MAX_SOURCES_PER_PART", 3)
+    for i in range(7):
+        records = [
+            {"messageId": f"m{i}{j}", "body": json.dumps({"product_id": f"p{i}-{j}", "product_name": "Multi\nline" if j == 0 else "B"})}
+            for j in range(3)
+        ]
+        receive_message_from_sqs({"Records": records}, None)
+    return ExportCompactor(S3Gateway(EXPORT_BUCKET))
+
+
+def keys():
+    listing = boto3.client("s3", region_name="us-east-2").list_objects_v2(Bucket=EXPORT_BUCKET)
+    return sorted(entry["Key"] for entry in listing.get("Contents", []))
+
+
+def compacted_rows():
+    s3 = boto3.client("s3", region_name="us-east-2")
+    rows = []
+    for key in keys():
+        if key.endswith(".csv.gz"):
+            body = gzip.decompress(s3.get_object(Bucket=EXPORT_BUCKET, Key=key)["Body"].read()).decode("utf-8")
+            rows.extend(csv.reader(io.StringIO(body, newline="")))
+    return rows
+
+
+def test_exports_are_merged_into_verified_parts(exports):
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response == {"status": "success", "parts": 3, "failed": 0, "deleted": 7}
+    assert not [key for key in keys() if key.startswith("product_created_")]
+    assert len([key for key in keys() if key.endswith(MANIFEST_SUFFIX)]) == 3
+    assert sorted(row[0] for row in compacted_rows()) == sorted(f"p{i}-{j}" for i in range(7) for j in range(3))
+
+
+def test_rerunning_compaction_changes_nothing(exports):
+    exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+    before = keys()
+
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response == {"status": "success", "parts": 0, "failed": 0, "deleted": 0}
+    assert keys() == before
+
+
+def test_a_run_stopped_before_deleting_is_finished_without_duplicating_rows(exports, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(exports.bucket, "delete_objects", lambda keys: {"status": "error", "failed": list(keys)})
+        exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+    assert len([key for key in keys() if key.startswith("product_created_")]) == 7
+
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response == {"status": "success", "parts": 0, "failed": 0, "deleted": 7}
+    assert len(compacted_rows()) == 21
+
+
+def test_a_part_that_fails_verification_keeps_its_sources(exports, monkeypatch):
+    def mismatch(*args):
+        raise RuntimeError("part does not match its sources")
+
+    monkeypatch.setattr(exports, "verify_part", mismatch)
+
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response["status"] == "error"
+    assert response["deleted"] == 0
+    assert len([key for key in keys() if key.startswith("product_created_")]) == 7
+    assert not [key for key in keys() if key.endswith(MANIFEST_SUFFIX)]
+
+
+def failing_manifest_writes(bucket):
+    put_object = bucket.put_object
+
+    def put(key, *args, **kwargs):
+        if key.endswith(MANIFEST_SUFFIX):
+            return {"status": "error", "message": "boom"}
+        return put_object(key, *args, **kwargs)
+
+    return put
+
+
+def test_parts_left_without_a_manifest_are_deleted_before_anything_is_merged_again(exports, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(exports.bucket, "put_object", failing_manifest_writes(exports.bucket))
+        patch.setattr(exports.bucket, "delete_objects", lambda keys: {"status": "error", "failed": list(keys)})
+        exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+    assert len([key for key in keys() if key.endswith(".csv.gz")]) == 3
+    # A new export changes the last part's source set, and with it the part's id
+    receive_message_from_sqs({"Records": [{"messageId": "late", "body": json.dumps({"product_id": "late", "product_name": "C"})}]}, None)
+
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response == {"status": "success", "parts": 3, "failed": 0, "deleted": 8}
+    assert len(compacted_rows()) == 22
+    assert len([key for key in keys() if key.endswith(".csv.gz")]) == 3
+
+
+def test_a_part_whose_manifest_could_not_be_written_is_deleted_at_once(exports, monkeypatch):
+    monkeypatch.setattr(exports.bucket, "put_object", failing_manifest_writes(exports.bucket))
+
+    response = exports.run(SQS_CSV_FIELDNAMES, min_age_seconds=0)
+
+    assert response["failed"] == 3
+    assert not [key for key in keys() if not key.startswith("product_created_")]
@@ -0,0 +1,39 @@
+import json
+
+import boto3
+
+from handlers import product_handler
+
+
+def sqs_record(message_id, body):
+    return {"messageId": message_id, "body": body if isinstance(body, str) else json.dumps(body)}
+
+
+def export_objects():
+    listing = boto3.client("s3", region_name="us-east-2").list_objects_v2(Bucket="products-created-exports")
+    return [entry["Key"] for entry in listing.get("Contents", [])]
+
+
+def test_export_consumer_reports_only_unreadable_messages(aws):
+    records = [
+        sqs_record("m1", {"product_id": "p1", "product_name": "Multi\nline, name", "price": "1"}),
+        sqs_record("m2", "not json"),
+        sqs_record("m3", ["not", "a", "product"]),
+        sqs_record("m4", {"product_id": "p4", "product_name": "B", "category": "ignored"}),
+    ]
+
+    response = product_handler.receive_message_from_sqs({"Records": records}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m2"}, {"itemIdentifier": "m3"}]}
+    [key] = export_objects()
+    body = boto3.client("s3", region_name="us-east-2").get_object(Bucket="products-created-exports", Key=key)["Body"].read()
+    assert body.decode("utf-8") == 'p1,"Multi\nline, name",1,,\r\np4,B,,,\r\n'
+
+
+def test_export_consumer_reports_every_message_when_the_upload_fails(aws, monkeypatch):
+    monkeypatch.setattr(product_handler.sqs_s3, "upload_stream", lambda *args, **kwargs: {"status": "error", "message": "boom"})
+    records = [sqs_record("m1", {"product_id": "p1"}), sqs_record("m2", {"product_id": "p2"})]
+
+    response = product_handler.receive_message_from_sqs({"Records": records}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m1"}, {"itemIdentifier": "m2"}]}
@@ -0,0 +1,37 @@
+import pytest
+from boto3.dynamodb.conditions import Key
+
+from gateways.dynamodb_gateway import DynamoDB
+from models.productInventory import Product_Inventory
+
+
+@pytest.fixture
+def inventory(aws):
+    table = DynamoDB("inventory")
+    for day in range(1, 6):
+        table.put_item({"product_id": "p1", "datetime": f"2025-01-0{day} 00:00:00", "quantity": day})
+    return table
+
+
+def test_query_page_answers_bad_cursor_with_400(inventory):
+    response = inventory.query_page(Key("product_id").eq("p1"), cursor="garbage!")
+
+    assert response["statusCode"] == 400
+
+
+def test_iter_query_follows_cursors_in_sort_order(inventory):
+    pages = list(inventory.iter_query(Key("product_id").eq("p1"), limit=2, descending=True))
+
+    assert [len(page["data"]) for page in pages] == [2, 2, 1]
+    assert [row["quantity"] for page in pages for row in page["data"]] == [5, 4, 3, 2, 1]
+
+
+def test_history_bounds_may_be_cut_short(inventory):
+    response = Product_Inventory("p1").query_history(start="2025-01-02", end="2025-01-03")
+
+    assert [row["quantity"] for row in response["data"]] == [2, 3]
+
+
+@pytest.mark.parametrize("start, end", [("yesterday", None), ("2025-01-03", "2025-01-02")])
+def test_bad_history_bounds_answer_400(inventory, start, end):
+    assert Product_Inventory("p1").query_history(start=start, end=end)["statusCode"] == 400
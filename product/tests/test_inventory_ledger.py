@@ -0,0 +1,75 @@
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from models.productInventory import ROWS_PER_COMPACTION, SNAPSHOT_KEY, Product_Inventory, ledger_sort_key
+
+
+@pytest.fixture
+def ledger(aws):
+    table = DynamoDB("inventory")
+    rows = [("2020-01-01 00:00:00", 10), ("2020-01-02 00:00:00", -3), (ledger_sort_key("2020-01-02 00:00:00", "o1"), -2), ("2099-01-01 00:00:00", 4)]
+    for datetime, quantity in rows:
+        table.put_item({"product_id": "p1", "datetime": datetime, "quantity": quantity, "remarks": ""})
+    return table
+
+
+def test_ledger_compaction_keeps_the_balance(ledger):
+    before = Product_Inventory("p1").balance()["data"]["balance"]
+
+    response = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+
+    after = Product_Inventory("p1").balance()["data"]
+    assert response["compacted"] == 3
+    assert (before, after["balance"], after["tail_rows"]) == (9, 9, 1)
+    assert after["watermark"] == ledger_sort_key("2020-01-02 00:00:00", "o1")
+
+
+def test_rerunning_ledger_compaction_changes_nothing(ledger):
+    first = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+
+    second = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+
+    assert second["compacted"] == 0
+    assert Product_Inventory("p1").snapshot() == first["snapshot"]
+    assert Product_Inventory("p1").balance()["data"]["balance"] == 9
+
+
+def test_rows_written_below_the_watermark_after_a_compaction_are_folded_in(ledger):
+    first = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+    ledger.put_item({"product_id": "p1", "datetime": "2019-06-01 00:00:00", "quantity": 100, "remarks": ""})
+    assert Product_Inventory("p1").balance()["data"]["balance"] == 109
+
+    response = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+
+    assert response["compacted"] == 1
+    assert response["snapshot"]["watermark"] == first["snapshot"]["watermark"]
+    assert Product_Inventory("p1").balance()["data"]["balance"] == 109
+    rows = [row["datetime"] for row in ledger.query_items("p1")["data"]]
+    assert rows == [SNAPSHOT_KEY, "2099-01-01 00:00:00"]
+
+
+def test_ledger_compaction_spans_several_transactions(ledger):
+    for i in range(ROWS_PER_COMPACTION + 10):
+        ledger.put_item({"product_id": "p1", "datetime": f"2020-03-01 00:00:00.{i:08d}", "quantity": 1, "remarks": ""})
+
+    response = Product_Inventory("p1").compact("2021-01-01 00:00:00")
+
+    assert response["compacted"] == ROWS_PER_COMPACTION + 13
+    assert response["snapshot"]["compacted_rows"] == ROWS_PER_COMPACTION + 13
+    assert Product_Inventory("p1").balance()["data"] == {
+        "product_id": "p1", "balance": ROWS_PER_COMPACTION + 19, "watermark": "2020-03-01 00:00:00.00000108", "tail_rows": 1
+    }
+
+
+def test_ledger_compaction_loses_to_a_concurrent_one(ledger, monkeypatch):
+    inventory = Product_Inventory("p1")
+    stale = inventory.snapshot()
+    inventory.compact("2021-01-01 00:00:00")
+    ledger.put_item({"product_id": "p1", "datetime": "2020-06-01 00:00:00", "quantity": 1, "remarks": ""})
+    # This run read the snapshot before the other run wrote it
+    monkeypatch.setattr(inventory, "snapshot", lambda: stale)
+
+    response = inventory.compact("2021-01-01 00:00:00")
+
+    assert response["statusCode"] == 409
+    assert Product_Inventory("p1").balance()["data"]["balance"] == 10
@@ -0,0 +1,32 @@
+import contextvars
+import threading
+from types import SimpleNamespace
+
+from gateways import logs_gateway, metrics
+from gateways.logs_gateway import CloudWatchLogger
+
+
+def test_background_flushes_are_recorded_as_their_own_operation(aws, metrics_sink, monkeypatch):
+    def inheriting_thread(target, args=(), **kwargs):
+        # What threads do where they inherit the context of the code that starts them
+        return threading.Thread(target=contextvars.copy_context().run, args=(target, *args), **kwargs)
+
+    monkeypatch.setattr(logs_gateway, "threading", SimpleNamespace(Thread=inheriting_thread, Lock=threading.Lock, Event=threading.Event))
+    logger = CloudWatchLogger("orders-logs", "current-logs")
+
+    token = metrics._current_operation.set("Order.create")
+    try:
+        logger.send_log({"event": "order_created"})
+    finally:
+        metrics._current_operation.reset(token)
+    logger._wake.set()
+
+    recorded = {}
+    for _ in range(500):
+        recorded.update(metrics.gateway_metrics.snapshot())
+        if "CloudWatchLogs.flush" in recorded:
+            break
+        threading.Event().wait(0.01)
+
+    assert recorded["CloudWatchLogs.flush"]["Calls"] == 1
+    assert "Order.create" not in recorded
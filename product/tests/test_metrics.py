@@ -0,0 +1,141 @@
+import json
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+from gateways import aws_clients
+from gateways.dynamodb_gateway import DynamoDB
+from gateways.metrics import MAX_VALUES_PER_METRIC, emf_documents, gateway_metrics, instrumented
+from helper.invocation import lambda_handler
+
+
+@instrumented("Fake")
+class FakeGateway:
+    def ok(self):
+        return {"statusCode": 200}
+
+    def server_error(self):
+        return {"statusCode": 503}
+
+    def partial_failure(self):
+        return {"FailedEntryCount": 1, "FailedEntries": [{}]}
+
+    def raises(self):
+        raise RuntimeError("boom")
+
+    def outer(self):
+        # A gateway method built on another one is recorded once, under the outer name
+        return self.ok()
+
+    def rows(self, count):
+        yield from range(count)
+
+    @classmethod
+    def build(cls):
+        return cls()
+
+    def _private(self):
+        return "untimed"
+
+
+def operations():
+    return gateway_metrics.snapshot()
+
+
+def test_every_public_method_is_timed(metrics_sink):
+    gateway = FakeGateway.build()
+    gateway.ok()
+    gateway._private()
+
+    recorded = operations()
+
+    assert sorted(recorded) == ["Fake.build", "Fake.ok"]
+    assert recorded["Fake.ok"]["Calls"] == 1
+    assert recorded["Fake.ok"]["Errors"] == 0
+    assert len(recorded["Fake.ok"]["Latency"]) == 1
+
+
+@pytest.mark.parametrize("method", ["server_error", "partial_failure"])
+def test_failed_results_count_as_errors(metrics_sink, method):
+    getattr(FakeGateway(), method)()
+
+    assert operations()[f"Fake.{method}"]["Errors"] == 1
+
+
+def test_exceptions_count_as_errors_and_still_propagate(metrics_sink):
+    with pytest.raises(RuntimeError):
+        FakeGateway().raises()
+
+    assert operations()["Fake.raises"]["Errors"] == 1
+
+
+def test_nested_gateway_calls_are_recorded_once(metrics_sink):
+    FakeGateway().outer()
+
+    assert list(operations()) == ["Fake.outer"]
+
+
+def test_generators_are_recorded_once_when_exhausted_or_closed(metrics_sink):
+    gateway = FakeGateway()
+    assert list(gateway.rows(3)) == [0, 1, 2]
+    partly_read = gateway.rows(3)
+    next(partly_read)
+    partly_read.close()
+
+    assert operations()["Fake.rows"]["Calls"] == 2
+
+
+def test_latencies_beyond_the_emf_limit_spill_into_extra_documents():
+    entry = {"Latency": [1.0] * (MAX_VALUES_PER_METRIC + 5), "Calls": 105, "Errors": 0, "Throttles": 0, "ConsumedCapacity": 2.5}
+
+    documents = list(emf_documents("fn", "DynamoDB.get_item", entry, 0))
+
+    assert [len(document["Latency"]) for document in documents] == [MAX_VALUES_PER_METRIC, 5]
+    assert documents[0]["Calls"] == 105
+    assert documents[0]["ConsumedCapacity"] == 2.5
+    assert "Calls" not in documents[1]
+    metric_names = [metric["Name"] for metric in documents[0]["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+    assert metric_names == ["Latency", "Calls", "Errors", "Throttles", "ConsumedCapacity"]
+
+
+def test_each_invocation_flushes_its_figures_to_the_sink(aws, metrics_sink):
+    @lambda_handler
+    def handler(event, context):
+        DynamoDB("products").put_item({"product_id": "p1"})
+        DynamoDB("products").get_item({"product_id": "p1"})
+        return {"statusCode": 200}
+
+    handler({}, None)
+
+    documents = {document["Operation"]: document for document in metrics_sink.documents}
+    assert {"DynamoDB.put_item", "DynamoDB.get_item"} <= set(documents)
+    assert documents["DynamoDB.get_item"]["Calls"] == 1
+    assert documents["DynamoDB.get_item"]["ConsumedCapacity"] > 0
+    assert documents["DynamoDB.get_item"]["FunctionName"] == "local"
+    assert operations() == {}
+
+
+class RawBody:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def test_throttles_retried_away_by_botocore_are_still_counted(aws, metrics_sink):
+    throttles_left = [1]
+
+    def throttle(request, **kwargs):
+        if throttles_left[0]:
+            throttles_left[0] -= 1
+            body = json.dumps({"__type": "ProvisionedThroughputExceededException", "message": "Rate exceeded"})
+            return AWSResponse(request.url, 400, {}, RawBody(body.encode("utf-8")))
+
+    aws_clients.get_session().events.register_first("before-send.dynamodb.GetItem", throttle)
+
+    response = DynamoDB("products").get_item({"product_id": "p1"})
+
+    assert response["statusCode"] == 404
+    recorded = operations()["DynamoDB.get_item"]
+    assert (recorded["Calls"], recorded["Errors"], recorded["Throttles"]) == (1, 0, 1)
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from models.order import Order
+from models.productInventory import LEDGER_SUFFIX_LENGTH, ledger_sort_key
+
+
+@pytest.fixture
+def products(aws):
+    table = DynamoDB("products")
+    table.put_item({"product_id": "p1", "product_name": "Asus ROG Strix", "price": Decimal("10"), "quantity": 5})
+    return table
+
+
+def order(order_id, quantity, product_id="p1"):
+    return Order(order_id, product_id, "u1", "Asus ROG Strix", "2025-03-06 14:30:00", "0917", quantity, Decimal("10"), "pending")
+
+
+def stock(products):
+    return products.get_item({"product_id": "p1"})["data"]["quantity"]
+
+
+def test_order_takes_stock_and_appends_a_ledger_row(products):
+    response = order("o1", 3).create()
+
+    assert response["statusCode"] == 200
+    assert stock(products) == 2
+    ledger = DynamoDB("inventory").get_item({"product_id": "p1", "datetime": ledger_sort_key("2025-03-06 14:30:00", "o1")})
+    assert ledger["data"]["quantity"] == -3
+    assert ledger["data"]["order_id"] == "o1"
+
+
+def test_orders_in_the_same_second_get_their_own_ledger_rows(products):
+    order("o1", 1).create()
+    order("o2", 1).create()
+
+    rows = DynamoDB("inventory").query_items("p1")["data"]
+
+    assert sorted(row["order_id"] for row in rows) == ["o1", "o2"]
+    assert all(len(row["datetime"]) == 19 + 1 + LEDGER_SUFFIX_LENGTH for row in rows)
+
+
+def test_order_for_more_than_the_stock_answers_500_and_writes_nothing(products):
+    response = order("o1", 6).create()
+
+    assert response["statusCode"] == 500
+    assert response["message"] == "quantity is greater than current stock"
+    assert stock(products) == 5
+    assert Order("o1").get()["statusCode"] == 404
+    assert DynamoDB("inventory").query_items("p1")["data"] == []
+
+
+def test_order_for_a_missing_product_answers_404(products):
+    response = order("o1", 1, product_id="missing").create()
+
+    assert response["statusCode"] == 404
+    assert Order("o1").get()["statusCode"] == 404
+
+
+def test_duplicate_order_answers_400_and_keeps_the_stock(products):
+    order("o1", 2).create()
+
+    response = order("o1", 2).create()
+
+    assert response["statusCode"] == 400
+    assert stock(products) == 3
+
+
+@pytest.mark.parametrize("reasons, status_code", [
+    ([{"Code": "ConditionalCheckFailed", "Item": {"quantity": 1}}, {"Code": "None"}, {"Code": "None"}], 500),
+    ([{"Code": "ConditionalCheckFailed"}, {"Code": "None"}, {"Code": "None"}], 404),
+    ([{"Code": "None"}, {"Code": "ConditionalCheckFailed"}, {"Code": "None"}], 400),
+    ([{"Code": "None"}, {"Code": "None"}, {"Code": "ConditionalCheckFailed"}], 409),
+    ([{"Code": "TransactionConflict"}, {"Code": "None"}, {"Code": "None"}], 409),
+    ([], 409),
+])
+def test_cancellation_reasons_map_to_status_codes(reasons, status_code):
+    assert order("o1", 1).cancellation_response(reasons)["statusCode"] == status_code
+
+
+def test_invalid_order_is_rejected_before_any_write(products):
+    with pytest.raises(ValueError):
+        order("o1", 0).create()
+
+    assert stock(products) == 5
+
+
+def test_cancelling_an_order_restocks_it_once(products):
+    order("o1", 3).create()
+
+    first = Order("o1").update({"order_status": "cancelled"})
+    again = Order("o1").update({"order_status": "cancelled"})
+
+    assert first["statusCode"] == 200
+    assert again["statusCode"] == 409
+    assert stock(products) == 5
+    assert Order("o1").get()["data"]["order_status"] == "cancelled"
+    rows = DynamoDB("inventory").query_items("p1")["data"]
+    assert sorted(row["quantity"] for row in rows) == [-3, 3]
+
+
+def test_cancelling_an_order_of_a_deleted_product_writes_nothing(products):
+    order("o1", 3).create()
+    products.delete_item({"product_id": "p1"})
+
+    response = Order("o1").update({"order_status": "cancelled"})
+
+    assert response["statusCode"] == 404
+    assert Order("o1").get()["data"]["order_status"] == "pending"
+    assert len(DynamoDB("inventory").query_items("p1")["data"]) == 1
+
+
+def test_a_users_orders_are_found_whatever_the_case_of_their_id(products):
+    Order("o1", "p1", "Alice", "Asus ROG Strix", "2025-03-06 14:30:00", "0917", 1, Decimal("10"), "pending").create()
+    Order("o2", "p1", "alice", "Asus ROG Strix", "2025-03-07 09:00:00", "0917", 1, Decimal("10"), "pending").create()
+
+    response = Order.query_by_user("ALICE")
+
+    assert [item["order_id"] for item in response["data"]] == ["o2", "o1"]
@@ -0,0 +1,89 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB, MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_page_size
+from handlers import product_handler
+
+
+@pytest.fixture
+def products(aws):
+    table = DynamoDB("products")
+    for i in range(5):
+        table.put_item({"product_id": f"p{i}", "product_name": f"Product {i}", "price": Decimal("10"), "quantity": 5})
+    return table
+
+
+def test_cursor_round_trips_string_and_decimal_keys():
+    key = {"product_id": "p-1", "datetime": "2025-03-06 14:30:00", "position": Decimal("12.50")}
+
+    cursor = encode_cursor(key)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == key
+
+
+def test_empty_cursor_means_first_page():
+    assert encode_cursor(None) is None
+    assert encode_cursor({}) is None
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGpzb24", "W10", "e30"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit, expected", [(None, 50), ("", 50), ("10", 10), (7, 7), (MAX_PAGE_SIZE + 1, MAX_PAGE_SIZE)])
+def test_page_size_defaults_and_is_capped(limit, expected):
+    assert parse_page_size(limit) == expected
+
+
+@pytest.mark.parametrize("limit", ["0", "-3", "ten", 1.5j])
+def test_invalid_page_size_is_rejected(limit):
+    with pytest.raises(ValueError, match="limit"):
+        parse_page_size(limit)
+
+
+def test_items_page_walks_the_table_with_cursors(products):
+    seen, cursor = [], None
+    while True:
+        page = products.get_items_page(limit=2, cursor=cursor)
+        assert page["statusCode"] == 200
+        assert len(page["data"]) <= 2
+        seen.extend(item["product_id"] for item in page["data"])
+        cursor = page["cursor"]
+        if not cursor:
+            break
+
+    assert sorted(seen) == [f"p{i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("limit, cursor", [("zero", None), ("0", None), (None, "garbage!")])
+def test_items_page_answers_bad_paging_input_with_400(products, limit, cursor):
+    response = products.get_items_page(limit=limit, cursor=cursor)
+
+    assert response["statusCode"] == 400
+
+
+@pytest.mark.parametrize("params", [{"limit": "0"}, {"limit": "many"}, {"cursor": "not-a-cursor"}])
+def test_catalog_listing_answers_bad_paging_input_with_400(products, params):
+    response = product_handler.get_all_products({"headers": {}, "queryStringParameters": params}, None)
+
+    assert response["statusCode"] == 400
+
+
+def test_catalog_listing_pages_follow_the_cursor(products):
+    seen, params = [], {"limit": "2"}
+    while True:
+        response = product_handler.get_all_products({"headers": {}, "queryStringParameters": params}, None)
+        page = json.loads(response["body"])
+        seen.extend(item["product_id"] for item in page["data"])
+        if not page["cursor"]:
+            break
+        params = {"limit": "2", "cursor": page["cursor"]}
+
+    assert sorted(seen) == [f"p{i}" for i in range(5)]
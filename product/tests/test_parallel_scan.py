@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.conditions import Attr
+
+from gateways import aws_clients
+from gateways.dynamodb_gateway import DynamoDB
+
+
+@pytest.fixture
+def products(aws):
+    table = DynamoDB("products")
+    table.batch_put_items([{"product_id": f"p{i:03d}", "product_name": f"name {i}", "quantity": i} for i in range(60)])
+    return table
+
+
+def test_parallel_scan_reads_every_item_once(products):
+    items = list(products.parallel_scan(total_segments=3, projection=["product_id"]))
+
+    assert sorted(item["product_id"] for item in items) == [f"p{i:03d}" for i in range(60)]
+    assert all(set(item) == {"product_id"} for item in items)
+
+
+def test_parallel_scan_applies_the_filter(products):
+    items = list(products.parallel_scan(total_segments=2, filter_expression=Attr("quantity").lt(5)))
+
+    assert sorted(item["product_id"] for item in items) == [f"p{i:03d}" for i in range(5)]
+
+
+def test_parallel_scan_rejects_zero_segments(products):
+    with pytest.raises(ValueError):
+        list(products.parallel_scan(total_segments=0))
+
+
+def test_parallel_scan_returns_the_same_items_as_the_table(products):
+    products.put_item({"product_id": "nested", "tags": ["a", "b"], "specs": {"watts": 650}, "price": Decimal("19.99")})
+
+    [item] = list(products.parallel_scan(total_segments=4, filter_expression=Attr("product_id").eq("nested")))
+
+    assert item == products.get_item({"product_id": "nested"})["data"]
+
+
+def test_parallel_scan_workers_share_the_registry_client(products, monkeypatch):
+    sessions = []
+    new_session = aws_clients._new_session
+    monkeypatch.setattr(aws_clients, "_new_session", lambda: sessions.append(1) or new_session())
+
+    for _ in range(2):
+        assert len(list(products.parallel_scan(total_segments=4))) == 60
+
+    assert sessions == []
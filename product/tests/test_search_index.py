@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+import pytest
+
+from handlers import product_handler
+from models.product import Product
+from models.search_index import DynamoDBIndexStore, InMemoryIndexStore, ProductSearchIndex, search_index
+
+CATALOG = [
+    ("p1", "Asus ROG Strix B550"),
+    ("p2", "ROG Ally"),
+    ("p3", "Corsair Vengeance DDR4"),
+    ("p4", "Kingston Fury DDR4"),
+    ("p5", "Frog Lamp"),
+]
+
+
+class CountingStore(InMemoryIndexStore):
+    def __init__(self):
+        super().__init__()
+        self.read = []
+
+    def iter_postings(self, token, page_size=2):
+        for page, is_last in super().iter_postings(token, page_size):
+            self.read.append(token)
+            yield page, is_last
+
+
+@pytest.fixture
+def index():
+    index = ProductSearchIndex(CountingStore())
+    index.add_many(CATALOG)
+    return index
+
+
+def test_search_ranks_exact_then_prefix_then_word_start(index):
+    assert index.search("rog") == ["p2", "p1", "p5"]
+    assert index.search("ddr4", limit=1) == ["p4"]
+    assert index.search("no such part") == []
+    assert index.search("ro") is None
+
+
+def test_only_the_rarest_trigram_is_read(index):
+    index.store.read.clear()
+
+    assert index.search("rog strix") == ["p1"]
+    [token] = set(index.store.read)
+    assert index.store.counts([token]) == {token: 1}
+
+
+def test_counts_follow_renames_and_deletes(index):
+    index.replace("p2", "ROG Ally", "Steam Deck")
+    index.remove("p5", "Frog Lamp")
+
+    assert index.store.counts(["rog", "dec", "all"]) == {"rog": 1, "dec": 1, "all": 0}
+    assert index.search("rog") == ["p1"]
+    assert index.search("deck") == ["p2"]
+
+
+def test_without_counts_the_shortest_list_is_found_by_paging(index):
+    index.store.posting_counts.clear()
+    index.store.read.clear()
+
+    assert index.search("rog strix") == ["p1"]
+    assert index.store.read.count("rog") < 2
+
+
+def test_stale_counts_cost_reads_but_never_results(index):
+    index.store.set_counts({"ven": 0, "eng": 10, "gea": 10})
+
+    assert index.search("vengea") == ["p3"]
+
+
+def test_dynamodb_store_keeps_counts_beside_the_postings(aws):
+    store = DynamoDBIndexStore("search-index")
+    index = ProductSearchIndex(store)
+    index.add_many(CATALOG)
+    index.remove("p5", "Frog Lamp")
+
+    assert store.counts(["rog", "ddr", "zzz"]) == {"rog": 2, "ddr": 2}
+    assert index.search("rog") == ["p2", "p1"]
+
+    index.rebuild_counts({"rog": 7})
+    assert store.counts(["rog"]) == {"rog": 7}
+
+
+def test_a_rename_is_reindexed_from_the_update_itself(aws, monkeypatch):
+    Product("p1", "Frog Lamp", "lights", Decimal("5"), 1).create()
+    monkeypatch.setattr(Product, "get", lambda *args, **kwargs: pytest.fail("the old name was read separately"))
+
+    response = Product("p1").update({"product_name": "Toad Lamp"})
+
+    assert response["statusCode"] == 200
+    assert search_index.search("toad") == ["p1"]
+    assert search_index.search("frog") == []
+
+
+def test_a_failing_index_search_answers_400(aws, monkeypatch):
+    def bad_page(term, limit=None):
+        raise ValueError("Invalid cursor")
+
+    monkeypatch.setattr(search_index, "search", bad_page)
+
+    response = product_handler.search_by_name({"pathParameters": {"name": "rog"}}, None)
+
+    assert response == {"statusCode": 400, "message": "Invalid cursor"}
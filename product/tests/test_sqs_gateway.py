@@ -0,0 +1,96 @@
+import pytest
+from botocore.stub import ANY, Stubber
+
+from gateways import aws_clients
+from gateways.sqs_gateway import MAX_BATCH_PAYLOAD_BYTES, MAX_BATCH_RETRIES, SQSGateway
+
+QUEUE_NAME = "products-created"
+QUEUE_URL = "https://sqs.us-east-2.amazonaws.com/123456789012/products-created"
+
+
+@pytest.fixture
+def sqs():
+    """Stubs the queue URL lookup and returns a Stubber for the SendMessageBatch calls."""
+    aws_clients.reset()
+    lookup = Stubber(aws_clients.get_client("sqs"))
+    lookup.add_response("get_queue_url", {"QueueUrl": QUEUE_URL}, {"QueueName": QUEUE_NAME})
+    stubber = Stubber(aws_clients.get_resource("sqs").meta.client)
+
+    with lookup, stubber:
+        yield stubber
+    aws_clients.reset()
+
+
+def batch(bodies, first_id=0):
+    return {"QueueUrl": QUEUE_URL, "Entries": [{"Id": str(first_id + i), "MessageBody": body} for i, body in enumerate(bodies)]}
+
+
+def sent(ids):
+    return {"Successful": [{"Id": id_, "MessageId": f"m-{id_}", "MD5OfMessageBody": "x"} for id_ in ids], "Failed": []}
+
+
+def test_messages_are_sent_ten_per_request(sqs):
+    bodies = [f"body {i}" for i in range(13)]
+    sqs.add_response("send_message_batch", sent([str(i) for i in range(10)]), batch(bodies[:10]))
+    sqs.add_response("send_message_batch", sent(["10", "11", "12"]), batch(bodies[10:], first_id=10))
+
+    assert SQSGateway(QUEUE_NAME).send_messages(bodies) == []
+    sqs.assert_no_pending_responses()
+
+
+def test_batches_are_cut_at_the_payload_limit(sqs):
+    bodies = ["a" * (MAX_BATCH_PAYLOAD_BYTES // 2), "b" * (MAX_BATCH_PAYLOAD_BYTES // 2), "c"]
+    sqs.add_response("send_message_batch", sent(["0", "1"]), batch(bodies[:2]))
+    sqs.add_response("send_message_batch", sent(["2"]), batch(bodies[2:], first_id=2))
+
+    assert SQSGateway(QUEUE_NAME).send_messages(bodies) == []
+    sqs.assert_no_pending_responses()
+
+
+def test_oversized_message_is_failed_without_a_request(sqs):
+    body = "x" * (MAX_BATCH_PAYLOAD_BYTES + 1)
+
+    failed = SQSGateway(QUEUE_NAME).send_messages([body])
+
+    assert [(entry["Id"], entry["Code"], entry["SenderFault"]) for entry in failed] == [("0", "MessageTooLong", True)]
+
+
+def test_entries_failed_on_the_sqs_side_are_retried(sqs):
+    bodies = ["one", "two", "three"]
+    sqs.add_response("send_message_batch", {
+        "Successful": [{"Id": "0", "MessageId": "m-0", "MD5OfMessageBody": "x"}],
+        "Failed": [
+            {"Id": "1", "SenderFault": False, "Code": "InternalError"},
+            {"Id": "2", "SenderFault": False, "Code": "ServiceUnavailable"},
+        ],
+    }, batch(bodies))
+    sqs.add_response("send_message_batch", sent(["1", "2"]), {
+        "QueueUrl": QUEUE_URL,
+        "Entries": [{"Id": "1", "MessageBody": "two"}, {"Id": "2", "MessageBody": "three"}],
+    })
+
+    assert SQSGateway(QUEUE_NAME).send_messages(bodies) == []
+    sqs.assert_no_pending_responses()
+
+
+def test_sender_faults_are_not_retried(sqs):
+    sqs.add_response("send_message_batch", {
+        "Successful": [],
+        "Failed": [{"Id": "0", "SenderFault": True, "Code": "InvalidMessageContents"}],
+    }, batch(["bad"]))
+
+    failed = SQSGateway(QUEUE_NAME).send_messages(["bad"])
+
+    assert failed == [{"Id": "0", "SenderFault": True, "Code": "InvalidMessageContents", "MessageBody": "bad"}]
+    sqs.assert_no_pending_responses()
+
+
+def test_entries_are_given_up_after_the_last_retry(sqs):
+    failure = {"Successful": [], "Failed": [{"Id": "0", "SenderFault": False, "Code": "InternalError"}]}
+    for _ in range(MAX_BATCH_RETRIES + 1):
+        sqs.add_response("send_message_batch", failure, {"QueueUrl": QUEUE_URL, "Entries": ANY})
+
+    failed = SQSGateway(QUEUE_NAME).send_messages(["body"])
+
+    assert [(entry["Id"], entry["Code"], entry["MessageBody"]) for entry in failed] == [("0", "InternalError", "body")]
+    sqs.assert_no_pending_responses()
@@ -0,0 +1,29 @@
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+
+
+@pytest.fixture
+def products(aws):
+    return DynamoDB("products")
+
+
+def test_increment_is_guarded_by_min_value(products):
+    products.put_item({"product_id": "p1", "quantity": 3})
+
+    taken = products.increment({"product_id": "p1"}, "quantity", -2, min_value=0)
+    refused = products.increment({"product_id": "p1"}, "quantity", -2, min_value=0)
+
+    assert taken["statusCode"] == 200
+    assert taken["updatedAttributes"]["quantity"] == 1
+    assert refused["statusCode"] == 400
+    assert products.get_item({"product_id": "p1"})["data"]["quantity"] == 1
+
+
+def test_increment_of_missing_item_answers_404_unless_asked_to_create_it(products):
+    missing = products.increment({"product_id": "p1"}, "quantity", 5)
+    created = products.increment({"product_id": "p1"}, "quantity", 5, create_missing=True)
+
+    assert missing["statusCode"] == 404
+    assert created["statusCode"] == 200
+    assert created["updatedAttributes"]["quantity"] == 5
@@ -0,0 +1,133 @@
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from gateways.dynamodb_gateway import DynamoDB
+from handlers.order_handler import post_order
+from helper import tracing
+from helper.invocation import lambda_handler
+from helper.tracing import traced
+
+
+class Cart:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    @traced("Cart.add")
+    def add(self, product_id, quantity=1):
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+        return {"statusCode": 200}
+
+
+def walk(span, depth=0):
+    yield depth, span
+    for subsegment in span.subsegments:
+        yield from walk(subsegment, depth + 1)
+
+
+def names(span):
+    return [(depth, node.name) for depth, node in walk(span)]
+
+
+def test_traced_calls_become_annotated_subsegments(trace_recorder):
+    @lambda_handler
+    def handler(event, context):
+        return Cart("u1").add("p1")
+
+    handler({"routeKey": "POST /cart"}, SimpleNamespace(function_name="cart-handler"))
+
+    [segment] = trace_recorder.segments
+    [subsegment] = segment.subsegments
+    assert segment.name == "cart-handler"
+    assert segment.annotations == {"route": "POST /cart"}
+    assert subsegment.name == "Cart.add"
+    assert subsegment.annotations == {"product_id": "p1", "user_id": "u1", "status_code": 200}
+    assert subsegment.end_time is not None and segment.end_time is not None
+
+
+def test_exceptions_are_recorded_and_still_raised(trace_recorder):
+    @lambda_handler
+    def handler(event, context):
+        return Cart("u1").add("p1", quantity=0)
+
+    with pytest.raises(ValueError):
+        handler({}, None)
+
+    [segment] = trace_recorder.segments
+    assert segment.name == "local"
+    assert segment.subsegments[0].error == "ValueError: quantity must be positive"
+
+
+def test_calls_outside_an_invocation_are_not_traced(trace_recorder):
+    assert Cart("u1").add("p1") == {"statusCode": 200}
+    assert trace_recorder.segments == []
+
+
+def test_aws_calls_nest_under_the_model_operation_that_made_them(aws, trace_recorder):
+    DynamoDB("products").put_item({"product_id": "p1", "product_name": "Asus ROG Strix", "price": Decimal("10"), "quantity": 5})
+    order = {"order_id": "o1", "product_id": "p1", "product_name": "x", "user_id": "u1", "contact_number": "1", "quantity": 1}
+
+    post_order({"routeKey": "POST /orders", "body": json.dumps(order)}, None)
+
+    [segment] = trace_recorder.segments
+    tree = names(segment)
+    assert (1, "Order.create") in tree
+    assert tree[tree.index((1, "Order.create")) + 1] == (2, "DynamoDB.TransactWriteItems")
+    create = next(node for _, node in walk(segment) if node.name == "Order.create")
+    assert create.annotations["order_id"] == "o1"
+    assert create.annotations["product_id"] == "p1"
+    # Buffered events are sent by an end hook, which still runs inside the invocation's segment
+    assert (1, "EventBridge.PutEvents") in tree
+
+
+def test_failed_aws_calls_carry_their_error_code(aws, trace_recorder):
+    @lambda_handler
+    def handler(event, context):
+        DynamoDB("products").put_item({"product_id": "p1"})
+        return DynamoDB("products").put_item({"product_id": "p1"})
+
+    handler({}, None)
+
+    puts = [node for _, node in walk(trace_recorder.segments[0]) if node.name == "DynamoDB.PutItem"]
+    assert [put.annotations.get("error_code") for put in puts] == [None, "ConditionalCheckFailedException"]
+
+
+def test_parallel_scan_workers_report_to_the_invocation(aws, trace_recorder):
+    DynamoDB("products").batch_put_items([{"product_id": f"p{i}"} for i in range(10)])
+
+    @lambda_handler
+    def handler(event, context):
+        return list(DynamoDB("products").parallel_scan(total_segments=3))
+
+    assert len(handler({}, None)) == 10
+
+    scans = [node for _, node in walk(trace_recorder.segments[0]) if node.name == "DynamoDB.Scan"]
+    assert len(scans) == 3
+    assert all(scan.end_time is not None for scan in scans)
+
+
+def test_ending_a_segment_hands_back_the_span_that_was_current(trace_recorder):
+    outer = trace_recorder.begin_segment("outer")
+    inner = trace_recorder.begin_segment("inner")
+
+    trace_recorder.end_segment(inner)
+    assert tracing._current_span.get() is outer
+    trace_recorder.end_segment(outer)
+    assert tracing._current_span.get() is None
+
+
+def test_xray_errors_carry_the_stack_they_were_raised_from(monkeypatch):
+    recorded = []
+    subsegment = SimpleNamespace(add_exception=lambda error, stack: recorded.append(stack))
+    monkeypatch.setattr(tracing, "xray_recorder", SimpleNamespace(configure=lambda **kwargs: None, end_subsegment=lambda: None))
+
+    try:
+        Cart("u1").add("p1", quantity=0)
+    except ValueError as error:
+        tracing.XRayRecorder().end_subsegment(subsegment, error)
+
+    [stack] = recorded
+    assert stack[-1].name == "add"
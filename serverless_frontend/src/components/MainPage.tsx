@@ -251,9 +251,17 @@ const MainPage: React.FC = () => {
 		}
 	};
 
-	const getAllOrders = async () => {
+	const getUserOrders = async () => {
+		// Signed-out visitors have no orders; the orders section is only shown once signed in
+		if (userId === null) {
+			return [];
+		}
+
 		try {
-			const response = await axiosClient.get("/get_orders");
+			// Reads only this user's orders, newest first, instead of scanning every order
+			const response = await axiosClient.get("/orders", {
+				params: { user_id: userId },
+			});
 
 			const order_data = response.data.data;
 
@@ -309,7 +317,7 @@ const MainPage: React.FC = () => {
 	};
 
 	const fetchOrders = async () => {
-		const order_data = await getAllOrders(); // Await the async function
+		const order_data = await getUserOrders(); // Await the async function
 
 		console.log("Orders:", order_data);
 
@@ -324,21 +332,13 @@ const MainPage: React.FC = () => {
 			status: item.order_status,
 		}));
 
-		let query = mappedOrders;
-
-		if (userId !== null) {
-			query = query.filter(
-				(order: { user_id: string }) =>
-					String(order.user_id).toLowerCase() ===
-					String(userId).toLowerCase()
-			);
-		}
-
-		query = query.sort((a: { date: string }, b: { date: string }) => {
-			return new Date(b.date).getTime() - new Date(a.date).getTime();
-		});
+		// Newest first, as before; the server already answers in this order
+		const sortedOrders = mappedOrders.sort(
+			(a: { date: string }, b: { date: string }) =>
+				new Date(b.date).getTime() - new Date(a.date).getTime()
+		);
 
-		setOrders(query);
+		setOrders(sortedOrders);
 	};
 
 	const fetchProducts = async () => {
@@ -381,11 +381,15 @@ const MainPage: React.FC = () => {
 	useEffect(() => {
 		setSelectedCategory("All");
 
-		fetchOrders();
 		fetchProducts();
 		waitForFreshchat();
 	}, []);
 
+	// Orders are per user, so they are read again once the signed-in user is known
+	useEffect(() => {
+		fetchOrders();
+	}, [userId]);
+
 	const ChatWidget = () => {
 		useEffect(() => {
 			if (document.getElementById("chat-widget-script")) return; // Prevent duplicate scripts